@@ -1,16 +1,25 @@
-import os
-import json
+import asyncio
+import threading
 import requests
 import io
+from contextlib import contextmanager
 from urllib.parse import urlparse
-from dotenv import load_dotenv
-from google import genai
 from google.genai.types import Tool, GenerateContentConfig, GoogleSearch, Part
 
-# Load environment variables
-load_dotenv()
-API_KEY = os.getenv("GOOGLE_API_KEY")
-client = genai.Client(api_key=API_KEY)
+from cache import verdict_cache, make_key, CACHE_PATH
+from claim_index import ClaimIndex, CLAIM_INDEX_ENABLED
+from image_index import ImageIndex
+from json_extract import extract_analysis
+from media import sniff_mime
+from image_preprocess import preprocess_image_async, preprocess_image_sync
+from single_flight import SingleFlight
+from gemini_scheduler import gemini_scheduler, estimate_tokens, SchedulerBusy
+from triage import triage
+from warmup import gemini_client
+import metrics
+
+# Coalesces concurrent analyze_news_async calls for the same canonical input
+analysis_flight = SingleFlight("analysis")
 
 # Gemini model ID
 model_id = "gemini-2.0-flash"
@@ -18,13 +27,93 @@ model_id = "gemini-2.0-flash"
 # Google Search tool
 google_search_tool = Tool(google_search=GoogleSearch())
 
-def analyze_news(news_input, model_id=model_id, google_search_tool=google_search_tool):
-    """Analyze news or claim using Gemini."""
-    response = client.models.generate_content(
-        model=model_id,
-        contents=news_input,
-        config=GenerateContentConfig(
-            system_instruction="""
+def split_news_input(news_input):
+    """
+    Split a Gemini input into its text and raw image bytes.
+
+    Args:
+        news_input (str or list): Input as built by create_news_input.
+
+    Returns:
+        tuple: (text, list of image bytes)
+    """
+    parts = news_input if isinstance(news_input, list) else [news_input]
+    texts, images = [], []
+    for part in parts:
+        if isinstance(part, str):
+            texts.append(part)
+            continue
+        inline_data = getattr(part, "inline_data", None)
+        if inline_data is not None and inline_data.data:
+            images.append(inline_data.data)
+    return " ".join(texts), images
+
+# Near-duplicate index over previously analyzed text claims, built lazily
+claim_index = ClaimIndex()
+_claim_index_loaded = False
+_claim_index_lock = threading.Lock()
+
+def get_claim_index():
+    """Return the claim index, warming it from the persistent verdict cache on first use."""
+    global _claim_index_loaded
+    if not _claim_index_loaded:
+        with _claim_index_lock:
+            if not _claim_index_loaded:
+                if verdict_cache.disk is not None:
+                    for key, _, claim, created_at in verdict_cache.disk.entries():
+                        if claim:
+                            claim_index.add(claim, key, added_at=created_at)
+                _claim_index_loaded = True
+    return claim_index
+
+def find_similar_verdict(text):
+    """
+    Look up a cached response for a near-duplicate of a text claim.
+
+    Args:
+        text (str): The claim text.
+
+    Returns:
+        str or None: Raw Gemini response stored for the most similar claim.
+    """
+    if not CLAIM_INDEX_ENABLED or not text:
+        return None
+    index = get_claim_index()
+    match = index.query(text)
+    if match is None:
+        return None
+    similar_key, _ = match
+    cached = verdict_cache.get(similar_key)
+    if cached is None:
+        # The verdict expired or was evicted; don't match it again
+        index.discard(similar_key)
+    return cached
+
+# Perceptual-hash index so re-compressed or resized copies of an image reuse its verdict
+image_index = ImageIndex(path=CACHE_PATH if verdict_cache.enabled else None)
+
+def find_similar_image_verdict(image_hash, text):
+    """
+    Look up a cached response for a perceptually similar image sent with the same text.
+
+    Args:
+        image_hash (int): Perceptual hash of the image.
+        text (str): Text accompanying the image.
+
+    Returns:
+        str or None: Raw Gemini response stored for the matching image.
+    """
+    match = image_index.query(image_hash, text)
+    if match is None:
+        return None
+    similar_key, _ = match
+    cached = verdict_cache.get(similar_key)
+    if cached is None:
+        # The verdict expired or was evicted; don't match it again
+        image_index.discard(similar_key)
+    return cached
+
+SYSTEM_INSTRUCTION = """
             You are a Fake NEWS Detector. You will be given a news article or claim, and you need to determine if it is real or fake.
             Provide a JSON with: "verdict" ("Real", "Fake" or "Uncertain"), "confidence" (float 0-1), "reason" (proper valid reason for the verdict), "sources" (object with titles).
             example: {"verdict": "Fake", "confidence": 0.85, "reason": "The article contains misleading information.", "sources": {"title1": "source1", "title2": "source2"}}
@@ -32,85 +121,253 @@ def analyze_news(news_input, model_id=model_id, google_search_tool=google_search
             In sources the title should be the title of the source and the link should be the link to the source.
             NOTE: IF HALF THE MESSAGE IS REAL AND HALF THE MESSAGE IS NOT THE RETURN CONFIDENCE AS 0.5 AND VERDICT AS UNCERTAIN
 
-            """,
-            tools=[google_search_tool]
+            """
+
+def lookup_cached_analysis(news_input, model_id=model_id):
+    """
+    Check the verdict cache, local triage and the near-duplicate claim/image indexes.
+
+    Triage answers are not cached, so retraining or disabling it takes effect at once.
+
+    Returns:
+        tuple: (cached response text or None, lookup state to pass to store_analysis)
+    """
+    text, images = split_news_input(news_input)
+    cache_key = make_key(text, images, namespace=model_id)
+    state = (cache_key, text, images, None)
+    cached = verdict_cache.get(cache_key)
+    if cached is not None:
+        metrics.CACHE_LOOKUPS.inc("hit")
+        return cached, state
+
+    # Greetings and well-known claims are answered locally
+    if not images:
+        triaged = triage.respond(text)
+        if triaged is not None:
+            return triaged, state
+
+    # Only single-image inputs are matched perceptually
+    image_hash = image_index.hash(images[0]) if len(images) == 1 else None
+    state = (cache_key, text, images, image_hash)
+    if image_hash is not None:
+        similar = find_similar_image_verdict(image_hash, text)
+    elif not images:
+        similar = find_similar_verdict(text)
+    else:
+        similar = None
+    if similar is not None:
+        verdict_cache.set(cache_key, similar)
+        metrics.CACHE_LOOKUPS.inc("similar_image" if image_hash is not None else "similar_claim")
+    else:
+        metrics.CACHE_LOOKUPS.inc("miss")
+    return similar, state
+
+def store_analysis(state, response_text):
+    """Cache a fresh Gemini response and add it to the near-duplicate indexes."""
+    cache_key, text, images, image_hash = state
+    # Only cache responses that actually contain a verdict
+    if response_text and extract_analysis(response_text):
+        # Image verdicts depend on the image, so only text claims are indexed
+        verdict_cache.set(cache_key, response_text, claim="" if images else text)
+        if not images and CLAIM_INDEX_ENABLED:
+            get_claim_index().add(text, cache_key)
+        elif image_hash is not None:
+            image_index.add(image_hash, cache_key, text)
+
+@contextmanager
+def gemini_stage():
+    """Time a Gemini call and count its failures; queue rejections are not upstream errors."""
+    with metrics.STAGE_SECONDS.time("gemini"):
+        try:
+            yield
+        except SchedulerBusy:
+            raise
+        except Exception:
+            metrics.UPSTREAM_ERRORS.inc("gemini")
+            raise
+
+def analyze_news(news_input, model_id=model_id, google_search_tool=google_search_tool, user=None, channel="api"):
+    """
+    Analyze news or claim using Gemini, reusing cached verdicts for repeated or near-duplicate claims.
+
+    The Gemini call waits its turn in gemini_scheduler under (channel, user).
+    """
+    cached, state = lookup_cached_analysis(news_input, model_id)
+    if cached is not None:
+        return cached
+
+    with gemini_stage():
+        response = gemini_scheduler.call_sync(
+            gemini_client().models.generate_content,
+            model=model_id,
+            contents=news_input,
+            config=GenerateContentConfig(
+                system_instruction=SYSTEM_INSTRUCTION,
+                tools=[google_search_tool]
+            ),
+            user=user,
+            channel=channel,
+            cost=estimate_tokens(news_input, SYSTEM_INSTRUCTION),
         )
+    store_analysis(state, response.text)
+    return response.text
+
+async def analyze_news_async(news_input, model_id=model_id, google_search_tool=google_search_tool,
+                             user=None, channel="api"):
+    """
+    Async variant of analyze_news for use inside event loops.
+
+    Uses the async Gemini client, so the event loop keeps serving other requests
+    during the round trip. Calls are admitted by gemini_scheduler (rate budgets,
+    per-user fairness, adaptive concurrency); cache lookups (SQLite, image
+    hashing) run in a worker thread. Concurrent calls with the same canonical
+    input share one Gemini call, queued under the first caller.
+    """
+    cached, state = await asyncio.to_thread(lookup_cached_analysis, news_input, model_id)
+    if cached is not None:
+        return cached
+
+    # Identical inputs arriving while a call is in flight share its result
+    cache_key = state[0]
+    return await analysis_flight.do(
+        cache_key, _generate_and_store, news_input, model_id, google_search_tool, state, user, channel
     )
+
+async def _generate_and_store(news_input, model_id, google_search_tool, state, user, channel):
+    with gemini_stage():
+        response = await gemini_scheduler.call(
+            gemini_client().aio.models.generate_content,
+            model=model_id,
+            contents=news_input,
+            config=GenerateContentConfig(
+                system_instruction=SYSTEM_INSTRUCTION,
+                tools=[google_search_tool]
+            ),
+            user=user,
+            channel=channel,
+            cost=estimate_tokens(news_input, SYSTEM_INSTRUCTION),
+        )
+    await asyncio.to_thread(store_analysis, state, response.text)
     return response.text
 
+async def analyze_news_stream(news_input, model_id=model_id, google_search_tool=google_search_tool,
+                              user=None, channel="api"):
+    """
+    Streaming variant of analyze_news_async that yields response text as Gemini generates it.
+
+    Cached and near-duplicate hits are yielded as a single chunk. The full
+    response is cached once the stream completes. Streams are not coalesced
+    with concurrent identical requests, and are not retried after a 429.
+    """
+    cached, state = await asyncio.to_thread(lookup_cached_analysis, news_input, model_id)
+    if cached is not None:
+        yield cached
+        return
+
+    chunks = []
+    cost = estimate_tokens(news_input, SYSTEM_INSTRUCTION)
+    with gemini_stage():
+        async with gemini_scheduler.slot(user, channel, cost) as slot:
+            stream = await gemini_client().aio.models.generate_content_stream(
+                model=model_id,
+                contents=news_input,
+                config=GenerateContentConfig(
+                    system_instruction=SYSTEM_INSTRUCTION,
+                    tools=[google_search_tool]
+                )
+            )
+            async for chunk in stream:
+                slot.record(chunk)  # the last chunk carries the usage totals
+                if chunk.text:
+                    chunks.append(chunk.text)
+                    yield chunk.text
+    await asyncio.to_thread(store_analysis, state, "".join(chunks))
+
 def extract_json_from_response(response_text, user_text=""):
     """
-    Extracts JSON object from response and enhances source links.
+    Extracts the verdict JSON from a Gemini response and enhances source links.
     
     Args:
         response_text (str): Response from Gemini
         user_text (str): Original user input to include in search queries
+
+    Returns:
+        dict or None: Fields of models.NewsAnalysisResult, or None if no verdict was found.
     """
-    try:
-        data = json.loads(response_text)
-        # Process sources if they exist
-        if isinstance(data, dict) and "sources" in data and isinstance(data["sources"], dict):
-            for title, link in data["sources"].items():
-                # Check if source link is not a valid URL
-                if not str(link).startswith(('http://', 'https://')) or str(link).isdigit() or len(str(link)) < 5:
-                    # Create a search link based on the title and user input
-                    search_query = f"{title} {user_text[:50]}".strip().replace(' ', '+')
-                    data["sources"][title] = f"https://www.google.com/search?q={search_query}"
-        return data
-    except json.JSONDecodeError:
-        start = response_text.find('{')
-        end = response_text.rfind('}')
-        if start != -1 and end != -1 and start < end:
-            try:
-                data = json.loads(response_text[start:end + 1])
-                # Process sources if they exist
-                if isinstance(data, dict) and "sources" in data and isinstance(data["sources"], dict):
-                    for title, link in data["sources"].items():
-                        # Check if source link is not a valid URL
-                        if not str(link).startswith(('http://', 'https://')) or str(link).isdigit() or len(str(link)) < 5:
-                            # Create a search link based on the title and user input
-                            search_query = f"{title} {user_text[:50]}".strip().replace(' ', '+')
-                            data["sources"][title] = f"https://www.google.com/search?q={search_query}"
-                return data
-            except:
-                return None
+    with metrics.STAGE_SECONDS.time("json_extraction"):
+        result = extract_analysis(response_text, user_text)
+    if result is None:
+        metrics.PARSE_FAILURES.inc()
         return None
+    return result.model_dump(exclude_none=True)
+
+def load_image_bytes(image_source):
+    """Read an image from a URL or local file path."""
+    parsed = urlparse(image_source)
+    with metrics.STAGE_SECONDS.time("image_fetch"):
+        if parsed.scheme in ("http", "https"):
+            # Image from URL
+            try:
+                response = requests.get(image_source)
+                response.raise_for_status()
+            except requests.RequestException:
+                metrics.UPSTREAM_ERRORS.inc("image_url")
+                raise
+            return response.content
+        # Local image path
+        with open(image_source, "rb") as f:
+            return f.read()
 
+def build_news_input(news_text, image_bytes=None, mime_type=None):
+    """Combine optional image bytes and text into a Gemini input."""
+    if image_bytes:
+        mime_type = mime_type or sniff_mime(image_bytes) or "image/jpeg"
+        image_part = Part.from_bytes(data=image_bytes, mime_type=mime_type)
+        text_part = news_text.strip() if news_text.strip() else "news image"
+        return [image_part, text_part]
 
+    # If no image, return just the text
+    return news_text.strip() or "No input provided."
 
-def create_news_input(news_text="", image_source=None):
+def create_news_input(news_text="", image_source=None, image_bytes=None, mime_type=None):
     """
-    Prepares input for Gemini with image (from local path or URL) and optional text.
+    Prepares input for Gemini with image (from local path, URL or bytes) and optional text.
+
+    Images are downscaled and stripped of metadata first (see image_preprocess).
     
     Args:
         news_text (str): The news article or claim.
         image_source (str): URL or local file path to the image.
+        image_bytes (bytes): Image data already in memory, e.g. an upload.
+        mime_type (str): MIME type of the image; sniffed from the data when omitted.
     
     Returns:
         list: Gemini input with image part and text.
     """
     try:
-        image_bytes = None
+        if image_bytes is None and image_source:
+            image_bytes = load_image_bytes(image_source)
+        if image_bytes:
+            image_bytes, mime_type = preprocess_image_sync(image_bytes, mime_type)
+        return build_news_input(news_text, image_bytes, mime_type)
 
-        if image_source:
-            parsed = urlparse(image_source)
-            if parsed.scheme in ("http", "https"):
-                # Image from URL
-                response = requests.get(image_source)
-                response.raise_for_status()
-                image_bytes = response.content
-            else:
-                # Local image path
-                with open(image_source, "rb") as f:
-                    image_bytes = f.read()
+    except Exception as e:
+        print(f"⚠️ Error processing image: {e}")
+        return news_text or "Image load failed."
 
-        if image_bytes:
-            image_part = Part.from_bytes(data=image_bytes, mime_type="image/jpeg")
-            text_part = news_text.strip() if news_text.strip() else "news image"
-            return [image_part, text_part]
+async def create_news_input_async(news_text="", image_source=None, image_bytes=None, mime_type=None):
+    """
+    Async variant of create_news_input.
 
-        # If no image, return just the text
-        return news_text.strip() or "No input provided."
+    Image downloads and file reads run in a worker thread and preprocessing in
+    the image process pool, so the event loop is never blocked.
+    """
+    try:
+        if image_bytes is None and image_source:
+            image_bytes = await asyncio.to_thread(load_image_bytes, image_source)
+        if image_bytes:
+            image_bytes, mime_type = await preprocess_image_async(image_bytes, mime_type)
+        return build_news_input(news_text, image_bytes, mime_type)
 
     except Exception as e:
         print(f"⚠️ Error processing image: {e}")
@@ -0,0 +1,112 @@
+"""
+Bytes downloaded and latency per photo message for bot.py's photo-size selection.
+
+Runs the real bot application against benchmarks/fake_telegram.py (file
+downloads throttled to --bandwidth) and a fake Gemini. Each photo message
+carries the variants Telegram sends (90/320/800/1280/2560px JPEGs). The
+benchmark reports the bytes downloaded per message, the download time and the
+end-to-end reply latency. "largest" always takes the biggest variant, as the
+bot used to; "adaptive" takes the smallest one of at least BOT_PHOTO_MIN_EDGE
+pixels.
+
+Needs the bot's logs/logger_config module on the path, like bot.py itself.
+
+    python benchmarks/bench_bot_photos.py --photos 20 --bandwidth 2000000
+"""
+import argparse
+import asyncio
+import io
+import logging
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+from fake_telegram import start_fake_telegram  # noqa: E402
+
+EDGES = (90, 320, 800, 1280, 2560)
+
+
+def make_photo_sizes(rng):
+    """One 4:3 photo encoded at each of Telegram's sizes, smallest first."""
+    full = Image.effect_noise((2560, 1920), 30).convert("RGB")
+    draw = ImageDraw.Draw(full)
+    for _ in range(30):
+        x, y = rng.randrange(2560), rng.randrange(1920)
+        draw.rectangle((x, y, x + 300, y + 40), fill=tuple(rng.randrange(256) for _ in range(3)))
+    sizes = []
+    for edge in EDGES:
+        image = full.resize((edge, edge * 3 // 4), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=87)
+        sizes.append((image.width, image.height, output.getvalue()))
+    return sizes
+
+
+async def run(mode, args, bot, telegram, sizes):
+    state = telegram.state
+    base_url = f"http://127.0.0.1:{telegram.server_address[1]}"
+    bot.BOT_PHOTO_MIN_EDGE = 10 ** 6 if mode == "largest" else args.min_edge
+    before = bot.photo_stats()
+    application = bot.build_application(token="123:fake", base_url=base_url)
+    async with application:
+        await application.start()
+        await bot.post_init(application)  # run_polling would call it
+        await application.updater.start_polling(poll_interval=0, timeout=1)
+
+        state.replies.clear()
+        state.downloads.clear()
+        sent = [state.add_photo_message(chat, sizes, caption=f"Photo {chat}") for chat in range(1, args.photos + 1)]
+        await asyncio.to_thread(state.wait_for_replies, len(sent), args.timeout)
+
+        await application.updater.stop()
+        await application.stop()
+        await bot.post_shutdown(application)
+
+    after = bot.photo_stats()
+    downloads = after["downloads"] - before["downloads"]
+    download_ms = (after["seconds"] - before["seconds"]) * 1000 / max(downloads, 1)
+    downloaded = sum(size for _, _, size in state.downloads)
+    first = min(state.delivered[update_id] for update_id in sent)
+    latencies = sorted(reply_time - first for reply_time, _, _ in state.replies)
+    print(f"{mode:9} {len(state.replies)}/{len(sent)} replies  "
+          f"{downloaded / max(downloads, 1) / 1024:7.1f} KB/photo  download {download_ms:6.1f} ms  "
+          f"reply p50 {statistics.median(latencies):5.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--photos", type=int, default=20, help="photo messages, one per chat")
+    parser.add_argument("--bandwidth", type=float, default=2_000_000, help="download bytes per second")
+    parser.add_argument("--min-edge", type=int, default=1280)
+    parser.add_argument("--delay", type=float, default=0.5, help="fake Gemini latency in seconds")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--modes", default="largest,adaptive")
+    args = parser.parse_args()
+
+    sizes = make_photo_sizes(random.Random(7))
+    telegram = start_fake_telegram(download_bandwidth=args.bandwidth)
+    gemini = start_fake_gemini(delay=args.delay)
+    os.environ.update(
+        GEMINI_BASE_URL=f"http://127.0.0.1:{gemini.server_address[1]}",
+        SARVAM_BASE_URL=f"http://127.0.0.1:{telegram.server_address[1]}",
+        VERDICT_CACHE_ENABLED="0",
+        CLAIM_INDEX_ENABLED="0",
+    )
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    import bot
+    logging.disable(logging.WARNING)  # per-message INFO logs would swamp the report
+
+    print(f"{args.photos} photos, variants " + ", ".join(f"{w}px {len(data) // 1024} KB" for w, _, data in sizes)
+          + f", {args.bandwidth / 1e6:g} MB/s")
+    for mode in args.modes.split(","):
+        asyncio.run(run(mode, args, bot, telegram, sizes))
+
+
+if __name__ == "__main__":
+    main()
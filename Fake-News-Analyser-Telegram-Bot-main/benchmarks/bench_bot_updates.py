@@ -0,0 +1,104 @@
+"""
+Messages per second and reply latency of bot.py against a fake Bot API.
+
+Runs the real bot application (handlers, update processor, Gemini scheduler)
+against benchmarks/fake_telegram.py and a fake Gemini that echoes the claim,
+injects --messages messages into each of --chats chats at once, and measures
+throughput and p50/p99 latency from the update being delivered to getUpdates
+to the reply arriving at sendMessage. Also checks that every chat got its
+replies in the order its messages were sent. "sequential" is PTB's default
+one-update-at-a-time processing; "chat-ordered" is ChatOrderedUpdateProcessor.
+
+Needs the bot's logs/logger_config module on the path, like bot.py itself.
+
+    python benchmarks/bench_bot_updates.py --chats 20 --messages 5 --delay 0.5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import re
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+from fake_telegram import start_fake_telegram  # noqa: E402
+
+REPLY_PATTERN = re.compile(r"Claim (\d+)-(\d+):")
+CLAIM = "Claim {chat}-{seq}: the city council approved a new bridge over the river this week, officials said."
+
+
+async def run(mode, args, bot, telegram):
+    state = telegram.state
+    base_url = f"http://127.0.0.1:{telegram.server_address[1]}"
+    bot.BOT_CONCURRENT_UPDATES = 1 if mode == "sequential" else args.concurrent_updates
+    application = bot.build_application(token="123:fake", base_url=base_url)
+    async with application:
+        await application.start()
+        await bot.post_init(application)  # run_polling would call it
+        await application.updater.start_polling(poll_interval=0, timeout=1)
+
+        state.replies.clear()
+        sent = {}
+        for seq in range(args.messages):
+            for chat in range(1, args.chats + 1):
+                sent[(chat, seq)] = state.add_text_message(chat, CLAIM.format(chat=chat, seq=seq))
+        total = len(sent)
+        complete = await asyncio.to_thread(state.wait_for_replies, total, args.timeout)
+
+        await application.updater.stop()
+        await application.stop()
+        await bot.post_shutdown(application)
+
+    latencies, order = [], {}
+    for reply_time, chat, text in state.replies:
+        match = REPLY_PATTERN.search(text)
+        if match is None:
+            continue
+        key = (int(match.group(1)), int(match.group(2)))
+        latencies.append(reply_time - state.delivered[sent[key]])
+        order.setdefault(chat, []).append(key[1])
+    in_order = all(seqs == sorted(seqs) for seqs in order.values())
+    first = min(state.delivered[update_id] for update_id in sent.values())
+    wall = max(reply_time for reply_time, _, _ in state.replies) - first
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{mode:12} {len(latencies)}/{total} replies{'' if complete else ' (timed out)'}  "
+          f"{len(latencies) / wall:6.1f} msg/s  p50 {statistics.median(latencies):6.2f}s  "
+          f"p99 {p99:6.2f}s  per-chat order {'kept' if in_order else 'BROKEN'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=5, help="messages per chat")
+    parser.add_argument("--delay", type=float, default=0.5, help="fake Gemini latency in seconds")
+    parser.add_argument("--concurrent-updates", type=int, default=64)
+    parser.add_argument("--gemini-concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--modes", default="sequential,chat-ordered")
+    args = parser.parse_args()
+
+    telegram = start_fake_telegram()
+    gemini = start_fake_gemini(delay=args.delay, echo=True)
+    os.environ.update(
+        GEMINI_BASE_URL=f"http://127.0.0.1:{gemini.server_address[1]}",
+        # Language detection is local for these English claims; anything else fails fast here
+        SARVAM_BASE_URL=f"http://127.0.0.1:{telegram.server_address[1]}",
+        GEMINI_MAX_CONCURRENCY=str(args.gemini_concurrency),
+        VERDICT_CACHE_ENABLED="0",
+        CLAIM_INDEX_ENABLED="0",
+    )
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    import bot
+    logging.disable(logging.WARNING)  # per-message INFO logs would swamp the report
+
+    print(f"{args.chats} chats x {args.messages} messages, Gemini delay {args.delay}s")
+    for mode in args.modes.split(","):
+        asyncio.run(run(mode, args, bot, telegram))
+
+
+if __name__ == "__main__":
+    main()
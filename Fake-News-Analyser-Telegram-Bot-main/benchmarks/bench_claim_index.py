@@ -0,0 +1,134 @@
+"""
+Recall and latency benchmark for the near-duplicate claim index.
+
+Builds an index over a synthetic corpus of claims, then queries it with
+mutated copies of indexed claims (the kind of drift forwards pick up), with
+copies whose meaning was changed (a negation added, a number or date
+changed), which must not match, and with unrelated claims.
+
+    python benchmarks/bench_claim_index.py --size 1000000 --queries 5000
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from claim_index import ClaimIndex  # noqa: E402
+
+MARKERS = ["FORWARDED AS RECEIVED", "Forwarded many times", "*Please share*", "MUST READ!!!", "⚠️ Viral message ⚠️"]
+EMOJIS = ["🙏", "😱", "🔥", "‼️", "👇", "🚨", "✅"]
+MONTHS = ["January", "March", "April", "June", "August", "October", "December"]
+# Mutations after which the stored verdict no longer applies
+MEANING_CHANGES = ["negation", "number_change"]
+
+
+def make_vocabulary(rng, size=20000):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+
+
+def make_claim(rng, vocabulary, weights):
+    sentences = []
+    for _ in range(rng.randint(2, 4)):
+        # Zipfian word choice so claims share common words like real text
+        words = rng.choices(vocabulary, cum_weights=weights, k=rng.randint(6, 14))
+        if not sentences:
+            # Claims usually carry an amount or a date
+            words.insert(rng.randrange(len(words)), rng.choice([str(rng.randint(2, 5000)), rng.choice(MONTHS)]))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def mutate(rng, claim, kind):
+    if kind == "forward_marker":
+        return f"{rng.choice(MARKERS)}\n\n{claim}"
+    if kind == "emoji":
+        return f"{rng.choice(EMOJIS)} {claim} {rng.choice(EMOJIS)}"
+    if kind == "reorder":
+        sentences = [s for s in claim.split(". ") if s]
+        rng.shuffle(sentences)
+        return ". ".join(sentences)
+    if kind == "case_punctuation":
+        return claim.upper().replace(".", "!!")
+    if kind == "word_change":
+        words = claim.split()
+        words[rng.randrange(len(words))] = "changed"
+        return " ".join(words)
+    if kind == "negation":
+        words = claim.split()
+        i = rng.randrange(1, len(words))
+        return " ".join(words[:i] + [rng.choice(["not", "never", "no"])] + words[i:])
+    if kind == "number_change":
+        words = claim.split()
+        for i, word in enumerate(words):
+            bare = word.strip(".")
+            if bare.isdigit():
+                words[i] = word.replace(bare, str(int(bare) + rng.randint(1, 9) * 10))
+            elif bare.capitalize() in MONTHS:
+                words[i] = word.replace(bare, rng.choice([m for m in MONTHS if m != bare.capitalize()]))
+        return " ".join(words)
+    raise ValueError(kind)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000, help="claims to index")
+    parser.add_argument("--queries", type=int, default=2000, help="queries per mutation type")
+    parser.add_argument("--threshold", type=float, default=None, help="similarity threshold override")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    index = ClaimIndex() if args.threshold is None else ClaimIndex(threshold=args.threshold)
+
+    claims = []
+    start = time.perf_counter()
+    for i in range(args.size):
+        claim = make_claim(rng, vocabulary, weights)
+        index.add(claim, i)
+        if i < args.queries:
+            claims.append(claim)
+    build_time = time.perf_counter() - start
+    print(f"Indexed {len(index):,} claims in {build_time:.1f}s "
+          f"({build_time / args.size * 1e6:.0f} us/claim), threshold {index.threshold}")
+
+    kinds = ["forward_marker", "emoji", "reorder", "case_punctuation", "word_change"]
+    print(f"\n{'mutation':<18}{'recall':>8}{'p50 us':>10}{'p99 us':>10}")
+    for kind in kinds + MEANING_CHANGES:
+        found, latencies = 0, []
+        for i, claim in enumerate(claims):
+            query = mutate(rng, claim, kind)
+            t0 = time.perf_counter()
+            match = index.query(query)
+            latencies.append((time.perf_counter() - t0) * 1e6)
+            if match is not None and match[0] == i:
+                found += 1
+        # For meaning changes any match is a wrong verdict, reported as a false-positive rate
+        rate = f"fp {found / len(claims):.3f}" if kind in MEANING_CHANGES else f"{found / len(claims):.3f}"
+        print(f"{kind:<18}{rate:>8}{percentile(latencies, 50):>10.0f}{percentile(latencies, 99):>10.0f}")
+
+    false_matches, latencies = 0, []
+    for _ in range(len(claims)):
+        query = make_claim(rng, vocabulary, weights)
+        t0 = time.perf_counter()
+        match = index.query(query)
+        latencies.append((time.perf_counter() - t0) * 1e6)
+        if match is not None:
+            false_matches += 1
+    print(f"{'unrelated':<18}{'fp ' + format(false_matches / len(claims), '.3f'):>8}"
+          f"{percentile(latencies, 50):>10.0f}{percentile(latencies, 99):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Latency and Gemini calls for long messages, whole versus claim by claim.
+
+Runs the analyser in-process against benchmarks/fake_gemini.py, whose replies
+take --delay seconds plus --delay-per-char seconds per character of request
+text (a stand-in for longer prompts generating longer, slower answers).
+Each synthetic forward holds --claims sentences. Three passes are timed:
+
+    first       every message once, nothing cached
+    re-forward  the same messages again, word for word
+    edited      one sentence of each message reworded, as forwards drift
+
+Whole-message analysis needs a fresh Gemini call whenever any sentence
+changes; decomposed analysis only re-verifies the changed claim. Splitting
+costs more Gemini calls on the first pass, so with many messages in flight
+(--in-flight) the scheduler's concurrency limit decides which mode wins.
+
+    python benchmarks/bench_decompose.py --messages 20 --claims 4 --delay 1.0 --delay-per-char 0.004
+    python benchmarks/bench_decompose.py --in-flight 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+
+SUBJECTS = ["The state government", "A viral video", "The health ministry", "Scientists in Pune",
+            "The election commission", "A local hospital", "The railway board", "The central bank"]
+PREDICATES = ["has announced free electricity for every household from next month",
+              "shows soldiers crossing the border near the northern district last night",
+              "confirmed that drinking warm water with lemon cures the seasonal virus",
+              "will ban all two thousand rupee notes starting this coming Monday",
+              "found that the new vaccine changes human DNA within three weeks",
+              "is giving a cash reward to anyone who shares this message ten times",
+              "closed every school in the city for the rest of the month",
+              "said the water supply will be cut for four days for repairs"]
+
+
+def make_message(rng, claims):
+    return " ".join(f"{rng.choice(SUBJECTS)} {rng.choice(PREDICATES)} ({rng.randrange(10000)})."
+                    for _ in range(claims))
+
+
+def edit_message(rng, message):
+    sentences = message.split(". ")
+    index = rng.randrange(len(sentences))
+    sentences[index] = sentences[index].replace("(", "(ref ", 1)
+    return ". ".join(sentences)
+
+
+async def run_pass(messages, analyze, in_flight):
+    latencies = []
+    semaphore = asyncio.Semaphore(in_flight)
+
+    async def one(message):
+        async with semaphore:
+            start = time.perf_counter()
+            await analyze(message)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(message) for message in messages))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--claims", type=int, default=4, help="sentences per message")
+    parser.add_argument("--delay", type=float, default=1.0, help="fixed seconds per Gemini call")
+    parser.add_argument("--delay-per-char", type=float, default=0.004, help="extra seconds per request character")
+    parser.add_argument("--in-flight", type=int, default=1, help="messages analyzed at once")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    fake = start_fake_gemini(delay=args.delay, delay_per_char=args.delay_per_char, echo=True)
+    handler = fake.RequestHandlerClass
+    workdir = tempfile.mkdtemp()
+    os.environ.update(
+        GEMINI_BASE_URL=f"http://127.0.0.1:{fake.server_address[1]}",
+        GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "fake-key"),
+        CLAIM_INDEX_ENABLED="0",  # only exact repeats are reused, in both modes
+    )
+    import analyse
+    import cache
+    import decompose
+
+    rng = random.Random(args.seed)
+    messages = [make_message(rng, args.claims) for _ in range(args.messages)]
+    edited = [edit_message(rng, message) for message in messages]
+
+    async def whole(message):
+        analyse.extract_json_from_response(await analyse.analyze_news_async(message), message)
+
+    async def claims(message):
+        await decompose.analyze_claims(message)
+
+    print(f"{args.messages} messages of {args.claims} claims (~{statistics.mean(map(len, messages)):.0f} chars), "
+          f"{args.in_flight} in flight, Gemini {args.delay:g}s + {args.delay_per_char * 1000:g}ms/char")
+    print(f"{'mode':8} {'pass':11} {'p50':>7} {'max':>7} {'gemini calls':>13}")
+    for mode, analyze in (("whole", whole), ("claims", claims)):
+        # A fresh verdict cache per mode, so neither starts warm
+        analyse.verdict_cache = cache.TieredCache(path=os.path.join(workdir, f"{mode}.db"))
+        for name, batch in (("first", messages), ("re-forward", messages), ("edited", edited)):
+            calls = handler.calls
+            latencies = asyncio.run(run_pass(batch, analyze, args.in_flight))
+            print(f"{mode:8} {name:11} {statistics.median(latencies):6.2f}s {max(latencies):6.2f}s "
+                  f"{handler.calls - calls:13}")
+    fake.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Fairness and 429s under load: gemini_scheduler against a plain semaphore.
+
+Simulates a Gemini backend that answers in --latency seconds and returns 429
+once more than --server-capacity calls run at once. One spammy user fires
+--spam requests at t=0 while --users normal users send --per-user requests
+each, spread over the first few seconds. Reports 429s seen, how long normal
+users waited for their answers and the scheduler's final concurrency limit.
+The baseline is the old per-process semaphore (FIFO, no retry).
+
+    python benchmarks/bench_gemini_scheduler.py --spam 200 --users 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gemini_scheduler as scheduling  # noqa: E402
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+class FakeGemini:
+    def __init__(self, latency, capacity):
+        self.latency = latency
+        self.capacity = capacity
+        self.running = 0
+        self.rejected = 0
+
+    async def generate_content(self):
+        if self.running >= self.capacity:
+            self.rejected += 1
+            await asyncio.sleep(0.01)
+            raise RateLimited("429 RESOURCE_EXHAUSTED")
+        self.running += 1
+        try:
+            await asyncio.sleep(self.latency * random.uniform(0.8, 1.2))
+        finally:
+            self.running -= 1
+        return "ok"
+
+
+async def run(mode, args):
+    random.seed(args.seed)
+    backend = FakeGemini(args.latency, args.server_capacity)
+    scheduler = scheduling.GeminiScheduler(max_concurrency=args.concurrency, latency_target=0,
+                                           queue_timeout=600)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = {"spam": [], "normal": []}
+    failures = {"spam": 0, "normal": 0}
+
+    async def request(user, kind, delay):
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        try:
+            if mode == "scheduler":
+                await scheduler.call(backend.generate_content, user=user, channel="telegram", cost=1000)
+            else:
+                async with semaphore:
+                    await backend.generate_content()
+            latencies[kind].append(time.perf_counter() - start)
+        except RateLimited:
+            failures[kind] += 1
+
+    tasks = [request("spammer", "spam", 0) for _ in range(args.spam)]
+    for user in range(args.users):
+        tasks += [request(f"user{user}", "normal", random.uniform(0, args.spread)) for _ in range(args.per_user)]
+    start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - start
+
+    spam = latencies["spam"] or [0.0]
+    normal = sorted(latencies["normal"]) or [0.0]
+    p95 = normal[min(len(normal) - 1, int(len(normal) * 0.95))]
+    extra = f"  final limit {scheduler.stats()['concurrency_limit']}" if mode == "scheduler" else ""
+    print(f"{mode:9} wall {wall:6.1f}s  429s seen {backend.rejected:4}  failed: spam {failures['spam']:3} "
+          f"normal {failures['normal']:3}  normal user p50 {statistics.median(normal):5.2f}s "
+          f"p95 {p95:5.2f}s  spam p50 {statistics.median(spam):5.2f}s{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spam", type=int, default=200)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--per-user", type=int, default=3)
+    parser.add_argument("--spread", type=float, default=3.0, help="seconds over which normal users arrive")
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--server-capacity", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # Short pauses after 429s so the simulation finishes quickly
+    scheduling.RATE_LIMIT_BACKOFF = args.latency
+    scheduling.DECREASE_COOLDOWN = args.latency
+    print(f"{args.spam} spam requests + {args.users}x{args.per_user} normal; "
+          f"backend {args.server_capacity} concurrent, client limit {args.concurrency}")
+    for mode in ("semaphore", "scheduler"):
+        asyncio.run(run(mode, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Bytes sent to Gemini and per-image latency of the image preprocessing stage.
+
+Generates phone-camera-sized JPEGs (with EXIF) and screenshot-style PNGs,
+runs them through preprocess_image_async at a given concurrency and reports
+bytes before/after, p50/p99 latency and the worst event-loop stall seen by a
+ticker task while the pool works. --inline decodes on the event loop instead,
+for comparison.
+
+    python benchmarks/bench_image_preprocess.py --images 32 --concurrency 8
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+import image_preprocess  # noqa: E402
+
+
+def make_photo(rng, size=(4032, 3024)):
+    """Noisy gradient JPEG with an EXIF block, like a phone photo."""
+    image = Image.effect_noise(size, 40).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for _ in range(20):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.ellipse((x, y, x + 400, y + 300), fill=tuple(rng.randrange(256) for _ in range(3)))
+    exif = Image.Exif()
+    exif[0x010F] = "BenchCam"  # Make
+    exif[0x0112] = 6  # Orientation: rotated 90 degrees
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=95, exif=exif)
+    return output.getvalue()
+
+
+def make_screenshot(rng, size=(1440, 3120)):
+    """Flat-colour PNG with text-like bars, like a forwarded screenshot."""
+    image = Image.new("RGB", size, (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    for y in range(60, size[1] - 60, 48):
+        draw.rectangle((40, y, 40 + rng.randrange(400, size[0] - 80), y + 24), fill=(30, 30, 30))
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+async def ticker(interval, lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run(images, concurrency, inline):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, sizes = [], []
+
+    async def process(data):
+        async with semaphore:
+            start = time.perf_counter()
+            if inline:
+                result, _ = image_preprocess.preprocess_image(data)
+            else:
+                result, _ = await image_preprocess.preprocess_image_async(data)
+            latencies.append(time.perf_counter() - start)
+            sizes.append((len(data), len(result)))
+
+    lags, stop = [], asyncio.Event()
+    tick = asyncio.create_task(ticker(0.01, lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(process(data) for data in images))
+    wall = time.perf_counter() - start
+    stop.set()
+    await tick
+    return wall, latencies, sizes, max(lags, default=0.0)
+
+
+def report(name, wall, latencies, sizes, max_lag):
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    before = sum(size_in for size_in, _ in sizes)
+    after = sum(size_out for _, size_out in sizes)
+    print(f"{name:7} wall {wall:6.2f}s  p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+          f"p99 {p99 * 1000:7.1f} ms  bytes {before / 1e6:7.1f} MB -> {after / 1e6:6.1f} MB  "
+          f"max loop stall {max_lag * 1000:6.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--inline", action="store_true", help="also decode on the event loop for comparison")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    kinds = {"photo": make_photo(rng), "screenshot": make_screenshot(rng)}
+    images = [kinds["photo"] if i % 2 == 0 else kinds["screenshot"] for i in range(args.images)]
+    for kind, data in kinds.items():
+        result, mime_type = image_preprocess.preprocess_image(data)
+        print(f"{kind:10} {len(data) / 1024:8.0f} KB -> {len(result) / 1024:6.0f} KB ({mime_type})")
+    print(f"\n{args.images} images at concurrency {args.concurrency}, "
+          f"{image_preprocess.IMAGE_PREPROCESS_WORKERS} workers, max edge {image_preprocess.IMAGE_MAX_EDGE}px")
+
+    # Start the workers before timing
+    asyncio.run(run(images[:image_preprocess.IMAGE_PREPROCESS_WORKERS], args.concurrency, False))
+    report("pool", *asyncio.run(run(images, args.concurrency, False)))
+    if args.inline:
+        report("inline", *asyncio.run(run(images, args.concurrency, True)))
+    image_preprocess.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Parse-rate, throughput and fuzz check for json_extract against the old extractor.
+
+The corpus in fixtures/gemini_outputs.jsonl holds model outputs seen in the
+wild (fences, prose, trailing commas, raw newlines, percent confidences,
+truncation) with the verdict each should yield, or null when none can be
+recovered. The legacy column is the json.loads / find('{')-rfind('}')
+fallback that analyse.py and the WhatsApp bot used before.
+
+--fuzz N mutates the corpus N times (prose and fence wrapping, trailing
+commas, whitespace, truncation) and checks that parsing never raises and
+that feeding the text in random chunks gives the same result as one shot.
+
+    python benchmarks/bench_json_extract.py --fuzz 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_extract import AnalysisStreamParser, extract_analysis  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "gemini_outputs.jsonl")
+
+PROSE = [
+    "Here is the analysis you asked for:",
+    "Based on a search of {trusted} sources:",
+    "Result (see notes below):",
+    "Note: the forwarded text uses { and } oddly.",
+]
+
+
+def legacy_extract(response_text):
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError:
+        start = response_text.find('{')
+        end = response_text.rfind('}')
+        if start != -1 and end != -1 and start < end:
+            try:
+                return json.loads(response_text[start:end + 1])
+            except Exception:
+                return None
+        return None
+
+
+def legacy_verdict(text):
+    data = legacy_extract(text)
+    return data.get("verdict") if isinstance(data, dict) else None
+
+
+def new_verdict(text):
+    result = extract_analysis(text)
+    return result.verdict if result else None
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def throughput(func, texts, seconds=1.0):
+    count, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for text in texts:
+            func(text)
+        count += len(texts)
+    elapsed = time.perf_counter() - start
+    total_bytes = sum(len(text.encode("utf-8")) for text in texts) * count / len(texts)
+    return count / elapsed, total_bytes / elapsed / 1e6
+
+
+def mutate(rng, text):
+    """Return (mutated text, whether the verdict should still be recoverable)."""
+    kind = rng.choice(["prose", "fence", "trailing_comma", "whitespace", "truncate"])
+    if kind == "prose":
+        return f"{rng.choice(PROSE)}\n{text}\n{rng.choice(PROSE)}", True
+    if kind == "fence":
+        return f"{rng.choice(PROSE)}\n```json\n{text}\n```", True
+    if kind == "trailing_comma":
+        end = text.rfind("}")
+        if end <= 0 or text[:end].rstrip().endswith(","):
+            return text, True
+        return text[:end] + "," + text[end:], True
+    if kind == "whitespace":
+        return text.replace(", ", ",\n    ").replace(": ", " :  "), True
+    return text[:rng.randrange(len(text) + 1)], False
+
+
+def stream_result(text, rng):
+    parser = AnalysisStreamParser()
+    i = 0
+    while i < len(text):
+        step = rng.randint(1, 40)
+        parser.feed(text[i:i + step])
+        i += step
+    result = parser.close()
+    return result.model_dump() if result else None
+
+
+def fuzz(samples, rounds, seed):
+    rng = random.Random(seed)
+    valid = [sample["output"] for sample in samples if sample["verdict"]]
+    recovered = expected = mismatches = 0
+    for _ in range(rounds):
+        text, recoverable = mutate(rng, rng.choice(valid))
+        one_shot = extract_analysis(text)
+        one_shot = one_shot.model_dump() if one_shot else None
+        if stream_result(text, rng) != one_shot:
+            mismatches += 1
+        if recoverable:
+            expected += 1
+            recovered += one_shot is not None
+    print(f"fuzz: {rounds} mutations, recoverable parsed {recovered}/{expected}, "
+          f"stream/one-shot mismatches {mismatches}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--fuzz", type=int, default=0, help="number of fuzz mutations to run")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    samples = load_corpus(args.corpus)
+    texts = [sample["output"] for sample in samples]
+    print(f"{'case':28} {'expected':10} {'legacy':10} {'new':10}")
+    scores = {"legacy": 0, "new": 0}
+    for sample in samples:
+        got = {"legacy": legacy_verdict(sample["output"]), "new": new_verdict(sample["output"])}
+        for name, verdict in got.items():
+            scores[name] += verdict == sample["verdict"]
+        print(f"{sample['name']:28} {str(sample['verdict']):10} {str(got['legacy']):10} {str(got['new']):10}")
+    print(f"\ncorrect: legacy {scores['legacy']}/{len(samples)}, new {scores['new']}/{len(samples)}")
+
+    for name, func in (("legacy", legacy_extract), ("new", extract_analysis)):
+        per_second, mb_per_second = throughput(func, texts)
+        print(f"{name:7} throughput: {per_second:,.0f} outputs/s ({mb_per_second:.1f} MB/s)")
+
+    if args.fuzz:
+        fuzz(samples, args.fuzz, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Agreement and latency benchmark for the local language identification path.
+
+Runs lang_id.identify_local over a fixture corpus and reports how many
+messages it answers locally, how often those answers agree with the
+reference label, and the per-message latency. The bundled labels are
+hand-assigned; pass --live to use Sarvam text-lid as the reference instead
+(needs SARVAM_API_KEY) and to time the remote round trip for comparison.
+
+    python benchmarks/bench_lang_id.py
+    python benchmarks/bench_lang_id.py --live
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lang_id  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "lang_id_corpus.jsonl")
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def sarvam_labels(samples):
+    import sarvam
+
+    labels, latencies = [], []
+    try:
+        for sample in samples:
+            t0 = time.perf_counter()
+            labels.append(await sarvam.detect_language(sample["text"]))
+            latencies.append(time.perf_counter() - t0)
+    finally:
+        await sarvam.close_http_client()
+    return labels, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=200, help="timing repetitions per message")
+    parser.add_argument("--live", action="store_true", help="use Sarvam text-lid as the reference")
+    args = parser.parse_args()
+
+    samples = load_corpus(args.corpus)
+    reference = [sample["language"] for sample in samples]
+    remote_latencies = []
+    if args.live:
+        reference, remote_latencies = asyncio.run(sarvam_labels(samples))
+
+    local_latencies = []
+    confident = agree = 0
+    disagreements = []
+    for sample, expected in zip(samples, reference):
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            language, is_confident = lang_id.identify_local(sample["text"])
+        local_latencies.append((time.perf_counter() - t0) / args.repeat)
+        if not is_confident:
+            continue
+        confident += 1
+        if language == expected:
+            agree += 1
+        else:
+            disagreements.append((sample["text"], language, expected))
+
+    total = len(samples)
+    print(f"Reference: {'Sarvam text-lid' if args.live else 'fixture labels'} ({total} messages)")
+    print(f"Answered locally: {confident}/{total} ({confident / total:.0%}), "
+          f"Sarvam fallback for {total - confident}")
+    print(f"Agreement on local answers: {agree}/{confident} ({agree / max(confident, 1):.1%})")
+    print(f"Local latency: p50 {statistics.median(local_latencies) * 1e6:.0f} us, "
+          f"max {max(local_latencies) * 1e6:.0f} us")
+    if remote_latencies:
+        print(f"Sarvam latency: p50 {statistics.median(remote_latencies) * 1e3:.0f} ms, "
+              f"max {max(remote_latencies) * 1e3:.0f} ms")
+    for text, got, expected in disagreements:
+        print(f"  disagree: local={got} reference={expected} {text!r}")
+
+
+if __name__ == "__main__":
+    main()
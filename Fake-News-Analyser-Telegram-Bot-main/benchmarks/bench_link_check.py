@@ -0,0 +1,130 @@
+"""
+Added latency, probes saved and dead-link replacement of source link checking.
+
+Simulates a stream of analyses, each citing a few source links. The links
+come from a skewed (Zipf) pool, like the popular news and fact-check pages
+Gemini cites again and again. Probes go to an in-process mock web
+(httpx.MockTransport) and a mock resolver, with per-request latency, so no
+network is needed.
+The pool mixes these kinds of link:
+
+    live          200, or 405 to HEAD and 200 to GET
+    missing       404 on a real host (hallucinated path)
+    unreachable   a host name that does not exist (hallucinated domain)
+    slow          answers after longer than the deadline
+
+Reports the latency each response gained, how many probes the liveness
+cache saved, and how many dead links were replaced before the response.
+
+    python benchmarks/bench_link_check.py --responses 2000 --deadline 1.0
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from link_check import LinkChecker  # noqa: E402
+
+KINDS = {"live": 0.7, "missing": 0.15, "unreachable": 0.1, "slow": 0.05}
+
+
+def make_pool(rng, size):
+    hosts = [f"news{i}.example.com" for i in range(40)]
+    pool = []
+    for i in range(size):
+        kind = rng.choices(list(KINDS), weights=list(KINDS.values()))[0]
+        host = f"made-up-{i}.example.net" if kind == "unreachable" else rng.choice(hosts)
+        pool.append((kind, f"https://{host}/{kind}/{i}?utm_source=gemini"))
+    return pool
+
+
+def mock_resolver(args):
+    async def resolve(host):
+        await asyncio.sleep(args.dns_latency)
+        if host.startswith("made-up-"):
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return ["93.184.216.34"]
+
+    return resolve
+
+
+def mock_web(args, rng):
+    async def handler(request):
+        kind = request.url.path.split("/")[1]
+        await asyncio.sleep(args.deadline * 3 if kind == "slow" else rng.uniform(0.5, 1.5) * args.latency)
+        if kind == "missing":
+            return httpx.Response(404)
+        if request.method == "HEAD" and int(request.url.path.rsplit("/", 1)[1]) % 4 == 0:
+            return httpx.Response(405)
+        return httpx.Response(200)
+
+    return httpx.MockTransport(handler)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    pool = make_pool(rng, args.pool)
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(len(pool))]
+    checker = LinkChecker(enabled=True, deadline=args.deadline, probe_timeout=args.deadline * 5,
+                          transport=mock_web(args, rng), resolver=mock_resolver(args))
+    added, dead_total, dead_replaced, interval = [], 0, 0, 1 / args.rate
+    tasks = []
+
+    async def respond(sources, kinds):
+        nonlocal dead_total, dead_replaced
+        start = time.perf_counter()
+        checked = await checker.validate(sources, "benchmark claim")
+        added.append(time.perf_counter() - start)
+        for title, kind in kinds.items():
+            if kind in ("missing", "unreachable"):
+                dead_total += 1
+                dead_replaced += checked[title] != sources[title]
+
+    for _ in range(args.responses):
+        cited = rng.choices(pool, weights, k=args.links)
+        sources = {f"Source {i}": url for i, (_, url) in enumerate(cited)}
+        kinds = {f"Source {i}": kind for i, (kind, _) in enumerate(cited)}
+        tasks.append(asyncio.create_task(respond(sources, kinds)))
+        await asyncio.sleep(rng.expovariate(1 / interval))
+    await asyncio.gather(*tasks)
+    stats = checker.stats()
+    await checker.close()
+
+    links = args.responses * args.links
+    print(f"{args.responses} responses, {links} links, pool of {args.pool} URLs, deadline {args.deadline}s")
+    print(f"added latency: p50 {percentile(added, 50) * 1000:.1f} ms, p99 {percentile(added, 99) * 1000:.1f} ms, "
+          f"max {max(added) * 1000:.1f} ms")
+    print(f"probes: {stats['probes']} for {links} links ({1 - stats['probes'] / links:.1%} saved by the cache "
+          f"and coalescing), {stats['late']} past the deadline")
+    print(f"dead links replaced before the response: {dead_replaced}/{dead_total} "
+          f"({dead_replaced / dead_total if dead_total else 0:.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--responses", type=int, default=2000)
+    parser.add_argument("--links", type=int, default=3, help="sources per response")
+    parser.add_argument("--pool", type=int, default=3000, help="distinct URLs that can be cited")
+    parser.add_argument("--zipf", type=float, default=1.1, help="skew of citations across the pool")
+    parser.add_argument("--rate", type=float, default=200, help="responses per second")
+    parser.add_argument("--latency", type=float, default=0.15, help="mean probe latency (s)")
+    parser.add_argument("--dns-latency", type=float, default=0.05, help="time to resolve a host name (s)")
+    parser.add_argument("--deadline", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
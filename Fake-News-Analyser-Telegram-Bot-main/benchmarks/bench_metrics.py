@@ -0,0 +1,70 @@
+"""
+Hot-path cost of the metrics module, enabled and disabled.
+
+Times Histogram.observe, a Histogram.time() block and Counter.inc in a tight
+loop, single-threaded and from --threads threads at once, and how long
+rendering /metrics takes. With METRICS_ENABLED=0 each call should cost about
+as much as an empty function call.
+
+    python benchmarks/bench_metrics.py --calls 200000 --threads 4
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+
+
+def per_call(function, calls, threads=1):
+    def loop():
+        for _ in range(calls):
+            function()
+
+    workers = [threading.Thread(target=loop) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (calls * threads) * 1e9
+
+
+def timed_block():
+    with metrics.STAGE_SECONDS.time("gemini"):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    cases = {
+        "observe": lambda: metrics.STAGE_SECONDS.observe(0.042, "gemini"),
+        "time() block": timed_block,
+        "counter inc": lambda: metrics.UPSTREAM_ERRORS.inc("gemini"),
+    }
+    print(f"{'':14} {'enabled':>10} {'disabled':>10} {f'{args.threads} threads':>12}   (ns per call)")
+    for name, function in cases.items():
+        metrics.METRICS_ENABLED = True
+        enabled = per_call(function, args.calls)
+        contended = per_call(function, args.calls // args.threads, args.threads)
+        metrics.METRICS_ENABLED = False
+        disabled = per_call(function, args.calls)
+        print(f"{name:14} {enabled:10.0f} {disabled:10.0f} {contended:12.0f}")
+
+    metrics.METRICS_ENABLED = True
+    for stage in ("language_detection", "image_fetch", "json_extraction", "translation", "reply_send"):
+        metrics.STAGE_SECONDS.observe(0.1, stage)
+    start = time.perf_counter()
+    body = metrics.render()
+    print(f"render: {len(body)} bytes in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
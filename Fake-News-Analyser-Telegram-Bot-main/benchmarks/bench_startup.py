@@ -0,0 +1,110 @@
+"""
+Import time, time to ready and first-request latency of server.py, with and without warm-up.
+
+Each run starts server.py in a subprocess pointed at a local fake Gemini
+(benchmarks/fake_gemini.py) and sends one POST /api/analyze:
+
+    cold    WARMUP_ENABLED=0; the request is sent as soon as /health answers,
+            so it pays for creating the Gemini client and opening connections
+    warm    the request is sent once /ready returns 200
+
+Import time and the server-side first-request latency come from the
+"startup" section of /api/cache/stats. Against real Gemini the warm run
+also skips DNS and the TLS handshake, so the gap is larger than shown here.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+from load_suite import APP_DIR, free_port  # noqa: E402
+
+
+def wait_for(http, path, process, timeout=60):
+    """Poll path until it returns 200; returns seconds waited."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"server.py exited with status {process.returncode}")
+        try:
+            if http.get(path).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    raise RuntimeError(f"{path} did not return 200 within {timeout}s")
+
+
+def run_once(mode, gemini_url, run):
+    port = free_port()
+    workdir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        GEMINI_BASE_URL=gemini_url,
+        GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "fake-key"),
+        VERDICT_CACHE_PATH=os.path.join(workdir, "verdict_cache.db"),
+        VERDICT_STORE_PATH=os.path.join(workdir, "verdict_store.db"),
+        WARMUP_ENABLED="0" if mode == "cold" else "1",
+        LINK_CHECK_ENABLED="0",
+    )
+    env.pop("SARVAM_API_KEY", None)
+    env.pop("TELEGRAM_WEBHOOK_URL", None)
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as http:
+            wait_for(http, "/health", process)
+            up = time.perf_counter() - started
+            ready = wait_for(http, "/ready", process) + up if mode == "warm" else None
+            before = time.perf_counter()
+            response = http.post("/api/analyze", json={"text": f"Startup benchmark claim number {run} about the city water supply"})
+            response.raise_for_status()
+            client_seconds = time.perf_counter() - before
+            stats = http.get("/api/cache/stats").json()["startup"]
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        "import": stats["import_seconds"],
+        "up": up,
+        "ready": ready,
+        "first_request": client_seconds,
+        "first_request_server": stats["first_request"]["seconds"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="server starts per mode")
+    parser.add_argument("--gemini-delay", type=float, default=0.2, help="fake Gemini latency per call (s)")
+    args = parser.parse_args()
+
+    fake = start_fake_gemini(delay=args.gemini_delay)
+    gemini_url = f"http://127.0.0.1:{fake.server_address[1]}"
+    print(f"{'mode':5} {'import s':>9} {'listening s':>12} {'ready s':>8} {'1st req s':>10} {'1st req (server) s':>19}")
+    for mode in ("cold", "warm"):
+        results = [run_once(mode, gemini_url, run) for run in range(args.runs)]
+
+        def median(field):
+            values = [r[field] for r in results if r[field] is not None]
+            return f"{statistics.median(values):.3f}" if values else "-"
+
+        print(f"{mode:5} {median('import'):>9} {median('up'):>12} {median('ready'):>8} "
+              f"{median('first_request'):>10} {median('first_request_server'):>19}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Precision, Gemini calls saved and latency of local triage.
+
+Builds a verdict store from synthetic claim families (a claim plus the
+reworded forwards it picks up), each labelled Fake, Real or Uncertain,
+trains the triage model from it, then routes a held-out mix of:
+
+    known      new rewordings of stored families
+    novel      claims from families the store has never seen
+    short      brief unseen claims, the kind a greeting filter could swallow
+    non-claim  greetings and chit-chat not among the seeds
+
+A known route is correct when it returns the stored analysis of the same
+family; a non-claim route is correct for non-claims only. Everything else
+that is not escalated is a wrong answer a user would see.
+
+    python benchmarks/bench_triage.py --families 2000 --variants 4
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from triage import Triage, train, training_examples  # noqa: E402
+from verdict_store import VerdictStore  # noqa: E402
+
+PREDICATES = {
+    "Fake": ["will give free recharge of 5000 rupees to every citizen who shares this",
+             "has confirmed that drinking hot water every hour kills the virus",
+             "is secretly adding microchips to the new currency notes",
+             "will shut down all mobile networks tonight for cosmic radiation",
+             "announced that the WhatsApp logo turning blue means your chats are monitored"],
+    "Real": ["has released the results of the annual board examinations",
+             "opened a new metro line connecting the airport this week",
+             "announced a holiday for the state assembly elections",
+             "raised the repo rate by twenty five basis points on Wednesday"],
+    "Uncertain": ["may announce a new scheme for farmers later this year",
+                  "is reportedly planning to rename the old railway station"],
+}
+MARKERS = ["Forwarded as received", "*MUST READ*", "Please share with everyone", "Breaking news", ""]
+EMOJIS = ["🙏", "🚨", "‼️", "😱", "👇", ""]
+NON_CLAIMS = ["good morning friends 🌞", "Hi bot!", "thanks bhai", "gm all", "namaste ji 🙏", "ok 👍",
+              "Hello, how are you doing today?", "thank u", "good nite", "Happy Holi to all of you",
+              "hey there", "okk", "shubh sandhya", "Jai Mata Di", "sweet dreams", "hello hello",
+              "have a great weekend", "nice one", "wow", "good noon everyone"]
+SHORT_CLAIMS = ["Schools closed tomorrow", "Petrol is free today", "Banks shut for 5 days", "Curfew from tonight",
+                "Salt shortage in Delhi", "Exams cancelled", "Milk price doubled", "Gas cylinder now 200 rupees",
+                "hi, is the lockdown back?", "good morning, heard trains are cancelled today"]
+
+
+def make_name(rng):
+    syllables = ["ka", "ri", "mo", "ta", "shi", "ven", "dra", "pur", "lal", "nag", "ko", "bha", "sun", "der"]
+    return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def make_family(rng):
+    label = rng.choices(list(PREDICATES), weights=[5, 4, 2])[0]
+    subject = f"The {make_name(rng)} {rng.choice(['government', 'district office', 'health board', 'bank', 'company'])}"
+    detail = f"according to {make_name(rng)} {make_name(rng)} from {make_name(rng)}"
+    return label, f"{subject} {rng.choice(PREDICATES[label])}, {detail}."
+
+
+def reword(rng, claim):
+    words = claim.split()
+    for _ in range(rng.randint(1, 2)):
+        action = rng.choice(["drop", "swap", "upper"])
+        i = rng.randrange(1, len(words) - 1)
+        if action == "drop":
+            del words[i]
+        elif action == "swap":
+            words[i], words[i + 1] = words[i + 1], words[i]
+        else:
+            words[i] = words[i].upper()
+    marker, emoji = rng.choice(MARKERS), rng.choice(EMOJIS)
+    return f"{marker}\n{emoji} {' '.join(words)} {emoji}".strip()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--families", type=int, default=2000, help="claim families in the store")
+    parser.add_argument("--variants", type=int, default=4, help="stored rewordings per family")
+    parser.add_argument("--queries", type=int, default=1000, help="held-out messages per kind")
+    parser.add_argument("--known-threshold", type=float, default=0.95)
+    parser.add_argument("--non-claim-threshold", type=float, default=0.9)
+    parser.add_argument("--min-similarity", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp()
+    store = VerdictStore(path=os.path.join(workdir, "verdict_store.db"), queue_size=10 ** 7, enabled=True)
+    families = [make_family(rng) for _ in range(args.families)]
+    for family_id, (label, claim) in enumerate(families):
+        for text in [claim] + [reword(rng, claim) for _ in range(args.variants)]:
+            store.record(text, {"verdict": label, "confidence": 0.9, "sources": {},
+                                "reason": f"Family {family_id}: checked by the fact-check desk."})
+    store.close(timeout=None)
+
+    start = time.perf_counter()
+    examples = training_examples(store.path)
+    model = train(examples)
+    model_path = os.path.join(workdir, "triage_model.bin")
+    model.save(model_path)
+    print(f"trained on {len(examples)} examples in {time.perf_counter() - start:.1f}s, "
+          f"model {os.path.getsize(model_path) / 1e6:.1f} MB")
+
+    reader = VerdictStore(path=store.path, enabled=True)
+    triage = Triage(path=model_path, store=reader, enabled=True, known_threshold=args.known_threshold,
+                    non_claim_threshold=args.non_claim_threshold, min_similarity=args.min_similarity)
+    triage.load()
+
+    queries = []
+    for _ in range(args.queries):
+        family_id = rng.randrange(len(families))
+        queries.append(("known", family_id, reword(rng, families[family_id][1])))
+        queries.append(("novel", None, reword(rng, make_family(rng)[1])))
+        queries.append(("short", None, rng.choice(SHORT_CLAIMS)))
+        queries.append(("non-claim", None, rng.choice(NON_CLAIMS)))
+
+    outcomes = {kind: {"non_claim": 0, "known": 0, "escalate": 0, "wrong": 0} for kind in ("known", "novel", "short", "non-claim")}
+    latencies = []
+    for kind, family_id, text in queries:
+        before = time.perf_counter()
+        route, match = triage.classify(text)
+        latencies.append((time.perf_counter() - before) * 1000)
+        outcomes[kind][route] += 1
+        if route == "known":
+            right = kind == "known" and match["reason"].startswith(f"Family {family_id}:")
+        else:
+            right = route == "escalate" or kind == "non-claim"
+        outcomes[kind]["wrong"] += not right
+
+    print(f"{'kind':10} {'non_claim':>10} {'known':>7} {'escalate':>9} {'wrong':>6}")
+    for kind, counts in outcomes.items():
+        print(f"{kind:10} {counts['non_claim']:10} {counts['known']:7} {counts['escalate']:9} {counts['wrong']:6}")
+    routed = sum(c["non_claim"] + c["known"] for c in outcomes.values())
+    wrong = sum(c["wrong"] for c in outcomes.values())
+    print(f"answered locally: {routed / len(queries):.1%} of messages (Gemini calls saved), "
+          f"precision {1 - wrong / routed if routed else 0:.2%}")
+    print(f"latency per message: p50 {percentile(latencies, 50):.2f} ms, p99 {percentile(latencies, 99):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
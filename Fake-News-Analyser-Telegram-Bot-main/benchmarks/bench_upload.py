@@ -0,0 +1,152 @@
+"""
+Per-upload latency and memory of /api/analyze/upload: temp-file vs in-memory.
+
+Starts the API under uvicorn in a subprocess with the Gemini call stubbed out,
+so only upload handling is measured, and posts N multipart image uploads at a
+given concurrency. The "tempfile" mode serves a copy of the previous handler
+(write the upload to a NamedTemporaryFile, let create_news_input read it back,
+unlink) with Starlette's default 1 MB multipart spool; "memory" is the current
+endpoint. Peak Python heap of the server process comes from tracemalloc.
+
+    python benchmarks/bench_upload.py --uploads 64 --concurrency 16 --size-mb 5
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CANNED_RESPONSE = '{"verdict": "Fake", "confidence": 0.9, "reason": "stub", "sources": {}}'
+MODES = {"tempfile": "/bench/legacy-upload", "memory": "/api/analyze/upload"}
+
+
+def make_image(size):
+    """A PNG signature followed by filler, enough for MIME sniffing."""
+    return b"\x89PNG\r\n\x1a\n" + os.urandom(size - 8)
+
+
+def serve(port, mode):
+    """Server side: the API with Gemini stubbed, plus the legacy handler and a heap probe."""
+    import tracemalloc
+
+    import uvicorn
+    from fastapi import File, Form, UploadFile
+    from starlette.formparsers import MultiPartParser
+
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    os.environ["VERDICT_CACHE_ENABLED"] = "0"
+    import server
+
+    async def analyze_news_async(news_input, **kwargs):
+        return CANNED_RESPONSE
+    server.analyze_news_async = analyze_news_async
+
+    @server.app.post("/bench/legacy-upload")
+    async def legacy_upload(text: str = Form(None), image: UploadFile = File(None)):
+        image_path = None
+        try:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
+                image_path = temp_file.name
+                contents = await image.read()
+                temp_file.write(contents)
+            news_input = await server.create_news_input_async(news_text=text or "", image_source=image_path)
+            return server.extract_json_from_response(await analyze_news_async(news_input), text or "")
+        finally:
+            if image_path and os.path.exists(image_path):
+                os.unlink(image_path)
+
+    @server.app.post("/bench/reset-peak")
+    async def reset_peak():
+        tracemalloc.reset_peak()
+        return {}
+
+    @server.app.get("/bench/peak")
+    async def peak():
+        return {"peak": tracemalloc.get_traced_memory()[1]}
+
+    if mode == "tempfile":
+        MultiPartParser.spool_max_size = 1024 * 1024
+    tracemalloc.start()
+    uvicorn.run(server.app, port=port, log_level="warning")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(base_url, path, image, uploads, concurrency):
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as http:
+        async def upload(i):
+            async with semaphore:
+                t0 = time.perf_counter()
+                response = await http.post(path, data={"text": f"claim {i}"},
+                                           files={"image": ("image.png", image, "image/png")})
+                latencies.append(time.perf_counter() - t0)
+                assert response.status_code == 200, response.text
+
+        await http.post("/bench/reset-peak")
+        start = time.perf_counter()
+        await asyncio.gather(*(upload(i) for i in range(uploads)))
+        wall = time.perf_counter() - start
+        peak = (await http.get("/bench/peak")).json()["peak"]
+    return wall, latencies, peak
+
+
+def measure(mode, image, args):
+    import httpx
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(port), "--mode", mode])
+    try:
+        for _ in range(200):
+            try:
+                httpx.get(f"{base_url}/health")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        asyncio.run(run(base_url, MODES[mode], image, args.concurrency, args.concurrency))  # warm-up
+        wall, latencies, peak = asyncio.run(run(base_url, MODES[mode], image, args.uploads, args.concurrency))
+    finally:
+        process.terminate()
+        process.wait()
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{mode:9} wall {wall:6.2f}s  p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+          f"p99 {p99 * 1000:7.1f} ms  server peak heap {peak / 1e6:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--size-mb", type=float, default=5.0)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.mode)
+        return
+
+    image = make_image(int(args.size_mb * 1024 * 1024))
+    print(f"{args.uploads} uploads of {args.size_mb} MB at concurrency {args.concurrency}")
+    for mode in MODES:
+        measure(mode, image, args)
+
+
+if __name__ == "__main__":
+    main()
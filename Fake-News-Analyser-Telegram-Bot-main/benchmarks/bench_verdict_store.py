@@ -0,0 +1,107 @@
+"""
+Write throughput and search latency of the verdict store.
+
+Fills a fresh store with --rows synthetic analyses through record(), the
+same batched path server.py and the bot use, timing both the caller's cost
+per record() and the writer's rows per second. Then runs searches for rare,
+mid-frequency and very common words, two-word queries and filtered queries,
+and reports p50/p95/p99 latency for each.
+
+    python benchmarks/bench_verdict_store.py --rows 1000000 --queries 300
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from verdict_store import VerdictStore  # noqa: E402
+
+VERDICTS = ["Fake", "Real", "Uncertain"]
+LANGUAGES = ["en-IN", "hi-IN", "ta-IN", "bn-IN"]
+
+
+def make_vocabulary(rng, size=50000):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+
+
+def make_text(rng, vocabulary, weights, words):
+    # Zipfian word choice, so a few words are very common and most are rare
+    return " ".join(rng.choices(vocabulary, cum_weights=weights, k=words)).capitalize() + "."
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200, help="searches per query kind")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--path", help="store file (default: a temporary file)")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    path = args.path or os.path.join(tempfile.mkdtemp(), "verdict_store.db")
+    store = VerdictStore(path=path, batch_size=args.batch_size, queue_size=args.rows + 1, enabled=True)
+
+    record_seconds = 0.0
+    start = time.perf_counter()
+    for i in range(args.rows):
+        text = make_text(rng, vocabulary, weights, rng.randint(8, 30))
+        result = {
+            "verdict": rng.choice(VERDICTS),
+            "confidence": round(rng.random(), 2),
+            "reason": make_text(rng, vocabulary, weights, rng.randint(15, 40)),
+            "sources": {"Fact Check": f"https://example.org/check/{i}"},
+        }
+        before = time.perf_counter()
+        store.record(text, result, language=rng.choice(LANGUAGES))
+        record_seconds += time.perf_counter() - before
+    store.close(timeout=None)
+    wall = time.perf_counter() - start
+    stats = store.stats()
+    print(f"{stats['written']} rows in {stats['batches']} batches, {wall:.1f}s "
+          f"({stats['written'] / wall:,.0f} rows/s), record() {record_seconds / args.rows * 1e6:.1f} us/call, "
+          f"{os.path.getsize(path) / 1e6:.0f} MB")
+
+    reader = VerdictStore(path=path, enabled=True)
+    kinds = {
+        "common word": lambda: rng.choice(vocabulary[:10]),
+        "mid word": lambda: rng.choice(vocabulary[100:1000]),
+        "rare word": lambda: rng.choice(vocabulary[10000:]),
+        "two words": lambda: f"{rng.choice(vocabulary[:200])} {rng.choice(vocabulary[200:5000])}",
+        "filtered": lambda: rng.choice(vocabulary[10:100]),
+        "page 5": lambda: rng.choice(vocabulary[:100]),
+    }
+    print(f"{'query':12} {'p50':>8} {'p95':>8} {'p99':>8} {'hits/page':>10}")
+    for kind, make_query in kinds.items():
+        latencies, hits = [], 0
+        for _ in range(args.queries):
+            options = {"page_size": args.page_size}
+            if kind == "filtered":
+                options.update(verdict="Fake", language="hi-IN")
+            if kind == "page 5":
+                options["page"] = 5
+            query = make_query()
+            before = time.perf_counter()
+            hits += len(reader.search(query, **options)["results"])
+            latencies.append((time.perf_counter() - before) * 1000)
+        print(f"{kind:12} {percentile(latencies, 50):6.2f}ms {percentile(latencies, 95):6.2f}ms "
+              f"{percentile(latencies, 99):6.2f}ms {hits / args.queries:10.1f}")
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()
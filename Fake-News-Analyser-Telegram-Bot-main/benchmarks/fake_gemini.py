@@ -0,0 +1,124 @@
+"""
+Local stand-in for the Gemini generateContent API.
+
+Answers every generateContent call with a fixed verdict after a configurable
+delay, so load tests can run without network access or API cost.
+streamGenerateContent calls get the same verdict as server-sent events in
+small chunks, spread over the delay. With delay_per_char, each call also
+takes that many extra seconds per character of request text, for tests where
+longer prompts should answer more slowly. With echo, the reason quotes the
+last text part of the request, so replies can be matched to messages.
+Point the analyser at it with GEMINI_BASE_URL=http://127.0.0.1:<port>.
+
+    python benchmarks/fake_gemini.py --port 8090 --delay 2.0
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_VERDICT = {
+    "verdict": "Fake",
+    "confidence": 0.9,
+    "reason": "No credible outlet has reported this claim.",
+    "sources": {"Fact Check": "https://example.org/fact-check"},
+}
+
+
+def generate_content_body(text):
+    return {
+        "candidates": [
+            {
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+            }
+        ]
+    }
+
+
+def request_text_length(request_body):
+    """Characters of text across the request's parts."""
+    try:
+        contents = json.loads(request_body).get("contents", [])
+    except ValueError:
+        return 0
+    return sum(len(part.get("text", "")) for content in contents for part in content.get("parts", []))
+
+
+def echo_verdict(request_body):
+    """The default verdict with the request's last text part as the reason."""
+    texts = [part["text"] for content in json.loads(request_body).get("contents", [])
+             for part in content.get("parts", []) if "text" in part]
+    return json.dumps({**DEFAULT_VERDICT, "reason": f"Checked: {texts[-1] if texts else ''}"})
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    delay = 1.0
+    stream_chunk_size = 16
+    response_text = json.dumps(DEFAULT_VERDICT)
+    delay_per_char = 0.0
+    echo = False
+    calls = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = self.rfile.read(length)
+        if self.echo:
+            self.response_text = echo_verdict(request)
+        delay = self.delay + self.delay_per_char * request_text_length(request)
+        with FakeGeminiHandler.lock:
+            FakeGeminiHandler.calls += 1
+        if ":streamGenerateContent" in self.path:
+            self.stream_response(delay)
+            return
+        if ":generateContent" not in self.path:
+            self.send_error(404)
+            return
+        time.sleep(delay)
+        body = json.dumps(generate_content_body(self.response_text)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_response(self, delay):
+        size = self.stream_chunk_size
+        chunks = [self.response_text[i:i + size] for i in range(0, len(self.response_text), size)]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for chunk in chunks:
+            time.sleep(delay / len(chunks))
+            event = json.dumps(generate_content_body(chunk))
+            self.wfile.write(f"data: {event}\r\n\r\n".encode("utf-8"))
+            self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_gemini(port=0, delay=1.0, response_text=None, echo=False, delay_per_char=0.0):
+    """Start the fake server in a background thread and return it (see server.server_address)."""
+    handler = type("Handler", (FakeGeminiHandler,), {"delay": delay, "echo": echo, "delay_per_char": delay_per_char})
+    if response_text is not None:
+        handler.response_text = response_text
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Gemini generateContent server")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds per generateContent call")
+    args = parser.parse_args()
+    server = start_fake_gemini(args.port, args.delay)
+    print(f"Fake Gemini listening on http://127.0.0.1:{server.server_address[1]} (delay {args.delay}s)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
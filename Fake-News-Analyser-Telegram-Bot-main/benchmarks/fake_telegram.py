@@ -0,0 +1,169 @@
+"""
+Local stand-in for the Telegram Bot API, enough to drive bot.py under load.
+
+Serves getMe, getUpdates (long polling over injected updates), sendMessage,
+getFile and file downloads, deleteWebhook/setWebhook, and records when each
+update was handed to the bot, each file download and each reply. Point the bot
+at it with TELEGRAM_BASE_URL=http://127.0.0.1:<port>.
+
+    server = start_fake_telegram()
+    server.state.add_text_message(chat_id=1, text="...")
+"""
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot",
+            "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False}
+
+
+class FakeTelegramState:
+    """Pending updates, delivery times and replies, shared by the handler threads."""
+
+    def __init__(self, download_bandwidth=0):
+        self.download_bandwidth = download_bandwidth  # bytes per second for file downloads, 0 = unlimited
+        self.condition = threading.Condition()
+        self.updates = []
+        self.update_ids = itertools.count(1)
+        self.message_ids = itertools.count(1)
+        self.delivered = {}  # update_id -> time first returned by getUpdates
+        self.replies = []  # (time, chat_id, text)
+        self.files = {}  # file_id -> bytes
+        self.downloads = []  # (time, file_id, bytes served)
+
+    def add_update(self, update):
+        with self.condition:
+            update = {"update_id": next(self.update_ids), **update}
+            self.updates.append(update)
+            self.condition.notify_all()
+            return update["update_id"]
+
+    def message(self, chat_id, user_id=None, **fields):
+        return {
+            "message_id": next(self.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": user_id or chat_id, "is_bot": False, "first_name": f"User{chat_id}"},
+            **fields,
+        }
+
+    def add_text_message(self, chat_id, text, user_id=None):
+        return self.add_update({"message": self.message(chat_id, user_id, text=text)})
+
+    def add_photo_message(self, chat_id, sizes, caption=None, user_id=None):
+        """sizes: list of (width, height, bytes), smallest first as Telegram sends them."""
+        photo = []
+        for index, (width, height, data) in enumerate(sizes):
+            file_id = f"photo-{chat_id}-{len(self.files)}-{index}"
+            self.files[file_id] = data
+            photo.append({"file_id": file_id, "file_unique_id": file_id, "width": width,
+                          "height": height, "file_size": len(data)})
+        fields = {"photo": photo}
+        if caption:
+            fields["caption"] = caption
+        return self.add_update({"message": self.message(chat_id, user_id, **fields)})
+
+    def get_updates(self, offset, timeout):
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                pending = [u for u in self.updates if u["update_id"] >= offset]
+                remaining = deadline - time.monotonic()
+                if pending or remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            # Updates below the offset are confirmed and can be dropped
+            self.updates = pending
+            now = time.perf_counter()
+            for update in pending:
+                self.delivered.setdefault(update["update_id"], now)
+            return pending
+
+    def add_reply(self, chat_id, text):
+        with self.condition:
+            self.replies.append((time.perf_counter(), chat_id, text))
+            self.condition.notify_all()
+
+    def wait_for_replies(self, count, timeout):
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while len(self.replies) < count and time.monotonic() < deadline:
+                self.condition.wait(deadline - time.monotonic())
+            return len(self.replies) >= count
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def do_GET(self):
+        # /file/bot<token>/<file_path>
+        file_id = self.path.rsplit("/", 1)[-1]
+        data = self.state.files.get(file_id)
+        if data is None:
+            self.send_error(404)
+            return
+        if self.state.download_bandwidth:
+            time.sleep(len(data) / self.state.download_bandwidth)
+        self.state.downloads.append((time.perf_counter(), file_id, len(data)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        method = urlparse(self.path).path.rsplit("/", 1)[-1]
+        params = self.read_params()
+        if method == "getMe":
+            result = BOT_USER
+        elif method in ("deleteWebhook", "setWebhook"):
+            result = True
+        elif method == "getUpdates":
+            result = self.state.get_updates(int(params.get("offset") or 0), float(params.get("timeout") or 0))
+        elif method == "sendMessage":
+            chat_id = int(params["chat_id"])
+            self.state.add_reply(chat_id, params.get("text", ""))
+            result = self.state.message(chat_id, text=params.get("text", ""))
+            result["from"] = BOT_USER
+        elif method == "getFile":
+            file_id = params["file_id"]
+            data = self.state.files.get(file_id, b"")
+            result = {"file_id": file_id, "file_unique_id": file_id, "file_size": len(data), "file_path": file_id}
+        else:
+            result = True
+        body = json.dumps({"ok": True, "result": result}).encode("utf-8")
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the bot stopped polling while a getUpdates call was open
+
+    def read_params(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        content_type = self.headers.get("Content-Type", "")
+        if "json" in content_type:
+            return json.loads(body or b"{}")
+        if "x-www-form-urlencoded" in content_type:
+            return dict(parse_qsl(body.decode("utf-8")))
+        return {}
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_telegram(port=0, download_bandwidth=0):
+    """Start the fake Bot API in a background thread; its FakeTelegramState is server.state."""
+    state = FakeTelegramState(download_bandwidth)
+    handler = type("Handler", (FakeTelegramHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,277 @@
+"""
+Offline load test of server.py and the Telegram bot against recorded upstreams.
+
+Starts benchmarks/standin.py in replay mode (Gemini, Sarvam and Telegram
+responses from fixtures, with a latency model per upstream), then runs
+server.py in a subprocess pointed at it. The bot runs in webhook mode inside
+the server. The suite sends an open-loop Poisson stream of requests at --rps
+for --duration seconds, mixed by --mix:
+
+    analyze   POST /api/analyze with a text claim
+    upload    POST /api/analyze/upload with a JPEG and a caption
+    bot       a Telegram text message posted to /telegram/webhook, timed until
+              the bot's reply reaches the stand-in's sendMessage
+
+It reports throughput, p50/p95/p99 latency and the error rate per kind, plus
+how the stand-in matched upstream calls. Arrivals, payloads and sampled
+latencies come from --seed, so runs are reproducible on any machine with no
+network. The server subprocess inherits the environment, so settings such as
+GEMINI_MAX_CONCURRENCY or GEMINI_RPM_LIMIT can be varied from the shell. The
+bot needs its logs/logger_config module on the path, like bot.py itself.
+
+    python benchmarks/load_suite.py --rps 10 --duration 30 --mix analyze=6,upload=2,bot=2
+    python benchmarks/load_suite.py --gemini-latency lognormal:1.5,8 --json results.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from standin import DEFAULT_FIXTURES, start_standin  # noqa: E402
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLAIMS_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "telegram_updates.jsonl")
+SECRET = "load-suite-secret"
+# Replies the bot sends when it could not produce a verdict
+BOT_ERROR_REPLIES = ("Sorry", "An error occurred", "Too many requests")
+
+
+def load_claims(path):
+    """Claim texts from a getUpdates-style fixture (commands skipped)."""
+    claims = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            text = json.loads(line).get("message", {}).get("text", "") if line.strip() else ""
+            if text and not text.startswith("/"):
+                claims.append(text)
+    return claims
+
+
+def make_images(rng):
+    """A few JPEGs of phone-photo and screenshot sizes."""
+    from PIL import Image, ImageDraw
+
+    images = []
+    for width, height in ((640, 480), (1280, 960), (1080, 2340)):
+        image = Image.effect_noise((width, height), 25).convert("RGB")
+        draw = ImageDraw.Draw(image)
+        for _ in range(12):
+            x, y = rng.randrange(width), rng.randrange(height)
+            draw.rectangle((x, y, x + width // 4, y + 30), fill=tuple(rng.randrange(256) for _ in range(3)))
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=85)
+        images.append(output.getvalue())
+    return images
+
+
+def make_schedule(args, claims, images):
+    """Open-loop arrivals: (offset seconds, kind, payload), all drawn from --seed."""
+    rng = random.Random(args.seed)
+    mix = dict((name, float(weight)) for name, weight in (part.split("=") for part in args.mix.split(",")))
+    kinds, weights = list(mix), list(mix.values())
+    schedule, offset = [], 0.0
+    while True:
+        offset += rng.expovariate(args.rps)
+        if offset >= args.duration:
+            return schedule
+        kind = rng.choices(kinds, weights)[0]
+        claim = rng.choice(claims)
+        if not args.repeat_claims:
+            claim = f"{claim} #{len(schedule)}"
+        schedule.append((offset, kind, {"text": claim, "image": rng.choice(images) if kind == "upload" else None}))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, standin_url, port, bot, cache_dir):
+    env = dict(
+        os.environ,
+        GEMINI_BASE_URL=standin_url,
+        SARVAM_BASE_URL=standin_url,
+        GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "standin-key"),
+        VERDICT_CACHE_PATH=os.path.join(cache_dir, "verdict_cache.db"),
+    )
+    env.pop("SARVAM_API_KEY", None)  # skips the translation prewarm burst at startup
+    env["LINK_CHECK_ENABLED"] = "0"  # source links would be probed on the real network
+    if not args.cache:
+        env.update(VERDICT_CACHE_ENABLED="0", CLAIM_INDEX_ENABLED="0", TRANSLATION_MEMORY_ENABLED="0")
+    if bot:
+        env.update(
+            TELEGRAM_BOT_TOKEN="123:standin",
+            TELEGRAM_BASE_URL=standin_url,
+            TELEGRAM_WEBHOOK_URL=f"http://127.0.0.1:{port}",
+            TELEGRAM_WEBHOOK_SECRET=SECRET,
+        )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL if args.quiet else None,
+    )
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+async def wait_ready(http, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server.py exited with status {process.returncode}")
+        try:
+            if (await http.get("/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server.py did not become ready")
+
+
+async def run(args, schedule, base_url, standin, process):
+    import httpx
+
+    results = {kind: [] for _, kind, _ in schedule}  # kind -> [(ok, latency seconds)]
+    replies = {}  # chat id -> future resolved with (time, text)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as http:
+        await wait_ready(http, process)
+
+        async def watch_replies():
+            seen = 0
+            while True:
+                new, seen = standin.state.replies[seen:], len(standin.state.replies)
+                for reply_time, chat_id, text in new:
+                    future = replies.pop(chat_id, None)
+                    if future is not None and not future.done():
+                        future.set_result((reply_time, text))
+                await asyncio.sleep(0.01)
+
+        async def analyze(payload, index):
+            response = await http.post("/api/analyze", json={"text": payload["text"]})
+            return response.status_code == 200
+
+        async def upload(payload, index):
+            response = await http.post(
+                "/api/analyze/upload",
+                data={"text": payload["text"]},
+                files={"image": ("photo.jpg", payload["image"], "image/jpeg")},
+            )
+            return response.status_code == 200
+
+        async def bot(payload, index):
+            chat_id = 10 ** 9 + index
+            future = replies[chat_id] = asyncio.get_running_loop().create_future()
+            update = {"update_id": index + 1, "message": {
+                "message_id": index + 1, "date": int(time.time()), "text": payload["text"],
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": f"Load{index}"},
+            }}
+            response = await http.post("/telegram/webhook", json=update,
+                                       headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+            if response.status_code != 200:
+                replies.pop(chat_id, None)
+                return False
+            _, text = await asyncio.wait_for(future, args.timeout)
+            return not text.startswith(BOT_ERROR_REPLIES)
+
+        async def send(index, kind, payload):
+            started = time.perf_counter()
+            try:
+                ok = await senders[kind](payload, index)
+            except Exception:
+                ok = False
+            results[kind].append((ok, time.perf_counter() - started))
+
+        senders = {"analyze": analyze, "upload": upload, "bot": bot}
+        watcher = asyncio.create_task(watch_replies())
+        start = time.perf_counter()
+        tasks = []
+        for index, (offset, kind, payload) in enumerate(schedule):
+            await asyncio.sleep(max(0.0, start + offset - time.perf_counter()))
+            tasks.append(asyncio.create_task(send(index, kind, payload)))
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - start
+        watcher.cancel()
+        scheduler = (await http.get("/api/cache/stats")).json().get("gemini_scheduler", {})
+    return results, wall, scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=10, help="mean arrival rate, requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of arrivals")
+    parser.add_argument("--mix", default="analyze=6,upload=2,bot=2", help="relative weights per kind")
+    parser.add_argument("--fixtures", nargs="+", default=[DEFAULT_FIXTURES])
+    parser.add_argument("--gemini-latency", default="recorded")
+    parser.add_argument("--sarvam-latency", default="recorded")
+    parser.add_argument("--telegram-latency", default="fixed:0.05")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument("--cache", action="store_true", help="keep the verdict cache and translation memory on")
+    parser.add_argument("--repeat-claims", action="store_true",
+                        help="send fixture claims verbatim, so identical ones can coalesce")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--quiet", action="store_true", help="hide the server's log output")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    schedule = make_schedule(args, load_claims(CLAIMS_FIXTURE), make_images(rng))
+    standin = start_standin(
+        fixtures=args.fixtures,
+        latency={"gemini": args.gemini_latency, "sarvam": args.sarvam_latency, "telegram": args.telegram_latency},
+        seed=args.seed,
+    )
+    standin_url = f"http://127.0.0.1:{standin.server_address[1]}"
+    port = free_port()
+    has_bot = any(kind == "bot" for _, kind, _ in schedule)
+    print(f"{len(schedule)} requests over {args.duration:g}s (~{args.rps:g} rps, mix {args.mix}), "
+          f"Gemini latency {args.gemini_latency}, seed {args.seed}")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        process = start_server(args, standin_url, port, has_bot, cache_dir)
+        try:
+            results, wall, scheduler = asyncio.run(run(args, schedule, f"http://127.0.0.1:{port}", standin, process))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    report = {"wall_seconds": round(wall, 2), "kinds": {}, "standin": standin.state.stats(),
+              "gemini_scheduler": {key: scheduler.get(key) for key in ("calls", "concurrency_limit", "rejected", "timeouts", "wait_ms")}}
+    print(f"{'kind':8} {'sent':>6} {'ok':>6} {'errors':>7} {'ok/s':>7} {'p50':>7} {'p95':>7} {'p99':>7}")
+    for kind, samples in sorted(results.items()):
+        latencies = [latency for ok, latency in samples if ok]
+        errors = sum(not ok for ok, _ in samples)
+        row = {
+            "sent": len(samples),
+            "ok": len(latencies),
+            "error_rate": round(errors / len(samples), 4),
+            "throughput": round(len(latencies) / wall, 2),
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+        }
+        report["kinds"][kind] = row
+        print(f"{kind:8} {row['sent']:6} {row['ok']:6} {row['error_rate']:7.1%} {row['throughput']:7.2f} "
+              f"{row['p50']:6.2f}s {row['p95']:6.2f}s {row['p99']:6.2f}s")
+    print(f"stand-in: {json.dumps(report['standin'])}")
+    print(f"gemini scheduler: {json.dumps(report['gemini_scheduler'])}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Concurrency load test for /api/analyze against a local fake Gemini.
+
+Fires N concurrent requests with distinct claims while probing /health, and
+reports whether the Gemini round trips overlap (wall time close to one
+delay) or serialize (wall time close to N delays). With --identical every
+request carries the same claim, which should reach Gemini only once.
+
+    python benchmarks/load_test_async.py --requests 20 --delay 1.0
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+
+
+async def run(args):
+    import httpx
+    import server
+
+    # Language detection calls Sarvam, which is out of scope for this test
+    async def detect_language(text):
+        return "en"
+    server.detect_language = detect_language
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as http:
+        health_latencies = []
+        done = asyncio.Event()
+
+        async def probe_health():
+            while not done.is_set():
+                t0 = time.perf_counter()
+                await http.get("/health")
+                health_latencies.append(time.perf_counter() - t0)
+                await asyncio.sleep(0.05)
+
+        async def analyze(i):
+            t0 = time.perf_counter()
+            text = "Load test claim about a viral event" if args.identical else f"Load test claim number {i} about event {i * 7}"
+            response = await http.post("/api/analyze", json={"text": text})
+            return response.status_code, time.perf_counter() - t0
+
+        prober = asyncio.create_task(probe_health())
+        start = time.perf_counter()
+        results = await asyncio.gather(*(analyze(i) for i in range(args.requests)))
+        wall = time.perf_counter() - start
+        done.set()
+        await prober
+
+    ok = sum(1 for status, _ in results if status == 200)
+    serialized = args.requests * args.delay
+    waves = -(-args.requests // args.concurrency)
+    print(f"requests: {args.requests} ({ok} ok), fake Gemini delay {args.delay}s, "
+          f"GEMINI_MAX_CONCURRENCY={args.concurrency}")
+    print(f"wall time: {wall:.2f}s (serialized would be {serialized:.2f}s, "
+          f"ideal with cap {waves * args.delay:.2f}s)")
+    print(f"overlap factor: {serialized / wall:.1f}x")
+    print(f"fake Gemini calls: {args.fake.RequestHandlerClass.calls}")
+    print(f"/health during load: max {max(health_latencies) * 1000:.0f} ms over {len(health_latencies)} probes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=1.0, help="fake Gemini latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=8, help="GEMINI_MAX_CONCURRENCY for the run")
+    parser.add_argument("--identical", action="store_true", help="send the same claim in every request")
+    args = parser.parse_args()
+
+    fake = start_fake_gemini(delay=args.delay)
+    args.fake = fake
+    os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{fake.server_address[1]}"
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    os.environ["GEMINI_MAX_CONCURRENCY"] = str(args.concurrency)
+    # Every request must reach Gemini, so keep the caches out of the way
+    os.environ["VERDICT_CACHE_ENABLED"] = "0"
+    os.environ["CLAIM_INDEX_ENABLED"] = "0"
+    asyncio.run(run(args))
+    fake.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Replay recorded Telegram updates against the webhook route of server.py.
+
+Starts server.py under uvicorn with webhook mode on, pointed at the fake Bot
+API (benchmarks/fake_telegram.py) and a fake Gemini that echoes the claim,
+then posts every update in --updates to /telegram/webhook with the secret
+token header, as Telegram would. Reports how fast the route acknowledges
+updates, how many claims got a reply and the reply latency. Before the
+replay it checks that requests with a missing or wrong secret get 403 and a
+malformed body gets 400.
+
+--updates takes JSON lines of Update objects, e.g. a getUpdates dump;
+--repeat replays them again under fresh update and chat ids.
+
+Needs the bot's logs/logger_config module on the path, like bot.py itself.
+
+    python benchmarks/replay_webhook.py --repeat 5 --rate 50
+"""
+import argparse
+import asyncio
+import copy
+import json
+import logging
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+from fake_telegram import start_fake_telegram  # noqa: E402
+
+DEFAULT_UPDATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "telegram_updates.jsonl")
+SECRET = "replay-secret"
+
+
+def load_updates(path, repeat):
+    with open(path, encoding="utf-8") as f:
+        recorded = [json.loads(line) for line in f if line.strip()]
+    updates = []
+    for round_ in range(repeat):
+        for update in recorded:
+            update = copy.deepcopy(update)
+            update["update_id"] = len(updates) + 1
+            message = update.get("message") or update.get("edited_message")
+            if message and round_:
+                message["chat"]["id"] += round_ * 1000
+                if "text" in message and not message["text"].startswith("/"):
+                    message["text"] += f" #{round_}"
+            updates.append(update)
+    return updates
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+async def replay(base_url, updates, rate, state, timeout):
+    import httpx
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+        checks = {
+            "no secret": (await http.post("/telegram/webhook", json=updates[0])).status_code,
+            "wrong secret": (await http.post("/telegram/webhook", json=updates[0],
+                                             headers={"X-Telegram-Bot-Api-Secret-Token": "nope"})).status_code,
+            "malformed": (await http.post("/telegram/webhook", content=b"[1, 2", headers=headers)).status_code,
+        }
+        print("checks: " + ", ".join(f"{name} -> {status}" for name, status in checks.items()))
+
+        # Claims (message text that isn't a command) are answered with the text echoed back
+        claims = {u["message"]["text"]: None for u in updates
+                  if "text" in u.get("message", {}) and not u["message"]["text"].startswith("/")}
+        acks = []
+
+        async def post(update):
+            text = update.get("message", {}).get("text")
+            start = time.perf_counter()
+            if text in claims:
+                claims[text] = start
+            response = await http.post("/telegram/webhook", json=update, headers=headers)
+            acks.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        tasks = []
+        for index, update in enumerate(updates):
+            if rate:
+                await asyncio.sleep(max(0.0, start + index / rate - time.perf_counter()))
+            tasks.append(asyncio.create_task(post(update)))
+        await asyncio.gather(*tasks)
+
+        deadline = time.monotonic() + timeout
+        latencies = {}
+        while time.monotonic() < deadline and len(latencies) < len(claims):
+            for reply_time, _, reply in list(state.replies):
+                for text, sent in claims.items():
+                    if text not in latencies and f"Checked: {text}" in reply:
+                        latencies[text] = reply_time - sent
+            await asyncio.sleep(0.05)
+        wall = time.perf_counter() - start
+        stats = (await http.get("/api/cache/stats")).json()["telegram_webhook"]
+
+    lat = list(latencies.values())
+    print(f"acks:    {len(acks)} updates  p50 {statistics.median(acks) * 1000:6.1f} ms  "
+          f"p99 {percentile(acks, 0.99) * 1000:6.1f} ms")
+    print(f"replies: {len(lat)}/{len(claims)} claims in {wall:.1f}s  "
+          f"p50 {statistics.median(lat or [0]):5.2f}s  p99 {percentile(lat, 0.99):5.2f}s")
+    print(f"server:  {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", default=DEFAULT_UPDATES)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=0, help="updates per second (0 = all at once)")
+    parser.add_argument("--delay", type=float, default=0.5, help="fake Gemini latency in seconds")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    telegram = start_fake_telegram()
+    gemini = start_fake_gemini(delay=args.delay, echo=True)
+    port = free_port()
+    fake_api = f"http://127.0.0.1:{telegram.server_address[1]}"
+    os.environ.update(
+        TELEGRAM_BOT_TOKEN="123:fake",
+        TELEGRAM_BASE_URL=fake_api,
+        TELEGRAM_WEBHOOK_URL=f"http://127.0.0.1:{port}",
+        TELEGRAM_WEBHOOK_SECRET=SECRET,
+        GEMINI_BASE_URL=f"http://127.0.0.1:{gemini.server_address[1]}",
+        # Translation calls fail fast here and fall back to the original text
+        SARVAM_BASE_URL=fake_api,
+        VERDICT_CACHE_ENABLED="0",
+        CLAIM_INDEX_ENABLED="0",
+    )
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+
+    import uvicorn
+    import server
+    logging.disable(logging.WARNING)
+
+    uvicorn_server = uvicorn.Server(uvicorn.Config(server.app, port=port, log_level="warning"))
+    thread = threading.Thread(target=uvicorn_server.run, daemon=True)
+    thread.start()
+    while not uvicorn_server.started:
+        time.sleep(0.05)
+
+    updates = load_updates(args.updates, args.repeat)
+    print(f"replaying {len(updates)} updates" + (f" at {args.rate:g}/s" if args.rate else " at once"))
+    try:
+        asyncio.run(replay(f"http://127.0.0.1:{port}", updates, args.rate, telegram.state, args.timeout))
+    finally:
+        uvicorn_server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
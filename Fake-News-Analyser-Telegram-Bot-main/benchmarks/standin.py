@@ -0,0 +1,351 @@
+"""
+Record/replay stand-in for the Gemini, Sarvam and Telegram APIs.
+
+One local server answers all three, told apart by path: /v1*, /upload/v1* go
+to Gemini, /bot<token>/* and /file/bot<token>/* to Telegram, and everything
+else to Sarvam. Point the apps at it with
+
+    GEMINI_BASE_URL=http://127.0.0.1:<port>
+    SARVAM_BASE_URL=http://127.0.0.1:<port>
+    TELEGRAM_BASE_URL=http://127.0.0.1:<port>
+
+In record mode each request is forwarded to the real upstream, and the
+exchange is appended to a JSONL fixture: the response, how long it took and a
+hash of the request. API keys, the bot token and request bodies are never
+written. Streamed responses are relayed only once they are complete.
+
+    python benchmarks/standin.py record --out benchmarks/fixtures/recorded.jsonl
+
+In replay mode responses come from the fixtures, after a delay drawn from a
+latency model per upstream. A request with the same hash as a recorded one
+gets that response; any other request gets one of the responses recorded for
+the same endpoint, picked by request hash. Telegram sendMessage and file
+calls are answered directly. Replies are logged with their arrival time, so
+load tests can time the bot end to end. Latency models:
+
+    recorded              the latency measured while recording (default)
+    fixed:1.5             always 1.5 s
+    uniform:0.2-0.8       uniform between the bounds
+    lognormal:1.2,6       log-normal with p50 1.2 s and p99 6 s
+    none                  no delay
+
+    python benchmarks/standin.py replay --gemini-latency lognormal:1.5,8
+"""
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "standin_seed.jsonl")
+UPSTREAMS = {
+    "gemini": "https://generativelanguage.googleapis.com",
+    "sarvam": "https://api.sarvam.ai",
+    "telegram": "https://api.telegram.org",
+}
+# Request headers that carry credentials or only make sense per connection
+DROPPED_HEADERS = {"host", "content-length", "connection", "accept-encoding", "transfer-encoding"}
+TOKEN_PATTERN = re.compile(r"^/(file/)?bot[^/]+")
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "StandIn", "username": "standin_bot"}
+
+
+def upstream_of(path):
+    if path.startswith(("/v1", "/upload/v1")):
+        return "gemini"
+    if TOKEN_PATTERN.match(path):
+        return "telegram"
+    return "sarvam"
+
+
+def endpoint(path):
+    """Path with the query string and bot token removed, as stored in fixtures."""
+    path = urlparse(path).path
+    return TOKEN_PATTERN.sub(lambda match: f"/{match.group(1) or ''}bot<token>", path)
+
+
+def request_key(method, path, body):
+    """Hash of a request, ignoring JSON key order and whitespace."""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    except ValueError:
+        pass
+    digest = hashlib.sha256(f"{method} {endpoint(path)}\n".encode("utf-8"))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class LatencyModel:
+    """Delay before a replayed response, parsed from a spec such as lognormal:1.2,6."""
+
+    def __init__(self, spec="recorded", seed=0):
+        self.spec = spec
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        if kind == "fixed":
+            self.value = float(args)
+        elif kind == "uniform":
+            low, high = args.split("-")
+            self.low, self.high = float(low), float(high)
+        elif kind == "lognormal":
+            p50, p99 = (float(value) for value in args.split(","))
+            self.mu = math.log(p50)
+            self.sigma = (math.log(p99) - self.mu) / 2.326  # z-score of the 99th percentile
+        elif kind not in ("recorded", "none"):
+            raise ValueError(f"Unknown latency model: {spec}")
+
+    def sample(self, recorded=0.0):
+        if self.kind == "recorded":
+            return recorded
+        if self.kind == "none":
+            return 0.0
+        if self.kind == "fixed":
+            return self.value
+        with self.lock:
+            if self.kind == "uniform":
+                return self.rng.uniform(self.low, self.high)
+            return self.rng.lognormvariate(self.mu, self.sigma)
+
+
+def load_fixtures(paths):
+    exchanges = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            exchanges.extend(json.loads(line) for line in f if line.strip())
+    return exchanges
+
+
+class StandInState:
+    """Fixtures, latency models and what was served, shared by the handler threads."""
+
+    def __init__(self, exchanges=(), latency=None, record_to=None, upstreams=None, seed=0):
+        self.by_key = {}
+        self.by_endpoint = {}
+        for exchange in exchanges:
+            if exchange.get("key"):
+                self.by_key.setdefault(exchange["key"], []).append(exchange)
+            self.by_endpoint.setdefault((exchange["method"], exchange["path"]), []).append(exchange)
+        self.latency = {name: LatencyModel((latency or {}).get(name, "recorded"), seed + index)
+                        for index, name in enumerate(UPSTREAMS)}
+        self.record_to = record_to
+        self.upstreams = {**UPSTREAMS, **(upstreams or {})}
+        self.lock = threading.Lock()
+        self.counts = {}  # (upstream, "exact" | "endpoint" | "synthesized" | "unmatched" | "recorded") -> n
+        self.cycle = {}
+        self.replies = []  # (time, chat_id, text) for every Telegram sendMessage
+        self.files = {}  # file_id -> bytes served for Telegram downloads
+        self.message_ids = itertools.count(1)
+
+    def count(self, upstream, outcome):
+        with self.lock:
+            self.counts[(upstream, outcome)] = self.counts.get((upstream, outcome), 0) + 1
+
+    def match(self, method, path, body):
+        """A recorded exchange for this request and how it matched, or (None, None)."""
+        candidates = self.by_key.get(request_key(method, path, body))
+        if candidates:
+            with self.lock:
+                index = self.cycle.get(id(candidates), 0)
+                self.cycle[id(candidates)] = index + 1
+            return candidates[index % len(candidates)], "exact"
+        candidates = self.by_endpoint.get((method, endpoint(path)))
+        if candidates:
+            return candidates[int(hashlib.sha256(body).hexdigest(), 16) % len(candidates)], "endpoint"
+        return None, None
+
+    def add_reply(self, chat_id, text):
+        with self.lock:
+            self.replies.append((time.perf_counter(), chat_id, text))
+
+    def record(self, exchange):
+        with self.lock:
+            with open(self.record_to, "a", encoding="utf-8") as f:
+                f.write(json.dumps(exchange, ensure_ascii=False) + "\n")
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.counts)
+        stats = {}
+        for (upstream, outcome), count in sorted(counts.items()):
+            stats.setdefault(upstream, {})[outcome] = count
+        return stats
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request()
+
+    def handle_request(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        upstream = upstream_of(self.path)
+        if self.state.record_to:
+            self.forward(upstream, body)
+            return
+        if upstream == "telegram":
+            synthesized = self.telegram_response(body)
+            if synthesized is not None:
+                self.state.count(upstream, "synthesized")
+                self.reply(200, *synthesized)
+                return
+        exchange, outcome = self.state.match(self.command, self.path, body)
+        if exchange is None:
+            self.state.count(upstream, "unmatched")
+            self.reply(404, "application/json", b'{"error": "no recorded response for this endpoint"}')
+            return
+        self.state.count(upstream, outcome)
+        time.sleep(self.state.latency[upstream].sample(exchange.get("latency", 0.0)))
+        if "body_b64" in exchange:
+            data = base64.b64decode(exchange["body_b64"])
+        else:
+            data = exchange.get("body", "").encode("utf-8")
+        self.reply(exchange.get("status", 200), exchange.get("content_type", "application/json"), data)
+
+    def telegram_response(self, body):
+        """Answer sendMessage and file calls directly; None to fall back to the fixtures."""
+        path = urlparse(self.path).path
+        if path.startswith("/file/"):
+            data = self.state.files.get(path.rsplit("/", 1)[-1])
+            return None if data is None else ("application/octet-stream", data)
+        method = path.rsplit("/", 1)[-1]
+        if method not in ("sendMessage", "getFile"):
+            return None
+        content_type = self.headers.get("Content-Type", "")
+        if "json" in content_type:
+            params = json.loads(body or b"{}")
+        elif "x-www-form-urlencoded" in content_type:
+            params = dict(parse_qsl(body.decode("utf-8")))
+        else:
+            params = {}
+        if method == "getFile":
+            file_id = params.get("file_id", "")
+            if file_id not in self.state.files:
+                return None
+            result = {"file_id": file_id, "file_unique_id": file_id,
+                      "file_size": len(self.state.files[file_id]), "file_path": file_id}
+        else:
+            chat_id = int(params.get("chat_id", 0))
+            self.state.add_reply(chat_id, params.get("text", ""))
+            result = {"message_id": next(self.state.message_ids), "date": int(time.time()),
+                      "chat": {"id": chat_id, "type": "private"}, "from": BOT_USER, "text": params.get("text", "")}
+        time.sleep(self.state.latency["telegram"].sample())
+        return "application/json", json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+    def forward(self, upstream, body):
+        import httpx
+
+        headers = {name: value for name, value in self.headers.items() if name.lower() not in DROPPED_HEADERS}
+        started = time.perf_counter()
+        try:
+            response = httpx.request(self.command, self.state.upstreams[upstream] + self.path,
+                                     headers=headers, content=body, timeout=120)
+        except httpx.HTTPError as e:
+            self.state.count(upstream, "failed")
+            self.reply(502, "application/json", json.dumps({"error": str(e)}).encode("utf-8"))
+            return
+        latency = time.perf_counter() - started
+        content_type = response.headers.get("content-type", "application/octet-stream")
+        exchange = {
+            "upstream": upstream,
+            "method": self.command,
+            "path": endpoint(self.path),
+            "key": request_key(self.command, self.path, body),
+            "status": response.status_code,
+            "content_type": content_type,
+            "latency": round(latency, 4),
+        }
+        text = None
+        if content_type.startswith(("application/json", "text/")):
+            try:
+                text = response.content.decode("utf-8")
+            except UnicodeDecodeError:
+                pass
+        if text is None:
+            exchange["body_b64"] = base64.b64encode(response.content).decode("ascii")
+        else:
+            exchange["body"] = text
+        self.state.record(exchange)
+        self.state.count(upstream, "recorded")
+        self.reply(response.status_code, content_type, response.content)
+
+    def reply(self, status, content_type, data):
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up waiting
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_standin(port=0, fixtures=(DEFAULT_FIXTURES,), latency=None, record_to=None, upstreams=None, seed=0):
+    """
+    Start the stand-in in a background thread; its StandInState is server.state.
+
+    Args:
+        fixtures: JSONL fixture files to replay (ignored when recording).
+        latency: Latency model spec per upstream, e.g. {"gemini": "lognormal:1.5,8"}.
+        record_to: Forward to the real APIs and append exchanges to this file instead.
+        upstreams: Override the real base URL per upstream when recording.
+        seed: Seed for the latency models.
+    """
+    exchanges = [] if record_to else load_fixtures(fixtures)
+    state = StandInState(exchanges, latency, record_to, upstreams, seed)
+    handler = type("Handler", (StandInHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(DEFAULT_FIXTURES), "recorded.jsonl"),
+                        help="fixture file to append to when recording")
+    parser.add_argument("--fixtures", nargs="+", default=[DEFAULT_FIXTURES])
+    for name in UPSTREAMS:
+        parser.add_argument(f"--{name}-latency", default="recorded")
+        parser.add_argument(f"--{name}-upstream", default=UPSTREAMS[name], help="real API when recording")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = start_standin(
+        args.port,
+        fixtures=args.fixtures,
+        latency={name: getattr(args, f"{name}_latency") for name in UPSTREAMS},
+        record_to=args.out if args.mode == "record" else None,
+        upstreams={name: getattr(args, f"{name}_upstream") for name in UPSTREAMS},
+        seed=args.seed,
+    )
+    target = f"recording to {args.out}" if args.mode == "record" else f"replaying {', '.join(args.fixtures)}"
+    print(f"Stand-in listening on http://127.0.0.1:{server.server_address[1]} ({target})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(json.dumps(server.state.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,87 +1,171 @@
 # filepath: /Users/kumarswamikallimath/NMIThacks/bot.py
 import os
+import time
+IMPORT_STARTED = time.perf_counter()
+import asyncio
 import logging
-import json
-import requests
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 from dotenv import load_dotenv
 from telegram import Update
+from telegram.error import TelegramError
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackContext
-from analyse import analyze_news, create_news_input, extract_json_from_response, json_to_formatted_text  # Import functions from main.py
+from analyse import analyze_news_async, create_news_input_async, extract_json_from_response, get_claim_index, model_id  # Import functions from analyse.py
 import logs.logger_config as logger_config  # Import the logging configuration
+from gemini_scheduler import SchedulerBusy
+import metrics
+import image_preprocess
+import sarvam
+import lang_id
+import translation_memory
+import decompose
+from verdict_store import verdict_store
+from triage import is_non_claim_reply, triage
+from warmup import startup, warm_gemini
+from link_check import link_checker
+from update_processor import ChatOrderedUpdateProcessor
 # Load environment variables from .env file
 load_dotenv()
-API_KEY = os.getenv("TELEGRAM_BOT_TOKEN") 
-SARVAM_API_KEY = os.getenv("SARVAM_API_KEY") # Telegram bot token
+API_KEY = os.getenv("TELEGRAM_BOT_TOKEN") # Telegram bot token
+# Optional override, e.g. to point at a local fake Bot API for load tests
+TELEGRAM_BASE_URL = os.getenv("TELEGRAM_BASE_URL")
+# Updates processed at once (across chats; each chat stays in order)
+BOT_CONCURRENT_UPDATES = int(os.getenv("BOT_CONCURRENT_UPDATES", 64))
+# Threads for blocking work (cache lookups, image downloads) run via asyncio.to_thread
+BOT_WORKER_THREADS = int(os.getenv("BOT_WORKER_THREADS", 8))
+# Smallest photo size whose longest edge reaches this many pixels is downloaded
+# (the largest one if none does); Telegram sends 90/320/800/1280/2560px variants
+BOT_PHOTO_MIN_EDGE = int(os.getenv("BOT_PHOTO_MIN_EDGE", 1280))
+# Port for a Prometheus /metrics endpoint in polling mode (0 = off; webhook mode uses server.py's)
+BOT_METRICS_PORT = int(os.getenv("BOT_METRICS_PORT", 0))
 
 d_lang = "en"
 # Configure logging
 logger_config.configure_logging()
 logger = logging.getLogger(__name__)
 
+_photo_metrics = {"downloads": 0, "bytes": 0, "largest_bytes": 0, "seconds": 0.0}
+
 # Start command
 async def start(update: Update, context: CallbackContext) -> None:
     """Send a message when the command /start is issued."""
     await update.message.reply_text("Hello! Send me a news article or claim, and I'll analyze it for you.")
 
 async def language_detection(text):
-    url = "https://api.sarvam.ai/text-lid"
-
-    payload = {"input": text}
-    headers = {
-        "Content-Type": "application/json",
-        "api-subscription-key": SARVAM_API_KEY
-    }
-
-    response = requests.request("POST", url, json=payload, headers=headers)
-
-    return response.json()['language_code']
+    return await lang_id.detect_language(text)
 
 async def translate_text(text, target_lang):
-    url = "https://api.sarvam.ai/translate"
-
-    payload = {
-        "source_language_code": "auto",
-        "target_language_code": target_lang,  # Use the passed target language parameter
-        "speaker_gender": "Male",
-        "mode": "classic-colloquial",
-        "model": "mayura:v1",
-        "enable_preprocessing": False,
-        "input": text
-    }
-    headers = {
-        "Content-Type": "application/json",
-        "api-subscription-key": SARVAM_API_KEY
-    }
-
     try:
-        response = requests.request("POST", url, json=payload, headers=headers)
-        response.raise_for_status()  # Raise exception for non-200 status codes
-        
-        try:
-            resp_json = response.json()
-            logger.info(f"Translation API raw response: {resp_json}")
-            
-            if isinstance(resp_json, dict) and 'translated_text' in resp_json:
-                return resp_json['translated_text']
-            else:
-                logger.error(f"Translation API response format unexpected: {resp_json}")
-                return text  # Fallback to original text
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {e}")
-            logger.error(f"Raw response: {response.text}")
-            return text
-    except requests.exceptions.RequestException as e:
+        translated = await translation_memory.translate(text, target_lang)
+        logger.info(f"Translation API response: {translated}")
+        return translated
+    except ValueError as e:
+        logger.error(f"Translation API response format unexpected: {e}")
+        return text  # Fallback to original text
+    except httpx.HTTPError as e:
         logger.error(f"Translation API request failed: {e}")
         return text
 
+async def timed(stage, timings, awaitable):
+    """Await a pipeline stage and record how long it took in milliseconds."""
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = round((time.perf_counter() - started) * 1000, 1)
+
+async def detect_target_language(text):
+    """Detect the reply language from the message text, defaulting to English."""
+    if not text:
+        # For image-only messages, use default language (can't detect from image)
+        return "en"
+    try:
+        target_lang = await language_detection(text)
+        logger.info(f"Detected language from text: {target_lang}")
+        return target_lang
+    except Exception as e:
+        logger.error(f"Language detection failed: {e}")
+        return "en"
+
+def select_photo_size(photo_sizes, min_edge):
+    """Smallest PhotoSize whose longest edge is at least min_edge, else the largest."""
+    sizes = sorted(photo_sizes, key=lambda size: size.width * size.height)
+    for size in sizes:
+        if max(size.width, size.height) >= min_edge:
+            return size
+    return sizes[-1]
+
+async def fetch_photo_input(message, user_message, timings):
+    """
+    Download the message photo into memory and combine it with any text into a Gemini input.
+
+    Only the smallest size that is still legible is fetched, through the bot's
+    own HTTP connection pool, and the bytes go straight to the analyzer.
+    """
+    photo = select_photo_size(message.photo, BOT_PHOTO_MIN_EDGE)
+    largest = max(message.photo, key=lambda size: size.width * size.height)
+    started = time.perf_counter()
+    file = await photo.get_file()
+    image_bytes = bytes(await file.download_as_bytearray())
+    elapsed = time.perf_counter() - started
+    timings["photo_download"] = round(elapsed * 1000, 1)
+    metrics.STAGE_SECONDS.observe(elapsed, "image_fetch")
+
+    _photo_metrics["downloads"] += 1
+    _photo_metrics["bytes"] += len(image_bytes)
+    _photo_metrics["largest_bytes"] += largest.file_size or len(image_bytes)
+    _photo_metrics["seconds"] += elapsed
+    logger.info(f"Downloaded {photo.width}x{photo.height} photo ({len(image_bytes)} bytes; "
+                f"largest is {largest.width}x{largest.height}, {largest.file_size} bytes) "
+                f"in {elapsed * 1000:.1f} ms")
+    return await create_news_input_async(user_message or "", image_bytes=image_bytes)
+
+def photo_stats():
+    """Photo downloads, bytes fetched versus always taking the largest size, and latency."""
+    stats = dict(_photo_metrics)
+    downloads = stats["downloads"]
+    stats["min_edge"] = BOT_PHOTO_MIN_EDGE
+    stats["avg_bytes"] = stats["bytes"] // downloads if downloads else 0
+    stats["avg_ms"] = round(stats["seconds"] * 1000 / downloads, 1) if downloads else 0.0
+    stats["bytes_saved_ratio"] = (
+        round(1 - stats["bytes"] / stats["largest_bytes"], 3) if stats["largest_bytes"] else 0.0
+    )
+    stats["seconds"] = round(stats["seconds"], 3)
+    return stats
+
+def format_sources(sources, user_message, label="Sources:"):
+    """Format sources as Markdown links under the given label (titles and links are not translated)."""
+    sources_text = ""
+    if sources:
+        sources_text += f"{label} \n"
+        query = (user_message or "").replace(' ', '+')
+        for title, source in sources.items():
+            # Check if source is just a number or placeholder
+            if str(source).isdigit() or not source or len(source) < 5:
+                # For numeric placeholders, format more descriptively
+                source = f"https://www.google.com/search?q={title.replace(' ', '+')}+{query}"
+                sources_text += f"- [{title}]({source})\n"
+            else:
+                # For actual URLs or meaningful references
+                if not source.startswith(('http://', 'https://')):
+                    # Include both source title and user query in search for better results
+                    source = f"https://www.google.com/search?q={title.replace(' ', '+')}+{query}"
+                sources_text += f"- [{title}]({source})\n"
+    return sources_text
+
 # Function to handle incoming messages
 async def analyze(update: Update, context: CallbackContext) -> None:
-    """Analyze the received message and respond with the analysis."""
-    user_message = update.message.text  # Get the user's message
+    """
+    Analyze the received message and respond with the analysis.
+
+    Stages run as a small dependency graph: language detection runs alongside
+    the photo fetch and Gemini call (which depends on the photo), and the
+    header and body are translated in a single request once both are done.
+    """
+    message = update.message
+    user_message = message.text or message.caption  # Get the user's message
     user = update.effective_user  # Get user information
-    chat = update.message.chat
-    
- 
+    chat = message.chat
 
     # Log user and chat information
     user_info = f"User: {user.username or user.first_name or 'N/A'} (ID: {user.id}), " \
@@ -90,129 +174,159 @@ async def analyze(update: Update, context: CallbackContext) -> None:
                 f"Chat ID: {chat.id}, Chat Type: {chat.type}"
     logger.info(f"Message received from: {user_info}")
 
-    # Check if the message has both text and image
-    if update.message.photo and user_message:
-        # If both image and text are present
-        photo = update.message.photo[-1]
-        file = await photo.get_file()
-        image_path = file.file_path  # Get the path to the image
-
-        # Set target language from text message before creating news_input
-        try:
-            target_lang = await language_detection(user_message)
-            logger.info(f"Detected language from text: {target_lang}")
-        except Exception as e:
-            logger.error(f"Language detection failed: {e}")
-            target_lang = "en"
-
-        # Log image details for debugging
-        logger.info(f"Received image: {image_path}")
+    if not message.photo and not user_message:
+        await message.reply_text("Sorry, I couldn't process your message. Please send either text or an image.")
+        return
+    if user_message:
         logger.info(f"Received text: {user_message}")
 
-        news_input = create_news_input(user_message, image_path)  # Combine both text and image
-
-    elif update.message.photo:
-        # If only an image is received
-        photo = update.message.photo[-1]
-        file = await photo.get_file()
-        image_path = file.file_path  # Get the path to the image
-
-        # For image-only messages, use default language (can't detect from image)
-        target_lang = "en"
-        
-        # Log image details for debugging
-        logger.info(f"Received image: {image_path}")
-
-        news_input = create_news_input("", image_path)  # Just use the image (no text)
-
-    elif user_message:
-        # If only text is received
-        logger.info(f"Received text: {user_message}")
-        news_input = user_message  # Just use the text
-        
-        # Set target language from text message
-        try:
-            target_lang = await language_detection(user_message)
-            logger.info(f"Detected language from text: {target_lang}")
-        except Exception as e:
-            logger.error(f"Language detection failed: {e}")
-            target_lang = "en"
-    else:
-        await update.message.reply_text("Sorry, I couldn't process your message. Please send either text or an image.")
-        return
+    timings = {}
+    started = time.perf_counter()
+    language_task = asyncio.create_task(
+        timed("language_detection", timings, detect_target_language(user_message))
+    )
 
     try:
         logger.info("Processing news input")
-        
-        # Remove the problematic language detection on news_input
-        # We've already set the target_lang above based on input type
-        
-        # Call the analyze_news function to analyze the input
-        response_text = analyze_news(news_input)  # This will handle both text and image inputs
+        if message.photo:
+            news_input = await timed("photo_fetch", timings, fetch_photo_input(message, user_message, timings))
+        else:
+            news_input = user_message  # Just use the text
 
-        # Extract the structured JSON response
-        data = extract_json_from_response(response_text)
+        requester = user.id if user else chat.id
+        data = None
+        if not message.photo and decompose.should_decompose(user_message):
+            # Long forwards are verified claim by claim
+            data = await timed("gemini", timings, decompose.analyze_claims(user_message, user=requester, channel="telegram"))
+        if data is None:
+            # Call the analyze_news function to analyze the input
+            response_text = await timed("gemini", timings, analyze_news_async(news_input, user=requester, channel="telegram"))
+
+            # Extract the structured JSON response
+            data = extract_json_from_response(response_text)
+        target_lang = await language_task
 
         if data:
             # Only translate verdict, confidence, and reason
             verdict = data.get("verdict", "Unknown")
             confidence = data.get("confidence", 0)
             reason = data.get("reason", "")
-            sources = data.get("sources", {})
 
             # Convert confidence to percentage
             confidence_percent = int(confidence * 100) if isinstance(confidence, (int, float)) else confidence
 
-            # Prepare text for translation (verdict, confidence, reason)
-            to_translate = (
-                f"Verdict:  {verdict} \n\n"
-                f"Confidence: {confidence_percent}% \n\n"
-                f"Reason: {reason} \n\n"
+            # Labels come from the translation memory; only the reason needs the API.
+            # Dead source links are replaced meanwhile.
+            (header, verdict_label, verdict_text, confidence_label, reason_label, sources_label,
+             translated_reason, _) = await asyncio.gather(
+                *(translation_memory.ui_text(text, target_lang)
+                  for text in ("Analysis Result:", "Verdict:", verdict, "Confidence:", "Reason:", "Sources:")),
+                timed("translation", timings, translate_text(reason, target_lang)),
+                timed("link_check", timings, link_checker.validate_result(data, user_message)),
             )
-            translated_main = await translate_text(to_translate, target_lang)
-
-            # Prepare sources (do not translate)
-            sources_text = ""
-            if sources:
-                sources_text += "Sources: \n"
-                for title, source in sources.items():
-                    # Check if source is just a number or placeholder
-                    if str(source).isdigit() or not source or len(source) < 5:
-                        # For numeric placeholders, format more descriptively
-                        source = f"https://www.google.com/search?q={title.replace(' ', '+')}+{user_message.replace(' ', '+')}"
-                        sources_text += f"- [{title}]({source})\n"
-                    else:
-                        # For actual URLs or meaningful references
-                        if not source.startswith(('http://', 'https://')):
-                            # Include both source title and user query in search for better results
-                            source = f"https://www.google.com/search?q={title.replace(' ', '+')}+{user_message.replace(' ', '+')}"
-                        sources_text += f"- [{title}]({source})\n"
-
-            formatted_response = translated_main + sources_text
+            sources = data.get("sources", {})
+
+            photo_id = message.photo[-1].file_unique_id if message.photo else None
+            if not is_non_claim_reply(data):
+                verdict_store.record(user_message, data, language=target_lang, channel="telegram", image=photo_id)
+
+            formatted_response = (
+                f"{header}\n\n"
+                f"{verdict_label}  {verdict_text} \n\n"
+                f"{confidence_label} {confidence_percent}% \n\n"
+                f"{reason_label} {translated_reason} \n\n"
+            ) + format_sources(sources, user_message, sources_label)
 
             logger.info(f"Formatted response: {formatted_response}")
 
-            # Translate the header text as well
-            header_text = "Analysis Result:"
-            translated_header = await translate_text(header_text, target_lang)
-            
-            await update.message.reply_text(f"{translated_header}\n\n{formatted_response}", parse_mode="Markdown")
+            with metrics.STAGE_SECONDS.time("reply_send"):
+                await timed("reply_send", timings, message.reply_text(formatted_response, parse_mode="Markdown"))
             
         else:
-            await update.message.reply_text("Sorry, I couldn't analyze that at the moment. Please try again.")
+            await message.reply_text("Sorry, I couldn't analyze that at the moment. Please try again.")
+    except SchedulerBusy as e:
+        logger.warning(f"Gemini queue busy for chat {chat.id}: {e}")
+        await message.reply_text("Too many requests right now. Please try again in a minute.")
     except Exception as e:
         # Log the exception for debugging
+        if isinstance(e, TelegramError):
+            metrics.UPSTREAM_ERRORS.inc("telegram")
         logger.error(f"Error processing message: {e}")
-        await update.message.reply_text("An error occurred while processing your request. Please try again later.")
+        await message.reply_text("An error occurred while processing your request. Please try again later.")
+    finally:
+        if not language_task.done():
+            language_task.cancel()
+        timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Stage timings (ms) for chat {chat.id}: {timings}")
+
+async def post_init(application: Application) -> None:
+    """
+    Bound the blocking-work pool, start the metrics endpoint if configured, and
+    warm clients, connection pools and indexes in the background.
+
+    PTB only runs this hook (and post_shutdown) from run_polling/run_webhook,
+    so it applies to polling mode. In webhook mode telegram_webhook.start()
+    starts the application itself: the API server's lifespan warms the same
+    components, its default executor is left alone, and metrics are served on
+    the API's /metrics.
+    """
+    # asyncio.to_thread uses the loop's default executor; cap it so a burst of
+    # updates queues for threads instead of spawning one per update
+    executor = ThreadPoolExecutor(max_workers=BOT_WORKER_THREADS, thread_name_prefix="bot-worker")
+    asyncio.get_running_loop().set_default_executor(executor)
+    application.bot_data["worker_pool"] = executor
+    if BOT_METRICS_PORT and metrics.METRICS_ENABLED:
+        application.bot_data["metrics_server"] = metrics.start_http_server(BOT_METRICS_PORT)
+    startup.start("gemini", lambda: warm_gemini(model_id))
+    startup.start("sarvam", sarvam.warm_up)
+    startup.start("claim_index", lambda: asyncio.to_thread(get_claim_index))
+    startup.start("triage", lambda: asyncio.to_thread(triage.load))
+    startup.start("translations", translation_memory.prewarm, timeout=None)
+
+async def post_shutdown(application: Application) -> None:
+    """Stop warm-up, release pooled HTTP connections, link probes, worker threads, image workers and the metrics endpoint, and flush stored verdicts when the bot stops."""
+    await startup.stop()
+    await sarvam.close_http_client()
+    await link_checker.close()
+    await asyncio.to_thread(verdict_store.close)
+    image_preprocess.shutdown_pool()
+    executor = application.bot_data.pop("worker_pool", None)
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+    metrics_server = application.bot_data.pop("metrics_server", None)
+    if metrics_server is not None:
+        metrics_server.shutdown()
+        metrics_server.server_close()
+
+def build_application(token=API_KEY, base_url=TELEGRAM_BASE_URL) -> Application:
+    """
+    Build the bot application with its handlers.
+
+    Updates are handled concurrently across chats, in order within a chat
+    (see ChatOrderedUpdateProcessor).
+    """
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(ChatOrderedUpdateProcessor(BOT_CONCURRENT_UPDATES))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(f"{base_url}/bot").base_file_url(f"{base_url}/file/bot")
+    application = builder.build()
+
+    # Register handlers for different commands and messages
+    application.add_handler(CommandHandler("start", start))
+    # Handle both text and photo messages; edits of an already answered message are ignored
+    application.add_handler(MessageHandler(filters.UpdateType.MESSAGE & (filters.TEXT | filters.PHOTO), analyze))
+    return application
 
 # Main function to start the bot
 def main() -> None:
     """Start the bot."""
-    application = Application.builder().token(API_KEY).build()
-
-    # Register handlers for different commands and messages
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(MessageHandler(filters.TEXT | filters.PHOTO, analyze))  # Handle both text and photo messages
+    startup.record_import(time.perf_counter() - IMPORT_STARTED)
+    application = build_application()
 
     # Run the bot
     application.run_polling()
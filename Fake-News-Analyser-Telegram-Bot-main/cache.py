@@ -0,0 +1,299 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+CACHE_ENABLED = os.getenv("VERDICT_CACHE_ENABLED", "1") != "0"
+CACHE_PATH = os.getenv("VERDICT_CACHE_PATH", "verdict_cache.db")
+CACHE_TTL = int(os.getenv("VERDICT_CACHE_TTL", 24 * 3600))  # seconds
+CACHE_MAX_ROWS = int(os.getenv("VERDICT_CACHE_MAX_ROWS", 100_000))
+CACHE_MEMORY_SIZE = int(os.getenv("VERDICT_CACHE_MEMORY_SIZE", 2048))
+
+# Query parameters that only track where a link was shared from
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "igshid", "si", "ref", "mc_cid", "mc_eid")
+
+URL_PATTERN = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# Emoji joiners and variation selectors that survive NFKC
+INVISIBLE_CHARS = dict.fromkeys(map(ord, "‍​⁠︎️﻿"), None)
+
+
+def canonicalize_url(url):
+    """
+    Normalize a URL so that trivially different links compare equal.
+
+    Lowercases scheme and host, drops "www.", default ports, fragments,
+    tracking parameters and trailing slashes, and sorts the query string.
+    """
+    url = url.strip().rstrip(".,;:!?)\"'")
+    if not re.match(r"^[a-z][a-z0-9+.-]*://", url, re.IGNORECASE):
+        url = "http://" + url
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url.lower()
+
+    scheme = parts.scheme.lower()
+    if scheme == "http":
+        scheme = "https"
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    netloc = host
+    if parts.port and parts.port not in (80, 443):
+        netloc = f"{host}:{parts.port}"
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    )
+    path = re.sub(r"/{2,}", "/", parts.path).rstrip("/")
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+def canonicalize_claim(text):
+    """
+    Canonical form of a claim used for cache keys.
+
+    Applies Unicode NFKC, casefolding, URL canonicalization and folds
+    whitespace, emoji and punctuation so that forwards which only differ
+    cosmetically map to the same key.
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).translate(INVISIBLE_CHARS)
+
+    urls = []
+
+    def _stash_url(match):
+        urls.append(canonicalize_url(match.group(0)))
+        return " "
+
+    text = URL_PATTERN.sub(_stash_url, text)
+
+    folded = []
+    for char in text.casefold():
+        category = unicodedata.category(char)
+        if category[0] == "P" or category in ("So", "Sk", "Cs", "Co"):
+            folded.append(" ")
+        else:
+            folded.append(char)
+    text = WHITESPACE_PATTERN.sub(" ", "".join(folded)).strip()
+
+    if urls:
+        text = " ".join([text] + sorted(set(urls))).strip()
+    return text
+
+
+def image_digest(data):
+    """Content hash of raw image bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(text="", images=(), namespace=""):
+    """Build a cache key from the canonical claim text and any image bytes."""
+    hasher = hashlib.sha256()
+    hasher.update(namespace.encode("utf-8"))
+    hasher.update(b"\x00")
+    hasher.update(canonicalize_claim(text).encode("utf-8"))
+    for data in images:
+        hasher.update(b"\x00")
+        hasher.update(image_digest(data).encode("ascii"))
+    return hasher.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache with an optional per-entry TTL."""
+
+    def __init__(self, max_size=1024, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    Persistent key/value tier backed by SQLite.
+
+    Entries expire after `ttl` seconds and the table is trimmed back to
+    `max_rows` (oldest first) as new entries are written.
+    """
+
+    def __init__(self, path, table="cache", ttl=CACHE_TTL, max_rows=CACHE_MAX_ROWS):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                claim TEXT,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_created_at ON {table} (created_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value FROM {self.table} WHERE key = ? AND created_at >= ?",
+                (key, time.time() - self.ttl),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, claim=""):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, claim, created_at) VALUES (?, ?, ?, ?)",
+                (key, value, claim, time.time()),
+            )
+            self._writes += 1
+            # Trimming needs a COUNT(*), so only do it every so often
+            if self._writes % 100 == 0:
+                self._evict()
+            self._conn.commit()
+
+    def entries(self):
+        """Return (key, value, claim, created_at) for every unexpired entry, oldest first."""
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT key, value, claim, created_at FROM {self.table} WHERE created_at >= ? ORDER BY created_at ASC",
+                (time.time() - self.ttl,),
+            ).fetchall()
+
+    def _evict(self):
+        self._conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.ttl,))
+        (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        if count > self.max_rows:
+            self._conn.execute(
+                f"""DELETE FROM {self.table} WHERE key IN (
+                    SELECT key FROM {self.table} ORDER BY created_at ASC LIMIT ?
+                )""",
+                (count - self.max_rows,),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """In-process LRU in front of a persistent SQLite tier, with hit/miss counters."""
+
+    def __init__(self, memory_size=CACHE_MEMORY_SIZE, path=CACHE_PATH, table="cache",
+                 ttl=CACHE_TTL, max_rows=CACHE_MAX_ROWS, enabled=CACHE_ENABLED):
+        self.enabled = enabled
+        self.memory = LRUCache(memory_size, ttl=ttl)
+        self._disk_args = (path, table, ttl, max_rows)
+        self._disk = None
+        self._disk_opened = False
+        self._disk_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def disk(self):
+        """Persistent tier, opened on first use (None if disabled or unavailable)."""
+        if not self._disk_opened:
+            with self._disk_lock:
+                if not self._disk_opened:
+                    path, table, ttl, max_rows = self._disk_args
+                    if self.enabled and path:
+                        try:
+                            self._disk = SQLiteCache(path, table=table, ttl=ttl, max_rows=max_rows)
+                        except sqlite3.Error as e:
+                            logger.error(f"Persistent cache unavailable, using memory only: {e}")
+                    self._disk_opened = True
+        return self._disk
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+        if self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except sqlite3.Error as e:
+                logger.error(f"Cache read failed: {e}")
+                value = None
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key, value, claim=""):
+        if not self.enabled:
+            return
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value, claim)
+            except sqlite3.Error as e:
+                logger.error(f"Cache write failed: {e}")
+
+    def stats(self):
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+
+# Shared verdict cache for analyze_news
+verdict_cache = TieredCache(table="verdicts")
@@ -0,0 +1,294 @@
+import logging
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from array import array
+
+from cache import canonicalize_claim, CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+# Index configuration
+CLAIM_INDEX_ENABLED = os.getenv("CLAIM_INDEX_ENABLED", "1") != "0"
+CLAIM_INDEX_THRESHOLD = float(os.getenv("CLAIM_INDEX_THRESHOLD", 0.7))
+CLAIM_INDEX_MIN_WORDS = int(os.getenv("CLAIM_INDEX_MIN_WORDS", 5))
+# Entries expire with the verdict cache entries they point to
+CLAIM_INDEX_TTL = int(os.getenv("CLAIM_INDEX_TTL", CACHE_TTL))  # seconds
+
+# 10 bands of 5 rows: a pair at Jaccard 0.7 becomes a candidate ~84% of the
+# time, at 0.8 ~98%, while unrelated claims almost never collide.
+NUM_PERM = 50
+BANDS = 10
+ROWS = NUM_PERM // BANDS
+
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15  # 64-bit golden ratio, spreads crc32 values
+HASH_MASK = 0xFFFFFFFFFFFFFFFF
+EMPTY_BIN = 0xFFFFFFFF
+
+# Fixed pseudo-random probe order per bin, used to fill empty bins
+_rng = random.Random(1729)
+DONOR_ORDER = [_rng.sample(range(NUM_PERM), NUM_PERM) for _ in range(NUM_PERM)]
+
+# Boilerplate that forwards pick up as they spread (matched on canonical text)
+FORWARD_BOILERPLATE = re.compile(
+    r"\b(?:forwarded as received|forwarded many times|forwarded message|forwarded|"
+    r"shared as received|copied as received|please share|share with everyone|"
+    r"share maximum|share this|must read|must watch|viral message)\b"
+)
+
+
+# Words that flip or qualify what a claim asserts. Near-duplicates that differ
+# in any of these, or in a number or date, are different claims ("has not
+# announced", "500 rupee notes", "until April") and must not share a verdict.
+NEGATION_WORDS = frozenset(
+    "not no never none nobody nothing nowhere neither nor without cannot cant wont dont doesnt didnt "
+    "isnt arent wasnt werent hasnt havent hadnt shouldnt wouldnt couldnt t "
+    "fake false hoax untrue myth rumour rumor misleading baseless denied denies deny refuted debunked "
+    "true real genuine confirmed".split()
+)
+NUMBER_WORDS = frozenset(
+    "zero one two three four five six seven eight nine ten eleven twelve twenty thirty forty fifty "
+    "hundred thousand lakh lakhs crore crores million billion half double triple".split()
+)
+DATE_WORDS = frozenset(
+    "january february march april may june july august september october november december "
+    "jan feb mar apr jun jul aug sep sept oct nov dec monday tuesday wednesday thursday friday "
+    "saturday sunday today tomorrow yesterday tonight before after until till since".split()
+)
+MEANING_WORDS = NEGATION_WORDS | NUMBER_WORDS | DATE_WORDS
+NO_TERMS = ()
+
+
+def claim_words(text):
+    """Canonical words of a claim with forward boilerplate removed."""
+    return FORWARD_BOILERPLATE.sub(" ", canonicalize_claim(text)).split()
+
+
+def meaning_terms(words):
+    """
+    The negations, numbers and dates in a claim, as a sorted tuple.
+
+    Two claims whose word sets overlap but whose meaning terms differ say
+    different things, however similar the rest of the text is.
+    """
+    terms = [word for word in words if word in MEANING_WORDS or any(char.isdigit() for char in word)]
+    return tuple(sorted(terms)) if terms else NO_TERMS
+
+
+def meaning_differs(text_a, text_b):
+    """True when two claims differ in a negation, number or date."""
+    return meaning_terms(claim_words(text_a)) != meaning_terms(claim_words(text_b))
+
+
+def claim_shingles(text):
+    """
+    Shingle set for a claim: its adjacent word pairs.
+
+    The text is canonicalized and forward boilerplate removed first, so
+    cosmetic changes do not affect the set. Single words are left out since
+    common words would put most claims into the same LSH buckets.
+    """
+    words = claim_words(text)
+    return {f"{a} {b}" for a, b in zip(words, words[1:])}, words
+
+
+def minhash(shingles):
+    """
+    MinHash signature of a shingle set using one-permutation hashing.
+
+    Each shingle is hashed once and assigned to one of NUM_PERM bins, keeping
+    the minimum per bin. Empty bins copy the first non-empty bin in their own
+    fixed probe order, so neighbouring empty bins get independent donors.
+    This costs O(shingles + bins) instead of O(shingles * bins).
+    """
+    bins = [EMPTY_BIN] * NUM_PERM
+    for shingle in shingles:
+        h = (zlib.crc32(shingle.encode("utf-8")) * HASH_MULTIPLIER) & HASH_MASK
+        slot = h % NUM_PERM
+        value = h >> 32
+        if value < bins[slot]:
+            bins[slot] = value
+    if shingles and EMPTY_BIN in bins:
+        filled = bins[:]
+        for i in range(NUM_PERM):
+            if filled[i] == EMPTY_BIN:
+                donor = next(j for j in DONOR_ORDER[i] if filled[j] != EMPTY_BIN)
+                bins[i] = filled[donor]
+    return bins
+
+
+class ClaimIndex:
+    """
+    MinHash LSH index of previously analyzed claims.
+
+    Each claim is reduced to a MinHash signature; signatures are split into
+    bands and bucketed so that a lookup only compares against claims sharing
+    at least one band. Candidates are then checked against the estimated
+    Jaccard similarity threshold, and rejected when their negations, numbers
+    or dates differ from the query's (see meaning_terms).
+
+    Entries expire after `ttl` seconds, like the verdicts they point to, and
+    can be dropped early with discard(). Dead entries are skipped at once and
+    compacted away once they make up half the index.
+    """
+
+    def __init__(self, threshold=CLAIM_INDEX_THRESHOLD, min_words=CLAIM_INDEX_MIN_WORDS, ttl=CLAIM_INDEX_TTL):
+        self.threshold = threshold
+        self.min_words = min_words
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._reset()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def _reset(self):
+        self._buckets = [{} for _ in range(BANDS)]
+        self._signatures = array("I")
+        self._expires = array("d")
+        self._values = []
+        self._terms = []
+        self._ids = {}  # value -> id of its live entry
+        self._dead = 0
+        self._expiry_cursor = 0  # entries before it have been checked for expiry
+
+    def _signature(self, text):
+        shingles, words = claim_shingles(text)
+        # Very short messages are too ambiguous to match approximately
+        if len(words) < self.min_words:
+            return None, NO_TERMS
+        return minhash(shingles), meaning_terms(words)
+
+    def add(self, text, value, added_at=None):
+        """
+        Index a claim with an associated value (e.g. a verdict cache key).
+
+        Args:
+            text (str): The claim.
+            value: Returned by query(); re-adding a value replaces its old entry.
+            added_at (float): When the value was created (default now), for expiry.
+        """
+        signature, terms = self._signature(text)
+        if signature is None:
+            return False
+        expires = (time.time() if added_at is None else added_at) + self.ttl if self.ttl else float("inf")
+        with self._lock:
+            self._discard(value)
+            self._insert(signature, value, expires, terms)
+            if len(self._values) % 256 == 0:
+                self._prune()
+        return True
+
+    def _insert(self, signature, value, expires, terms):
+        item_id = len(self._values)
+        self._values.append(value)
+        self._terms.append(terms)
+        self._expires.append(expires)
+        self._signatures.extend(signature)
+        self._ids[value] = item_id
+        for band, buckets in enumerate(self._buckets):
+            band_key = hash(tuple(signature[band * ROWS:(band + 1) * ROWS]))
+            existing = buckets.get(band_key)
+            if existing is None:
+                buckets[band_key] = item_id
+            elif isinstance(existing, list):
+                existing.append(item_id)
+            else:
+                buckets[band_key] = [existing, item_id]
+
+    def discard(self, value):
+        """Drop the entry for a value, e.g. once its verdict has left the cache."""
+        with self._lock:
+            self._discard(value)
+
+    def _discard(self, value):
+        item_id = self._ids.pop(value, None)
+        if item_id is not None:
+            self._expires[item_id] = 0.0
+            self._dead += 1
+
+    def _prune(self):
+        """Expire old entries (mostly added in time order) and compact once half are dead."""
+        now = time.time()
+        expires, values = self._expires, self._values
+        while self._expiry_cursor < len(values) and expires[self._expiry_cursor] < now:
+            item_id = self._expiry_cursor
+            if expires[item_id] > 0 and self._ids.get(values[item_id]) == item_id:
+                del self._ids[values[item_id]]
+                expires[item_id] = 0.0
+                self._dead += 1
+            self._expiry_cursor += 1
+        if self._dead > 1024 and self._dead * 2 > len(values):
+            live = [(item_id, value) for value, item_id in self._ids.items() if expires[item_id] >= now]
+            signatures, terms = self._signatures, self._terms
+            self._reset()
+            for item_id, value in sorted(live):
+                offset = item_id * NUM_PERM
+                self._insert(signatures[offset:offset + NUM_PERM], value, expires[item_id], terms[item_id])
+
+    def query(self, text, threshold=None):
+        """
+        Find the most similar live indexed claim with the same negations, numbers and dates.
+
+        Returns:
+            tuple: (value, estimated similarity), or None if nothing reaches the threshold.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        signature, terms = self._signature(text)
+        best = None
+        rejected = False
+        if signature is not None:
+            now = time.time()
+            with self._lock:
+                candidates = set()
+                for band, buckets in enumerate(self._buckets):
+                    found = buckets.get(hash(tuple(signature[band * ROWS:(band + 1) * ROWS])))
+                    if found is None:
+                        continue
+                    if isinstance(found, list):
+                        candidates.update(found)
+                    else:
+                        candidates.add(found)
+
+                best_score = threshold
+                signatures = self._signatures
+                for item_id in candidates:
+                    if self._expires[item_id] < now:
+                        continue
+                    offset = item_id * NUM_PERM
+                    matches = sum(
+                        1 for i, h in enumerate(signature) if signatures[offset + i] == h
+                    )
+                    score = matches / NUM_PERM
+                    if score < best_score:
+                        continue
+                    # Same wording, different claim: "has not announced", "500 rupee notes"
+                    if self._terms[item_id] != terms:
+                        rejected = True
+                        continue
+                    best_score = score
+                    best = (self._values[item_id], score)
+
+        if best is None:
+            self.misses += 1
+            self.rejected += rejected
+        else:
+            self.hits += 1
+        return best
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._ids),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected_meaning_change": self.rejected,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._ids)
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import os
+import re
+
+from analyse import analyze_news_async, extract_json_from_response
+from gemini_scheduler import SchedulerBusy
+from models import ClaimVerdict, NewsAnalysisResult
+
+logger = logging.getLogger(__name__)
+
+# Decomposition configuration
+DECOMPOSE_MODE = os.getenv("DECOMPOSE_MODE", "auto")  # "auto": long text messages; "off": only when requested
+DECOMPOSE_MIN_CHARS = int(os.getenv("DECOMPOSE_MIN_CHARS", 280))
+DECOMPOSE_MAX_CLAIMS = int(os.getenv("DECOMPOSE_MAX_CLAIMS", 6))
+DECOMPOSE_MIN_WORDS = int(os.getenv("DECOMPOSE_MIN_WORDS", 6))  # shorter fragments join their neighbour
+DECOMPOSE_CONCURRENCY = int(os.getenv("DECOMPOSE_CONCURRENCY", 3))  # sub-claims verified at once per message
+MAX_SOURCES = 10
+
+# Sentence ends (Latin and Indic), unless followed by a lowercase letter as in "e.g. this"
+SENTENCE_END = re.compile(r"(?<=[.!?।॥])\s+(?=[^a-z])|\n+")
+BULLET = re.compile(r"^\s*(?:[-*•●▪►✅❌]|\d{1,2}[.)])\s*")
+# Forward headers and calls to share carry no claim of their own
+BOILERPLATE = re.compile(
+    r"^\W*(forwarded( as received| many times)?|must read|(please )?share( this)?( with everyone)?"
+    r"|breaking( news)?|viral( message)?)\W*$",
+    re.IGNORECASE,
+)
+MARKDOWN_CHARS = str.maketrans("", "", "*_`[]")
+
+
+def split_claims(text, max_claims=DECOMPOSE_MAX_CLAIMS, min_words=DECOMPOSE_MIN_WORDS):
+    """
+    Split a message into its separate factual assertions.
+
+    Splits on sentence ends and lines, drops forward boilerplate and joins
+    fragments shorter than min_words to their neighbour. When there are more
+    than max_claims sentences, adjacent ones are grouped so that at most
+    max_claims claims are returned.
+
+    Args:
+        text (str): The message.
+
+    Returns:
+        list: Claim strings, in message order.
+    """
+    pieces = []
+    for piece in SENTENCE_END.split(text or ""):
+        piece = BULLET.sub("", piece).strip()
+        if piece and not BOILERPLATE.match(piece):
+            pieces.append(piece)
+
+    claims, pending = [], ""
+    for piece in pieces:
+        pending = f"{pending} {piece}".strip()
+        if len(pending.split()) >= min_words:
+            claims.append(pending)
+            pending = ""
+    if pending:
+        if claims:
+            claims[-1] = f"{claims[-1]} {pending}"
+        else:
+            claims.append(pending)
+
+    if len(claims) > max_claims:
+        # Contiguous groups of near-equal size keep related sentences together
+        size, extra = divmod(len(claims), max_claims)
+        grouped, start = [], 0
+        for index in range(max_claims):
+            end = start + size + (index < extra)
+            grouped.append(" ".join(claims[start:end]))
+            start = end
+        claims = grouped
+    return claims
+
+
+def should_decompose(text, requested=None):
+    """Whether a text message should be verified claim by claim (requested: explicit on/off from the caller)."""
+    if requested is not None:
+        return bool(requested) and bool(text)
+    return DECOMPOSE_MODE == "auto" and len(text or "") >= DECOMPOSE_MIN_CHARS
+
+
+def snippet(claim, length=80):
+    """Shortened claim for the combined reason, without characters that break Telegram Markdown."""
+    claim = claim.translate(MARKDOWN_CHARS)
+    return claim if len(claim) <= length else claim[:length - 1].rstrip() + "…"
+
+
+def aggregate(verdicts):
+    """
+    Combine per-claim verdicts into one verdict for the whole message.
+
+    The message is Real or Fake only when every claim that could be decided
+    agrees; its confidence is their mean confidence, scaled down by the share
+    of claims left Uncertain. A message mixing Real and Fake claims is
+    Uncertain with confidence 0.5, as the single-call prompt asks of Gemini.
+
+    Args:
+        verdicts (list): ClaimVerdict per claim, in message order.
+
+    Returns:
+        NewsAnalysisResult: Combined verdict, with the per-claim verdicts in claims.
+    """
+    decided = [v for v in verdicts if v.verdict in ("Real", "Fake")]
+    labels = {v.verdict for v in decided}
+    if len(labels) == 1:
+        verdict = labels.pop()
+        confidence = sum(v.confidence for v in decided) / len(verdicts)
+    elif labels:
+        verdict, confidence = "Uncertain", 0.5
+    else:
+        verdict = "Uncertain"
+        confidence = sum(v.confidence for v in verdicts) / len(verdicts)
+
+    counts = {label: sum(v.verdict == label for v in verdicts) for label in ("Fake", "Real", "Uncertain")}
+    summary = ", ".join(f"{count} {label.lower()}" for label, count in counts.items() if count)
+    lines = [f"The message makes {len(verdicts)} separate claims: {summary}."]
+    for index, v in enumerate(verdicts, 1):
+        lines.append(f"{index}. \"{snippet(v.claim)}\" - {v.verdict} ({round(v.confidence * 100)}%): {v.reason}")
+
+    sources = {}
+    for v in verdicts:
+        for title, link in v.sources.items():
+            if len(sources) < MAX_SOURCES:
+                sources.setdefault(title, link)
+    return NewsAnalysisResult(
+        verdict=verdict,
+        confidence=round(confidence, 3),
+        reason="\n".join(lines),
+        sources=sources,
+        claims=verdicts,
+    )
+
+
+async def verify_claim(claim, semaphore, user, channel):
+    async with semaphore:
+        response_text = await analyze_news_async(claim, user=user, channel=channel)
+    data = extract_json_from_response(response_text, claim)
+    if not data:
+        return ClaimVerdict(claim=claim, verdict="Uncertain", confidence=0.0,
+                            reason="The analysis for this claim could not be read.")
+    return ClaimVerdict(claim=claim, verdict=data["verdict"], confidence=data["confidence"],
+                        reason=data["reason"], sources=data.get("sources", {}))
+
+
+async def analyze_claims(text, user=None, channel="api", concurrency=DECOMPOSE_CONCURRENCY):
+    """
+    Verify each claim in a message separately and combine the verdicts.
+
+    Sub-claims go through analyze_news_async, so each one is answered from
+    the verdict cache or near-duplicate index when possible, coalesced with
+    identical in-flight claims and queued fairly for Gemini under (channel,
+    user). At most `concurrency` of a message's claims are verified at once.
+
+    Args:
+        text (str): The message.
+        user: Requester identity for fair queuing.
+        channel (str): Scheduler channel, e.g. "api" or "telegram".
+
+    Returns:
+        dict or None: Fields of models.NewsAnalysisResult including claims, or
+        None when the message holds fewer than two claims (analyze it whole).
+
+    Raises:
+        SchedulerBusy: If Gemini's queue refused any of the claims.
+    """
+    claims = split_claims(text)
+    if len(claims) < 2:
+        return None
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = await asyncio.gather(
+        *(verify_claim(claim, semaphore, user, channel) for claim in claims),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, SchedulerBusy):
+            raise result
+    if all(isinstance(result, Exception) for result in results):
+        raise results[0]
+
+    verdicts = []
+    for claim, result in zip(claims, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Could not verify claim {snippet(claim, 40)!r}: {result}")
+            result = ClaimVerdict(claim=claim, verdict="Uncertain", confidence=0.0,
+                                  reason="This claim could not be verified right now.")
+        verdicts.append(result)
+    logger.info(f"Verified {len(claims)} claims separately for {channel} requester {user}")
+    return aggregate(verdicts).model_dump(exclude_none=True)
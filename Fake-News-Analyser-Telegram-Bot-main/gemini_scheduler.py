@@ -0,0 +1,476 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Quota budgets for this process; 0 disables a budget
+GEMINI_RPM_LIMIT = int(os.getenv("GEMINI_RPM_LIMIT", 0))
+GEMINI_TPM_LIMIT = int(os.getenv("GEMINI_TPM_LIMIT", 0))
+# AIMD bounds for concurrent Gemini calls; the limit starts at the maximum
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 8))
+GEMINI_MIN_CONCURRENCY = int(os.getenv("GEMINI_MIN_CONCURRENCY", 1))
+# Calls slower than this count as congestion, like a 429; 0 reacts to 429s only
+GEMINI_LATENCY_TARGET = float(os.getenv("GEMINI_LATENCY_TARGET_MS", 20000)) / 1000
+GEMINI_QUEUE_TIMEOUT = float(os.getenv("GEMINI_QUEUE_TIMEOUT", 60))  # seconds
+GEMINI_MAX_QUEUE = int(os.getenv("GEMINI_MAX_QUEUE", 1000))
+GEMINI_RATE_LIMIT_RETRIES = int(os.getenv("GEMINI_RATE_LIMIT_RETRIES", 2))
+# Share of Gemini capacity per channel, e.g. "api=2,telegram=1"; unlisted channels get 1
+GEMINI_CHANNEL_WEIGHTS = os.getenv("GEMINI_CHANNEL_WEIGHTS", "")
+
+# Token estimates used to charge the TPM budget before the real usage is known
+OUTPUT_TOKEN_ESTIMATE = 512
+IMAGE_TOKEN_ESTIMATE = 1032  # about four 768px tiles at 258 tokens each
+# Pause after a 429 without a retry delay; doubles on consecutive 429s
+RATE_LIMIT_BACKOFF = 2.0
+RATE_LIMIT_MAX_BACKOFF = 60.0
+# At most one multiplicative decrease per window, so a burst of 429s halves once
+DECREASE_COOLDOWN = 2.0
+RETRY_DELAY_PATTERN = re.compile(r"retryDelay'?\"?\s*:\s*'?\"?(\d+(?:\.\d+)?)s")
+WAIT_SAMPLES = 1000
+
+
+class SchedulerBusy(Exception):
+    """Raised when the Gemini queue is full or a call waited longer than the queue timeout."""
+
+
+def parse_weights(spec):
+    """Parse "api=2,telegram=1" into {"api": 2.0, "telegram": 1.0}."""
+    weights = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() and weight.strip():
+            weights[name.strip()] = max(float(weight), 0.01)
+    return weights
+
+
+def estimate_tokens(contents, system_instruction=""):
+    """
+    Rough token cost of a generate_content call: ~4 characters per text token,
+    a fixed charge per image and an allowance for the response.
+    """
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    tokens = len(system_instruction or "") // 4 + OUTPUT_TOKEN_ESTIMATE
+    for part in parts:
+        text = part if isinstance(part, str) else getattr(part, "text", None)
+        tokens += len(text) // 4 + 1 if isinstance(text, str) else IMAGE_TOKEN_ESTIMATE
+    return tokens
+
+
+def usage_tokens(response):
+    """Total tokens reported by a Gemini response, or None."""
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None) or None
+
+
+def is_rate_limited(error):
+    """True for Gemini quota errors from google-genai or google-generativeai."""
+    return (
+        getattr(error, "code", None) == 429
+        or getattr(error, "status", None) == "RESOURCE_EXHAUSTED"
+        or type(error).__name__ == "ResourceExhausted"
+    )
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait after a 429, if it said."""
+    response = getattr(error, "response", None)
+    header = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    if header and header.replace(".", "", 1).isdigit():
+        return float(header)
+    match = RETRY_DELAY_PATTERN.search(str(getattr(error, "details", "") or error))
+    return float(match.group(1)) if match else None
+
+
+class TokenBucket:
+    """Refills continuously at per_minute / 60 per second up to one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def delay(self, amount, now):
+        """Seconds until `amount` tokens are available (0 when unlimited)."""
+        if self.per_minute <= 0:
+            return 0.0
+        self._refill(now)
+        # A call larger than the whole budget waits for a full bucket rather than forever
+        missing = min(amount, self.capacity) - self.tokens
+        return missing * 60 / self.per_minute if missing > 0 else 0.0
+
+    def take(self, amount):
+        if self.per_minute > 0:
+            self.tokens -= amount  # may go negative; later calls then wait it off
+
+    def available(self, now):
+        if self.per_minute <= 0:
+            return None
+        self._refill(now)
+        return int(self.tokens)
+
+
+class _Waiter:
+    __slots__ = ("channel", "user", "cost", "start", "finish", "seq", "notify",
+                 "enqueued", "granted", "cancelled")
+
+    def __init__(self, channel, user, cost, notify):
+        self.channel = channel
+        self.user = user
+        self.cost = cost
+        self.notify = notify
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.finish, self.seq) < (other.finish, other.seq)
+
+
+class _Channel:
+    """Per-channel queue; users within a channel share it fairly."""
+
+    def __init__(self, weight):
+        self.weight = weight
+        self.heap = []
+        self.queued = 0
+        self.virtual_time = 0.0
+        self.user_finish = {}  # user -> finish tag of their last queued call
+        self.finish = 0.0  # finish tag of the channel's last turn
+        self.tag = None  # (start, finish) of the current head's turn
+
+
+class Slot:
+    """A granted Gemini call; report the response so real token usage is charged."""
+
+    def __init__(self, waiter):
+        self.channel = waiter.channel
+        self.user = waiter.user
+        self.cost = waiter.cost
+        self.started = time.monotonic()
+        self.wait = self.started - waiter.enqueued
+        self.tokens = None
+
+    def record(self, response):
+        """Record the token usage of a (final) Gemini response."""
+        self.tokens = usage_tokens(response) or self.tokens
+
+
+class GeminiScheduler:
+    """
+    Admission control for Gemini calls shared by every caller in the process.
+
+    Calls wait in a weighted fair queue: start-time fair queuing across
+    channels (by channel weight) and, within a channel, across users, so a
+    user sending many messages only delays their own backlog. A queued call
+    is admitted when the requests-per-minute and tokens-per-minute buckets
+    allow it and fewer than the current concurrency limit are running.
+
+    The limit adapts with AIMD: it grows by 1/limit per successful call
+    (about one per round of calls) and halves on a 429 or a call slower
+    than the latency target. A 429 also pauses admission for the server's
+    retry delay. Works from both event loops and threads.
+    """
+
+    def __init__(self, rpm=GEMINI_RPM_LIMIT, tpm=GEMINI_TPM_LIMIT,
+                 max_concurrency=GEMINI_MAX_CONCURRENCY, min_concurrency=GEMINI_MIN_CONCURRENCY,
+                 latency_target=GEMINI_LATENCY_TARGET, weights=None,
+                 queue_timeout=GEMINI_QUEUE_TIMEOUT, max_queue=GEMINI_MAX_QUEUE):
+        self.rpm = TokenBucket(rpm)
+        self.tpm = TokenBucket(tpm)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.latency_target = latency_target
+        self.weights = parse_weights(GEMINI_CHANNEL_WEIGHTS) if weights is None else weights
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+        self._queued = 0
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._backoff = RATE_LIMIT_BACKOFF
+        self._last_decrease = 0.0
+        self._timer = None
+        self._timer_due = None
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._metrics = {"calls": 0, "rate_limited": 0, "slow": 0, "errors": 0,
+                         "rejected": 0, "timeouts": 0, "decreases": 0}
+
+    # Queueing
+
+    def _enqueue(self, channel, user, cost, notify):
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._metrics["rejected"] += 1
+                raise SchedulerBusy(f"Gemini queue is full ({self.max_queue} waiting)")
+            queue = self._channels.get(channel)
+            if queue is None:
+                queue = self._channels[channel] = _Channel(self.weights.get(channel, 1.0))
+            waiter = _Waiter(channel, user, cost, notify)
+            waiter.seq = next(self._seq)
+            waiter.start = max(queue.virtual_time, queue.user_finish.get(user, 0.0))
+            waiter.finish = waiter.start + cost
+            queue.user_finish[user] = waiter.finish
+            heapq.heappush(queue.heap, waiter)
+            queue.queued += 1
+            self._queued += 1
+            self._dispatch()
+            return waiter
+
+    def _cancel(self, waiter):
+        """Withdraw a waiter; returns True if it had been granted meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            if not waiter.cancelled:
+                waiter.cancelled = True
+                queue = self._channels[waiter.channel]
+                queue.queued -= 1
+                if not queue.queued:
+                    queue.user_finish.clear()
+                self._queued -= 1
+            return False
+
+    def _head(self, queue):
+        while queue.heap and queue.heap[0].cancelled:
+            heapq.heappop(queue.heap)
+        return queue.heap[0] if queue.heap else None
+
+    def _dispatch(self):
+        """Admit queued calls while concurrency and budgets allow. Caller holds the lock."""
+        now = time.monotonic()
+        while self._queued and self._in_flight < int(self.limit):
+            # Channel whose head has the earliest finish tag goes next
+            best, best_head = None, None
+            for queue in self._channels.values():
+                head = self._head(queue)
+                if head is None:
+                    queue.tag = None
+                    continue
+                if queue.tag is None:
+                    start = max(self._virtual_time, queue.finish)
+                    queue.tag = (start, start + head.cost / queue.weight)
+                    queue.finish = queue.tag[1]
+                if best is None or queue.tag[1] < best.tag[1]:
+                    best, best_head = queue, head
+            if best is None:
+                return
+            delay = max(self._paused_until - now, self.rpm.delay(1, now), self.tpm.delay(best_head.cost, now))
+            if delay > 0:
+                self._wake_in(delay)
+                return
+            heapq.heappop(best.heap)
+            best.queued -= 1
+            self._queued -= 1
+            self._virtual_time = best.tag[0]
+            best.virtual_time = best_head.start
+            best.tag = None
+            if not best.queued:
+                best.user_finish.clear()  # idle users start fresh
+            try:
+                best_head.notify()
+            except RuntimeError:
+                continue  # the waiter's event loop has closed
+            self.rpm.take(1)
+            self.tpm.take(best_head.cost)
+            self._in_flight += 1
+            best_head.granted = True
+
+    def _wake_in(self, delay):
+        due = time.monotonic() + delay
+        if self._timer is not None and self._timer_due <= due:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._wake)
+        self._timer.daemon = True
+        self._timer_due = due
+        self._timer.start()
+
+    def _wake(self):
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    # Completion and AIMD
+
+    def _release(self, slot, error=None):
+        now = time.monotonic()
+        latency = now - slot.started
+        with self._lock:
+            self._in_flight -= 1
+            self._metrics["calls"] += 1
+            if slot.tokens is not None:
+                self.tpm.take(slot.tokens - slot.cost)  # settle the estimate against real usage
+            if error is not None and is_rate_limited(error):
+                self._metrics["rate_limited"] += 1
+                pause = retry_after(error)
+                # 429s from calls that were already in flight belong to the same episode
+                if now >= self._paused_until:
+                    pause = pause or self._backoff
+                    self._backoff = min(self._backoff * 2, RATE_LIMIT_MAX_BACKOFF)
+                    self._decrease(now, f"429 from Gemini, pausing {pause:.1f}s")
+                if pause:
+                    self._paused_until = max(self._paused_until, now + pause)
+            elif error is not None:
+                if not isinstance(error, asyncio.CancelledError):
+                    self._metrics["errors"] += 1
+            elif self.latency_target and latency > self.latency_target:
+                self._metrics["slow"] += 1
+                self._decrease(now, f"call took {latency:.1f}s")
+            else:
+                self._backoff = RATE_LIMIT_BACKOFF
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._dispatch()
+
+    def _decrease(self, now, reason):
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self._metrics["decreases"] += 1
+        self.limit = max(self.min_concurrency, self.limit / 2)
+        logger.warning(f"Gemini concurrency limit lowered to {int(self.limit)}: {reason}")
+
+    def _granted(self, waiter):
+        slot = Slot(waiter)
+        with self._lock:
+            self._waits.append(slot.wait)
+        return slot
+
+    def _timed_out(self, waiter):
+        with self._lock:
+            self._metrics["timeouts"] += 1
+        waited = time.monotonic() - waiter.enqueued
+        return SchedulerBusy(f"Waited {waited:.1f}s for a Gemini slot")
+
+    # Public API
+
+    @asynccontextmanager
+    async def slot(self, user=None, channel="api", cost=OUTPUT_TOKEN_ESTIMATE):
+        """
+        Async context manager holding one Gemini call slot.
+
+        Args:
+            user: Identifier of the requester (chat id, phone number, ...).
+            channel (str): Calling app, weighted by GEMINI_CHANNEL_WEIGHTS.
+            cost (int): Estimated tokens for the call (see estimate_tokens).
+
+        Raises:
+            SchedulerBusy: If the queue is full or the wait exceeds the queue timeout.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve():
+            if not future.done():
+                future.set_result(None)
+
+        waiter = self._enqueue(channel, user, cost, lambda: loop.call_soon_threadsafe(resolve))
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except BaseException as e:
+            if not self._cancel(waiter):
+                if isinstance(e, asyncio.TimeoutError):
+                    raise self._timed_out(waiter) from None
+                raise
+            if not isinstance(e, asyncio.TimeoutError):
+                # Granted just as we were cancelled: give the slot back
+                self._release(Slot(waiter), e)
+                raise
+        slot = self._granted(waiter)
+        try:
+            yield slot
+        except BaseException as e:
+            self._release(slot, e)
+            raise
+        self._release(slot)
+
+    @contextmanager
+    def slot_sync(self, user=None, channel="api", cost=OUTPUT_TOKEN_ESTIMATE):
+        """Blocking variant of slot() for threads and synchronous code."""
+        event = threading.Event()
+        waiter = self._enqueue(channel, user, cost, event.set)
+        if not event.wait(self.queue_timeout) and not self._cancel(waiter):
+            raise self._timed_out(waiter)
+        slot = self._granted(waiter)
+        try:
+            yield slot
+        except BaseException as e:
+            self._release(slot, e)
+            raise
+        self._release(slot)
+
+    async def call(self, func, *args, user=None, channel="api", cost=OUTPUT_TOKEN_ESTIMATE, **kwargs):
+        """
+        Run `await func(*args, **kwargs)` in a slot, retrying after 429s.
+
+        The call re-queues behind the pause a 429 sets, up to
+        GEMINI_RATE_LIMIT_RETRIES times, before the error is raised.
+        """
+        for attempt in range(GEMINI_RATE_LIMIT_RETRIES + 1):
+            try:
+                async with self.slot(user, channel, cost) as slot:
+                    response = await func(*args, **kwargs)
+                    slot.record(response)
+                    return response
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == GEMINI_RATE_LIMIT_RETRIES:
+                    raise
+                logger.info(f"Retrying Gemini call for {channel}/{user} after 429")
+
+    def call_sync(self, func, *args, user=None, channel="api", cost=OUTPUT_TOKEN_ESTIMATE, **kwargs):
+        """Blocking variant of call()."""
+        for attempt in range(GEMINI_RATE_LIMIT_RETRIES + 1):
+            try:
+                with self.slot_sync(user, channel, cost) as slot:
+                    response = func(*args, **kwargs)
+                    slot.record(response)
+                    return response
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == GEMINI_RATE_LIMIT_RETRIES:
+                    raise
+                logger.info(f"Retrying Gemini call for {channel}/{user} after 429")
+
+    def stats(self):
+        """Queue depth per channel, wait times, AIMD limit and remaining budgets."""
+        now = time.monotonic()
+        with self._lock:
+            waits = sorted(self._waits)
+            metrics = dict(self._metrics)
+            metrics.update({
+                "queued": self._queued,
+                "queued_by_channel": {name: queue.queued for name, queue in self._channels.items()},
+                "in_flight": self._in_flight,
+                "concurrency_limit": int(self.limit),
+                "paused_for": round(max(0.0, self._paused_until - now), 1),
+                "rpm_available": self.rpm.available(now),
+                "tpm_available": self.tpm.available(now),
+            })
+        metrics["wait_ms"] = {
+            "avg": round(sum(waits) * 1000 / len(waits), 1) if waits else 0.0,
+            "p50": round(waits[len(waits) // 2] * 1000, 1) if waits else 0.0,
+            "p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0,
+            "max": round(waits[-1] * 1000, 1) if waits else 0.0,
+        }
+        return metrics
+
+
+# Process-wide scheduler shared by every Gemini caller
+gemini_scheduler = GeminiScheduler()
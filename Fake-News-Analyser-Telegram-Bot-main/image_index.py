@@ -0,0 +1,313 @@
+import hashlib
+import io
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from cache import canonicalize_claim, CACHE_TTL
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it images are only matched exactly
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Index configuration
+IMAGE_INDEX_ENABLED = os.getenv("IMAGE_INDEX_ENABLED", "1") != "0" and Image is not None
+IMAGE_INDEX_MAX_DISTANCE = int(os.getenv("IMAGE_INDEX_MAX_DISTANCE", 8))  # bits out of 64
+IMAGE_HASH_METHOD = os.getenv("IMAGE_HASH_METHOD", "phash")
+IMAGE_INDEX_TTL = int(os.getenv("IMAGE_INDEX_TTL", CACHE_TTL))  # seconds
+# Expired rows are deleted every this many adds; the tree is rebuilt once most of it is stale
+PRUNE_EVERY = 256
+REBUILD_MIN_STALE = 1024
+
+PHASH_SIZE = 32
+PHASH_LOW_FREQ = 8
+# Rows of the DCT-II basis for the low frequencies kept by pHash
+_DCT_BASIS = [
+    [math.cos(math.pi * u * (2 * x + 1) / (2 * PHASH_SIZE)) for x in range(PHASH_SIZE)]
+    for u in range(PHASH_LOW_FREQ)
+]
+
+
+def _grayscale(data, size):
+    image = Image.open(io.BytesIO(data))
+    image.draft("L", size)  # lets JPEG decode at reduced size
+    return image.convert("L").resize(size, Image.LANCZOS)
+
+
+def dhash(data):
+    """64-bit difference hash: compares horizontally adjacent pixels of a 9x8 thumbnail."""
+    pixels = list(_grayscale(data, (9, 8)).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def phash(data):
+    """64-bit perceptual hash: signs of the low-frequency DCT of a 32x32 thumbnail vs their median."""
+    pixels = list(_grayscale(data, (PHASH_SIZE, PHASH_SIZE)).getdata())
+    rows = [pixels[i * PHASH_SIZE:(i + 1) * PHASH_SIZE] for i in range(PHASH_SIZE)]
+    # DCT along rows, then along columns, keeping only the low frequencies
+    row_dct = [[sum(b * p for b, p in zip(basis, row)) for basis in _DCT_BASIS] for row in rows]
+    coefficients = [
+        sum(_DCT_BASIS[u][x] * row_dct[x][v] for x in range(PHASH_SIZE))
+        for u in range(PHASH_LOW_FREQ)
+        for v in range(PHASH_LOW_FREQ)
+    ]
+    ac_terms = sorted(coefficients[1:])  # DC term excluded from the median
+    median = ac_terms[len(ac_terms) // 2]
+    value = 0
+    for coefficient in coefficients:
+        value = (value << 1) | (coefficient > median)
+    return value
+
+
+HASH_FUNCTIONS = {"phash": phash, "dhash": dhash}
+
+
+def image_hash(data, method=IMAGE_HASH_METHOD):
+    """Perceptual hash of encoded image bytes, or None if the image cannot be decoded."""
+    if Image is None:
+        return None
+    try:
+        return HASH_FUNCTIONS[method](bytes(data))
+    except Exception as e:
+        logger.warning(f"Could not hash image: {e}")
+        return None
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes with Hamming distance."""
+
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    def add(self, value, item):
+        node = [value, [item], {}]
+        if self._root is None:
+            self._root = node
+            self._size += 1
+            return
+        current = self._root
+        while True:
+            distance = hamming(value, current[0])
+            if distance == 0:
+                current[1].append(item)
+                return
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                self._size += 1
+                return
+            current = child
+
+    def search(self, value, max_distance):
+        """Return (distance, item) for every stored item within max_distance, closest first."""
+        results = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node_value, items, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= max_distance:
+                results.extend((distance, item) for item in items)
+            # Triangle inequality: only subtrees in this band can hold matches
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        results.sort(key=lambda result: result[0])
+        return results
+
+    def entries(self):
+        """Yield (value, item) for every stored item."""
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node_value, items, children = stack.pop()
+            for item in items:
+                yield node_value, item
+            stack.extend(children.values())
+
+    def __len__(self):
+        return self._size
+
+
+def text_fingerprint(text):
+    """Short key for the text accompanying an image."""
+    return hashlib.sha1(canonicalize_claim(text).encode("utf-8")).hexdigest()[:16]
+
+
+class ImageIndex:
+    """
+    Perceptual-hash index of previously analyzed images.
+
+    A stored verdict is reused when a new image is within `max_distance`
+    bits of an indexed one and was sent with the same (canonical) text.
+    Entries are optionally persisted to a SQLite table and reloaded on
+    first use. Like the cache entries they point to, they expire after
+    `ttl` seconds: expired rows are deleted as new images are added, and
+    the BK-tree, which cannot delete, is rebuilt once most of it is stale.
+    """
+
+    def __init__(self, path=None, table="image_hashes", max_distance=IMAGE_INDEX_MAX_DISTANCE,
+                 method=IMAGE_HASH_METHOD, enabled=IMAGE_INDEX_ENABLED, ttl=IMAGE_INDEX_TTL):
+        self.path = path
+        self.table = table
+        self.max_distance = max_distance
+        self.method = method
+        self.enabled = enabled
+        self.ttl = ttl
+        self._tree = BKTree()
+        self._added = deque()  # created_at of every item in the tree, oldest first
+        self._dead = set()  # values discarded since the last rebuild
+        self._stale = 0
+        self._adds = 0
+        self._conn = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path:
+            return
+        try:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS {self.table} (
+                    hash TEXT NOT NULL,
+                    method TEXT NOT NULL,
+                    text_key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_created_at ON {self.table} (created_at)")
+            self._conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.ttl,))
+            self._conn.commit()
+            rows = self._conn.execute(
+                f"SELECT hash, text_key, value, created_at FROM {self.table} WHERE method = ? ORDER BY created_at",
+                (self.method,),
+            ).fetchall()
+            for hash_hex, text_key, value, created_at in rows:
+                self._insert(int(hash_hex, 16), (text_key, value, created_at))
+        except sqlite3.Error as e:
+            logger.error(f"Image index persistence unavailable: {e}")
+            self._conn = None
+
+    def _insert(self, image_hash_value, item):
+        self._tree.add(image_hash_value, item)
+        self._added.append(item[2])
+
+    def _prune(self, now):
+        """Delete expired rows and rebuild the tree without stale items once they dominate it."""
+        cutoff = now - self.ttl
+        while self._added and self._added[0] < cutoff:
+            self._added.popleft()
+            self._stale += 1
+        if self._conn is not None:
+            try:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (cutoff,))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Image index prune failed: {e}")
+        if self._stale > REBUILD_MIN_STALE and self._stale * 2 > len(self._added) + self._stale:
+            live = sorted(
+                ((item[2], value, item) for value, item in self._tree.entries()
+                 if item[2] >= cutoff and item[1] not in self._dead),
+                key=lambda entry: entry[0],
+            )
+            self._tree, self._added, self._dead, self._stale = BKTree(), deque(), set(), 0
+            for _, value, item in live:
+                self._insert(value, item)
+            self.rebuilds += 1
+
+    def hash(self, data):
+        return image_hash(data, self.method) if self.enabled else None
+
+    def query(self, image_hash_value, text=""):
+        """
+        Find the stored value for the closest matching image sent with the same text.
+
+        Returns:
+            tuple: (value, Hamming distance), or None if no live image is close enough.
+        """
+        if not self.enabled or image_hash_value is None:
+            return None
+        key = text_fingerprint(text)
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            self._load()
+            matches = self._tree.search(image_hash_value, self.max_distance)
+            for distance, (text_key, value, created_at) in matches:
+                if text_key == key and created_at >= cutoff and value not in self._dead:
+                    self.hits += 1
+                    return value, distance
+        self.misses += 1
+        return None
+
+    def add(self, image_hash_value, value, text=""):
+        if not self.enabled or image_hash_value is None:
+            return
+        key = text_fingerprint(text)
+        now = time.time()
+        with self._lock:
+            self._load()
+            self._dead.discard(value)
+            self._insert(image_hash_value, (key, value, now))
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        f"INSERT INTO {self.table} (hash, method, text_key, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (f"{image_hash_value:016x}", self.method, key, value, now),
+                    )
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Image index write failed: {e}")
+            self._adds += 1
+            if self._adds % PRUNE_EVERY == 0:
+                self._prune(now)
+
+    def discard(self, value):
+        """Stop matching images stored with this value, e.g. once its cache entry is gone."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._load()
+            self._dead.add(value)
+            self._stale += 1
+            if self._conn is not None:
+                try:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE value = ?", (value,))
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Image index delete failed: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "method": self.method,
+            "max_distance": self.max_distance,
+            "hashes": len(self._tree),
+            "indexed": len(self._added),
+            "rebuilds": self.rebuilds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
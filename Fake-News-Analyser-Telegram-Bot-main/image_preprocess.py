@@ -0,0 +1,207 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it images are sent as received
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Preprocessing configuration
+IMAGE_PREPROCESS_ENABLED = os.getenv("IMAGE_PREPROCESS_ENABLED", "1") != "0" and Image is not None
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", 1600))  # pixels, longest side
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", 85))
+IMAGE_PREPROCESS_WORKERS = int(os.getenv("IMAGE_PREPROCESS_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Formats that are passed through untouched when they are small enough and carry no EXIF
+COMPACT_FORMATS = {"JPEG", "WEBP"}
+FORMAT_MIME = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+_pool = None
+_pool_lock = threading.Lock()
+_metrics_lock = threading.Lock()
+_metrics = {
+    "images": 0,
+    "processed": 0,
+    "passthrough": 0,
+    "failures": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "seconds": 0.0,
+}
+
+
+def needs_preprocessing(data, max_edge=IMAGE_MAX_EDGE):
+    """
+    Cheap check from the image header: is the image too large, metadata-laden or lossless?
+
+    Only the header is read, so this is safe to call on the event loop.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return (
+                max(image.size) > max_edge
+                or image.format not in COMPACT_FORMATS
+                or bool(image.info.get("exif"))
+            )
+    except Exception:
+        return False  # not an image Pillow can read; send it as is
+
+
+def preprocess_image(data, max_edge=IMAGE_MAX_EDGE, quality=IMAGE_JPEG_QUALITY):
+    """
+    Decode, downscale, strip metadata and re-encode an image as JPEG
+    (or PNG, when a PNG source stays smaller that way).
+
+    Runs in the worker processes; also usable directly.
+
+    Args:
+        data (bytes): Encoded image.
+        max_edge (int): Longest side of the output, in pixels.
+        quality (int): JPEG quality of the output.
+
+    Returns:
+        tuple: (bytes, mime type). The original bytes are returned when
+        re-encoding would not make a smaller, metadata-free image.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        original_format = image.format
+        had_exif = bool(image.info.get("exif"))
+        resized = max(image.size) > max_edge
+        # Lets JPEG decode straight at (close to) the target size
+        image.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        if resized:
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        # No exif= argument, so EXIF (GPS, device) and other metadata are dropped
+        encoded, mime_type = _encode(image, "JPEG", quality=quality, optimize=True), "image/jpeg"
+        if original_format == "PNG":
+            # Screenshots and graphics often compress better losslessly
+            png = _encode(image, "PNG")
+            if len(png) < len(encoded):
+                encoded, mime_type = png, "image/png"
+    if not resized and not had_exif and len(encoded) >= len(data):
+        return data, FORMAT_MIME.get(original_format, "image/jpeg")
+    return encoded, mime_type
+
+
+def _encode(image, image_format, **options):
+    output = io.BytesIO()
+    image.save(output, format=image_format, **options)
+    return output.getvalue()
+
+
+def get_pool():
+    """Process pool for preprocessing, started on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn rather than fork: the servers run threads that must not be forked mid-lock
+                _pool = ProcessPoolExecutor(
+                    max_workers=IMAGE_PREPROCESS_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def shutdown_pool():
+    """Stop the worker processes; call on application shutdown."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _reset_broken_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def _record(size_in, size_out, elapsed, outcome):
+    with _metrics_lock:
+        _metrics["images"] += 1
+        _metrics[outcome] += 1
+        _metrics["bytes_in"] += size_in
+        _metrics["bytes_out"] += size_out
+        _metrics["seconds"] += elapsed
+    if outcome == "processed":
+        logger.info(f"Preprocessed image {size_in / 1024:.0f} KB -> {size_out / 1024:.0f} KB in {elapsed * 1000:.0f} ms")
+
+
+async def preprocess_image_async(data, mime_type=None):
+    """
+    Preprocess an image in the process pool without blocking the event loop.
+
+    Returns:
+        tuple: (bytes, mime type); the input unchanged if preprocessing is
+        disabled, unnecessary or fails.
+    """
+    if not IMAGE_PREPROCESS_ENABLED or not data:
+        return data, mime_type
+    start = time.perf_counter()
+    if not needs_preprocessing(data):
+        _record(len(data), len(data), time.perf_counter() - start, "passthrough")
+        return data, mime_type
+    try:
+        loop = asyncio.get_running_loop()
+        result, result_mime = await loop.run_in_executor(get_pool(), preprocess_image, data)
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            _reset_broken_pool()
+        logger.error(f"Image preprocessing failed, sending original: {e}")
+        _record(len(data), len(data), time.perf_counter() - start, "failures")
+        return data, mime_type
+    _record(len(data), len(result), time.perf_counter() - start, "processed")
+    return result, result_mime
+
+
+def preprocess_image_sync(data, mime_type=None):
+    """Blocking variant of preprocess_image_async for threads and synchronous code."""
+    if not IMAGE_PREPROCESS_ENABLED or not data:
+        return data, mime_type
+    start = time.perf_counter()
+    if not needs_preprocessing(data):
+        _record(len(data), len(data), time.perf_counter() - start, "passthrough")
+        return data, mime_type
+    try:
+        result, result_mime = get_pool().submit(preprocess_image, data).result()
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            _reset_broken_pool()
+        logger.error(f"Image preprocessing failed, sending original: {e}")
+        _record(len(data), len(data), time.perf_counter() - start, "failures")
+        return data, mime_type
+    _record(len(data), len(result), time.perf_counter() - start, "processed")
+    return result, result_mime
+
+
+def stats():
+    """Counters plus before/after bytes and average latency per image."""
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    images = metrics["images"]
+    metrics["enabled"] = IMAGE_PREPROCESS_ENABLED
+    metrics["avg_ms"] = round(metrics["seconds"] * 1000 / images, 1) if images else 0.0
+    metrics["bytes_saved_ratio"] = (
+        round(1 - metrics["bytes_out"] / metrics["bytes_in"], 3) if metrics["bytes_in"] else 0.0
+    )
+    metrics["seconds"] = round(metrics["seconds"], 3)
+    return metrics
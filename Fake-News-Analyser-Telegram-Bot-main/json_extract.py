@@ -0,0 +1,323 @@
+import json
+import logging
+import re
+
+from models import NewsAnalysisResult
+
+logger = logging.getLogger(__name__)
+
+STRING_SPECIAL = re.compile(r'["\\]')
+SCALAR_END = re.compile(r'[,}\]\s]')
+NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+WHITESPACE = " \t\r\n"
+SCALAR_START = "-0123456789tfnTFN"
+# Python-style literals the model sometimes emits instead of JSON ones
+LITERAL_ALIASES = {"True": "true", "False": "false", "None": "null"}
+VERDICTS = {"real": "Real", "fake": "Fake", "uncertain": "Uncertain"}
+# Tolerates raw control characters (e.g. newlines) inside strings
+DECODER = json.JSONDecoder(strict=False)
+
+
+def search_link(title, user_text=""):
+    """Google search for a source title and the start of the user input."""
+    search_query = f"{title} {user_text[:50]}".strip().replace(' ', '+')
+    return f"https://www.google.com/search?q={search_query}"
+
+
+def source_link(title, link, user_text=""):
+    """Return link if it is a usable URL, otherwise a Google search for the source title."""
+    if not str(link).startswith(('http://', 'https://')) or str(link).isdigit() or len(str(link)) < 5:
+        # Create a search link based on the title and user input
+        return search_link(title, user_text)
+    return link
+
+
+class AnalysisStreamParser:
+    """
+    Single-pass extractor for the verdict JSON in Gemini output.
+
+    Scans the text once, skipping prose and ``` fences around the object and
+    dropping trailing commas. Text can be fed in arbitrary chunks, e.g. as it
+    streams from Gemini; feed() returns (event, data) pairs as fields become
+    available: "verdict" and "confidence" once complete, "reason" deltas as
+    the string grows, and one "source" per completed title/link pair.
+
+    Values are built while scanning, so the text is not parsed a second
+    time. A candidate object is abandoned at the first character that
+    cannot be JSON (prose like "{this}" or a fence inside an unclosed brace),
+    and scanning resumes from there.
+    """
+
+    def __init__(self, user_text=""):
+        self.user_text = user_text
+        self.data = None  # first complete top-level object with a verdict
+        self.fallback = None  # first complete object without one
+        self.sent = set()
+        self.reason_sent = 0
+        self._reset()
+
+    def _reset(self):
+        self._stack = None  # None while scanning prose; else [kind, state, key, container] frames
+        self._string = None  # raw pieces of the string being read
+        self._string_is_key = False
+        self._escape = False
+        self._scalar = None
+
+    def feed(self, chunk):
+        """Consume the next piece of model output and return newly available field events."""
+        events = []
+        if self.data is None and chunk:
+            self._scan(chunk, events)
+            if self._string is not None and self._at_top_level_value("reason"):
+                self._reason_delta(events)
+        return events
+
+    def close(self):
+        """Finish the stream and return the parsed analysis, or None."""
+        return to_analysis_result(self.data or self.fallback, self.user_text)
+
+    def _scan(self, text, events):
+        i, n = 0, len(text)
+        while i < n and self.data is None:
+            if self._stack is None:
+                start = text.find("{", i)
+                if start < 0:
+                    return
+                self._stack = [["o", "k?", None, {}]]
+                i = start + 1
+            elif self._string is not None:
+                if self._escape:
+                    self._string.append(text[i])
+                    self._escape = False
+                    i += 1
+                    continue
+                match = STRING_SPECIAL.search(text, i)
+                if match is None:
+                    self._string.append(text[i:])
+                    return
+                end = match.start()
+                self._string.append(text[i:end])
+                i = end + 1
+                if text[end] == "\\":
+                    self._string.append("\\")
+                    self._escape = True
+                else:
+                    self._end_string(events)
+            elif self._scalar is not None:
+                match = SCALAR_END.search(text, i)
+                if match is None:
+                    self._scalar.append(text[i:])
+                    return
+                self._scalar.append(text[i:match.start()])
+                i = match.start()
+                self._end_scalar(events)
+            elif text[i] in WHITESPACE:
+                i += 1
+            elif self._structural(text[i]):
+                i += 1
+            else:
+                # Not JSON after all; look for the next candidate from this character
+                self._reset()
+
+    def _structural(self, char):
+        frame = self._stack[-1]
+        kind, state = frame[0], frame[1]
+        if state in ("v", "v?"):
+            if char == "{":
+                self._stack.append(["o", "k?", None, {}])
+                return True
+            if char == "[":
+                self._stack.append(["a", "v?", None, []])
+                return True
+            if char == '"':
+                self._string, self._string_is_key = [], False
+                return True
+            if char in SCALAR_START:
+                self._scalar = [char]
+                return True
+        if char == '"' and state in ("k?", "k"):
+            self._string, self._string_is_key = [], True
+            return True
+        if char == ":" and state == ":":
+            frame[1] = "v"
+            return True
+        if char == "," and state == ",":
+            frame[1] = "k" if kind == "o" else "v"
+            return True
+        # A close right after a comma ("k"/"v" state) drops the trailing comma
+        if (char == "}" and kind == "o" and state in ("k?", "k", ",")) or (
+                char == "]" and kind == "a" and state in ("v?", "v", ",")):
+            self._stack.pop()
+            if self._stack:
+                self._add_value(self._stack[-1], frame[3])
+            else:
+                self._finish_candidate(frame[3])
+            return True
+        return False
+
+    def _add_value(self, frame, value):
+        if frame[0] == "o":
+            frame[3][frame[2]] = value
+        else:
+            frame[3].append(value)
+        frame[1] = ","
+
+    def _end_string(self, events):
+        value = "".join(self._string)
+        self._string = None
+        if "\\" in value:
+            try:
+                value = DECODER.decode(f'"{value}"')
+            except json.JSONDecodeError:
+                self._reset()
+                return
+        frame = self._stack[-1]
+        if self._string_is_key:
+            frame[1], frame[2] = ":", value
+            return
+        self._value_event(frame, value, events)
+        self._add_value(frame, value)
+
+    def _end_scalar(self, events):
+        token = "".join(self._scalar)
+        self._scalar = None
+        try:
+            value = DECODER.decode(LITERAL_ALIASES.get(token, token))
+        except json.JSONDecodeError:
+            self._reset()
+            return
+        frame = self._stack[-1]
+        self._value_event(frame, value, events)
+        self._add_value(frame, value)
+
+    def _value_event(self, frame, value, events):
+        depth = len(self._stack)
+        if depth == 1:
+            key = frame[2]
+            if key == "reason" and isinstance(value, str):
+                self._reason_delta(events, value)
+            elif key in ("verdict", "confidence") and key not in self.sent:
+                self.sent.add(key)
+                if key == "verdict":
+                    events.append(("verdict", {"verdict": normalize_verdict(value)}))
+                else:
+                    events.append(("confidence", {"confidence": normalize_confidence(value)}))
+        elif depth == 2 and self._stack[0][2] == "sources" and isinstance(value, str):
+            title = frame[2] if frame[0] == "o" else value
+            events.append(("source", {"title": str(title), "link": source_link(title, value, self.user_text)}))
+
+    def _at_top_level_value(self, key):
+        return len(self._stack or ()) == 1 and self._stack[0][1] == "v" and self._stack[0][2] == key \
+            and not self._string_is_key
+
+    def _reason_delta(self, events, text=None):
+        if "reason" in self.sent:
+            return
+        if text is None:
+            raw = "".join(self._string)
+            # Decode the longest prefix that doesn't end in a partly received escape
+            for cut in range(6):
+                try:
+                    text = DECODER.decode(f'"{raw[:len(raw) - cut]}"')
+                    break
+                except json.JSONDecodeError:
+                    continue
+            else:
+                return
+            if text and "\ud800" <= text[-1] <= "\udbff":
+                text = text[:-1]  # first half of a surrogate pair
+        else:
+            self.sent.add("reason")
+        delta = text[self.reason_sent:]
+        self.reason_sent = len(text)
+        if delta:
+            events.append(("reason", {"delta": delta}))
+
+    def _finish_candidate(self, data):
+        self._reset()
+        if data.get("verdict") not in (None, ""):
+            self.data = data
+        elif self.fallback is None:
+            self.fallback = data
+
+
+def normalize_verdict(value):
+    verdict = str(value).strip()
+    return VERDICTS.get(verdict.lower(), verdict)
+
+
+def normalize_confidence(value):
+    """Confidence as a float in [0, 1]; accepts 0.85, 85, "85%" and "0.85"."""
+    if isinstance(value, bool):
+        return 0.0
+    if isinstance(value, str):
+        match = NUMBER_PATTERN.search(value)
+        value = float(match.group()) if match else 0.0
+    if not isinstance(value, (int, float)):
+        return 0.0
+    if value > 1:
+        value /= 100
+    return min(max(float(value), 0.0), 1.0)
+
+
+def normalize_sources(sources, user_text=""):
+    """Sources as {title: link}; accepts a mapping, a list of links or a list of {title, url} objects."""
+    if isinstance(sources, dict):
+        return {str(title): source_link(title, link, user_text) for title, link in sources.items()}
+    normalized = {}
+    if isinstance(sources, list):
+        for item in sources:
+            if isinstance(item, str):
+                normalized[item] = source_link(item, item, user_text)
+            elif isinstance(item, dict):
+                link = item.get("url") or item.get("link") or ""
+                title = str(item.get("title") or link)
+                if title:
+                    normalized[title] = source_link(title, link, user_text)
+    return normalized
+
+
+def to_analysis_result(data, user_text=""):
+    """
+    Build a NewsAnalysisResult from a parsed verdict object.
+
+    Args:
+        data (dict): Object extracted from the model output.
+        user_text (str): Original user input, used for source search links.
+
+    Returns:
+        NewsAnalysisResult or None: None when there is no verdict.
+    """
+    if not isinstance(data, dict) or data.get("verdict") in (None, ""):
+        return None
+    references = data.get("references")
+    if not isinstance(references, list) or not all(isinstance(ref, str) for ref in references):
+        references = None
+    return NewsAnalysisResult(
+        verdict=normalize_verdict(data["verdict"]),
+        confidence=normalize_confidence(data.get("confidence")),
+        reason=str(data.get("reason") or ""),
+        sources=normalize_sources(data.get("sources"), user_text),
+        references=references,
+    )
+
+
+def extract_json(response_text):
+    """Return the verdict object found in model output as a dict, or None."""
+    parser = AnalysisStreamParser()
+    parser.feed(response_text or "")
+    return parser.data or parser.fallback
+
+
+def extract_analysis(response_text, user_text=""):
+    """
+    Parse model output into a NewsAnalysisResult.
+
+    Args:
+        response_text (str): Raw Gemini response.
+        user_text (str): Original user input, used for source search links.
+
+    Returns:
+        NewsAnalysisResult or None: None if no verdict object could be found.
+    """
+    return to_analysis_result(extract_json(response_text), user_text)
@@ -0,0 +1,201 @@
+import hashlib
+import logging
+import math
+import os
+import re
+from collections import Counter
+
+import metrics
+import sarvam
+from cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Language identification configuration
+LANG_ID_LOCAL_ENABLED = os.getenv("LANG_ID_LOCAL_ENABLED", "1") != "0"
+LANG_ID_MIN_SCRIPT_SHARE = float(os.getenv("LANG_ID_MIN_SCRIPT_SHARE", 0.8))
+LANG_ID_MIN_MARGIN = float(os.getenv("LANG_ID_MIN_MARGIN", 0.15))
+LANG_ID_CACHE_SIZE = int(os.getenv("LANG_ID_CACHE_SIZE", 10000))
+
+# Unicode blocks of the scripts we see most, mapped to candidate Sarvam language codes
+SCRIPT_RANGES = [
+    (0x0900, 0x097F, "Devanagari"),
+    (0x0980, 0x09FF, "Bengali"),
+    (0x0A00, 0x0A7F, "Gurmukhi"),
+    (0x0A80, 0x0AFF, "Gujarati"),
+    (0x0B00, 0x0B7F, "Oriya"),
+    (0x0B80, 0x0BFF, "Tamil"),
+    (0x0C00, 0x0C7F, "Telugu"),
+    (0x0C80, 0x0CFF, "Kannada"),
+    (0x0D00, 0x0D7F, "Malayalam"),
+    (0x0041, 0x005A, "Latin"),
+    (0x0061, 0x007A, "Latin"),
+    (0x00C0, 0x024F, "Latin"),
+]
+SCRIPT_LANGUAGES = {
+    "Devanagari": ["hi-IN", "mr-IN"],
+    "Bengali": ["bn-IN"],
+    "Gurmukhi": ["pa-IN"],
+    "Gujarati": ["gu-IN"],
+    "Oriya": ["od-IN"],
+    "Tamil": ["ta-IN"],
+    "Telugu": ["te-IN"],
+    "Kannada": ["kn-IN"],
+    "Malayalam": ["ml-IN"],
+    "Latin": ["en-IN", "hi-IN"],  # hi-IN here is romanized Hindi
+}
+
+# Seed text for the character trigram profiles of languages sharing a script
+PROFILE_SEEDS = {
+    ("Devanagari", "hi-IN"): (
+        "यह खबर पूरी तरह से झूठी है और सरकार ने ऐसी कोई घोषणा नहीं की है। "
+        "प्रधानमंत्री ने कहा कि देश में सभी लोगों को मुफ्त में टीका दिया जाएगा। "
+        "इस संदेश को ज्यादा से ज्यादा लोगों के साथ साझा करें। "
+        "क्या यह सच है कि कल से सभी बैंक बंद रहेंगे? "
+        "वायरल वीडियो में दिखाया गया है कि पुलिस ने लोगों पर लाठीचार्ज किया था। "
+        "सोशल मीडिया पर यह दावा किया जा रहा है कि नए नोट में चिप लगी हुई है। "
+        "उन्होंने बताया कि यह जानकारी गलत है और लोगों को इस पर विश्वास नहीं करना चाहिए। "
+        "मैंने सुना है कि अगले हफ्ते से बिजली के दाम बढ़ने वाले हैं, क्या आपको इसके बारे में पता है? "
+        "हमारे गांव के लोग कह रहे थे कि नदी का पानी पीने से बीमारी होती है। "
+        "अधिकारियों के अनुसार इस योजना का लाभ केवल उन्हीं परिवारों को मिलेगा जिनके पास राशन कार्ड है।"
+    ),
+    ("Devanagari", "mr-IN"): (
+        "ही बातमी पूर्णपणे खोटी आहे आणि सरकारने अशी कोणतीही घोषणा केलेली नाही. "
+        "पंतप्रधानांनी सांगितले की देशातील सर्व लोकांना मोफत लस दिली जाईल. "
+        "हा संदेश जास्तीत जास्त लोकांपर्यंत पोहोचवा. "
+        "उद्यापासून सर्व बँका बंद राहणार आहेत हे खरे आहे का? "
+        "व्हायरल व्हिडिओमध्ये पोलिसांनी लोकांवर लाठीमार केल्याचे दाखवले आहे. "
+        "सोशल मीडियावर असा दावा केला जात आहे की नवीन नोटेमध्ये चिप बसवलेली आहे. "
+        "त्यांनी सांगितले की ही माहिती चुकीची आहे आणि लोकांनी यावर विश्वास ठेवू नये. "
+        "मी ऐकले आहे की पुढच्या आठवड्यापासून विजेचे दर वाढणार आहेत, तुम्हाला याबद्दल माहिती आहे का? "
+        "आमच्या गावातील लोक म्हणत होते की नदीचे पाणी प्यायल्याने आजार होतो. "
+        "अधिकाऱ्यांच्या म्हणण्यानुसार या योजनेचा लाभ फक्त ज्या कुटुंबांकडे रेशन कार्ड आहे त्यांनाच मिळेल."
+    ),
+    ("Latin", "en-IN"): (
+        "The government has not made any such announcement and this news is completely false. "
+        "The prime minister said that everyone in the country will get the vaccine for free. "
+        "Share this message with as many people as possible. "
+        "Is it true that all banks will remain closed from tomorrow? "
+        "The viral video shows police charging at people with batons. "
+        "A claim is being made on social media that the new notes contain a chip. "
+        "He said that this information is wrong and people should not believe it."
+    ),
+    ("Latin", "hi-IN"): (
+        "yeh khabar bilkul jhooth hai aur sarkar ne aisi koi ghoshna nahi ki hai. "
+        "pradhan mantri ne kaha ki desh mein sabhi logon ko muft mein tika diya jayega. "
+        "is message ko zyada se zyada logon ke saath share karo. "
+        "kya yeh sach hai ki kal se sabhi bank band rahenge? "
+        "viral video mein dikhaya gaya hai ki police ne logon par lathicharge kiya tha. "
+        "social media par yeh dawa kiya ja raha hai ki naye note mein chip lagi hui hai. "
+        "unhone bataya ki yeh jaankari galat hai aur logon ko is par vishwas nahi karna chahiye."
+    ),
+}
+
+WORD_PATTERN = re.compile(r"\w+")
+
+_cache = LRUCache(LANG_ID_CACHE_SIZE)
+local_hits = 0
+remote_calls = 0
+
+
+def script_of(char):
+    code = ord(char)
+    for start, end, script in SCRIPT_RANGES:
+        if start <= code <= end:
+            return script
+    return None
+
+
+def dominant_script(text):
+    """Return (script, share of letters in that script) for the text."""
+    counts = Counter(script for script in map(script_of, text) if script)
+    if not counts:
+        return None, 0.0
+    script, count = counts.most_common(1)[0]
+    return script, count / sum(counts.values())
+
+
+def trigrams(text):
+    for word in WORD_PATTERN.findall(text.lower()):
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            yield padded[i:i + 3]
+
+
+def _build_profiles():
+    profiles = {}
+    for (script, language), seed in PROFILE_SEEDS.items():
+        counts = Counter(trigrams(seed))
+        total = sum(counts.values())
+        # Add-one smoothing over the seen vocabulary plus one unseen bucket
+        denominator = total + len(counts) + 1
+        profiles.setdefault(script, {})[language] = (
+            {gram: math.log((count + 1) / denominator) for gram, count in counts.items()},
+            math.log(1 / denominator),
+        )
+    return profiles
+
+
+PROFILES = _build_profiles()
+
+
+def identify_local(text):
+    """
+    Identify the language of text from its script and character trigrams.
+
+    Returns:
+        tuple: (language code, confident) where confident is False for mixed,
+        unknown or ambiguous input that should be checked with Sarvam.
+    """
+    script, share = dominant_script(text)
+    if script is None or share < LANG_ID_MIN_SCRIPT_SHARE:
+        return None, False
+    candidates = SCRIPT_LANGUAGES[script]
+    if len(candidates) == 1:
+        return candidates[0], True
+
+    grams = [gram for gram in trigrams(text) if any(script_of(c) == script for c in gram)]
+    if len(grams) < 3:
+        return candidates[0], False
+    scores = []
+    for language in candidates:
+        table, unseen = PROFILES[script][language]
+        scores.append((sum(table.get(gram, unseen) for gram in grams), language))
+    scores.sort(reverse=True)
+    # Average log-likelihood ratio per trigram between the best two languages
+    margin = (scores[0][0] - scores[1][0]) / len(grams)
+    return scores[0][1], margin >= LANG_ID_MIN_MARGIN
+
+
+async def detect_language(text):
+    """
+    Detect the language of text, answering locally when the script makes it clear.
+
+    Falls back to Sarvam text-lid for mixed-script or ambiguous input. Results
+    are cached per message hash. Raises like sarvam.detect_language when the
+    remote call fails.
+    """
+    with metrics.STAGE_SECONDS.time("language_detection"):
+        return await _detect_language(text)
+
+
+async def _detect_language(text):
+    global local_hits, remote_calls
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    language, confident = identify_local(text) if LANG_ID_LOCAL_ENABLED else (None, False)
+    if confident:
+        local_hits += 1
+    else:
+        remote_calls += 1
+        logger.debug(f"Language not clear locally for message {key[:12]}; asking Sarvam")
+        language = await sarvam.detect_language(text)
+    _cache.set(key, language)
+    return language
+
+
+def stats():
+    return {"local": local_hits, "remote": remote_calls, "cached_messages": len(_cache)}
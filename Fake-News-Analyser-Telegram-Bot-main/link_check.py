@@ -0,0 +1,319 @@
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+
+import metrics
+from cache import LRUCache, canonicalize_url
+from json_extract import search_link
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Source link checking configuration
+LINK_CHECK_ENABLED = os.getenv("LINK_CHECK_ENABLED", "1") != "0"
+LINK_CHECK_DEADLINE = float(os.getenv("LINK_CHECK_DEADLINE", 1.0))  # most seconds a response waits for checks
+LINK_CHECK_PROBE_TIMEOUT = float(os.getenv("LINK_CHECK_PROBE_TIMEOUT", 5.0))  # per probe, finishing in the background
+LINK_CHECK_CACHE_SIZE = int(os.getenv("LINK_CHECK_CACHE_SIZE", 20000))
+LINK_CHECK_ALIVE_TTL = int(os.getenv("LINK_CHECK_ALIVE_TTL", 24 * 3600))  # seconds
+LINK_CHECK_DEAD_TTL = int(os.getenv("LINK_CHECK_DEAD_TTL", 3600))  # seconds; also for unknown results
+LINK_CHECK_MAX_CONNECTIONS = int(os.getenv("LINK_CHECK_MAX_CONNECTIONS", 32))
+LINK_CHECK_MAX_REDIRECTS = int(os.getenv("LINK_CHECK_MAX_REDIRECTS", 5))
+# Connection failures before a whole host is treated as unreachable
+LINK_CHECK_HOST_FAILURES = int(os.getenv("LINK_CHECK_HOST_FAILURES", 3))
+
+# Statuses that prove a page does not exist; anything else >= 400 (403, 429,
+# 5xx) may just be bot blocking or a hiccup, so the link is kept
+DEAD_STATUSES = {404, 410}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+# getaddrinfo errors meaning the name does not exist, as opposed to a lookup that failed
+NO_SUCH_HOST_ERRORS = {socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)}
+# Our own fallbacks; never probed
+SEARCH_PREFIX = "https://www.google.com/search?"
+USER_AGENT = "Mozilla/5.0 (compatible; FakeNewsAnalyser link check)"
+
+ALIVE, DEAD, UNKNOWN = "alive", "dead", "unknown"
+
+
+def host_of(url):
+    try:
+        return (urlsplit(url).hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+def is_public_host(host):
+    """False for hosts a public source link cannot have (localhost, private or reserved IPs)."""
+    if not host or host == "localhost" or host.endswith((".localhost", ".local", ".internal")):
+        return False
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_global
+    except ValueError:
+        return "." in host
+
+
+async def resolve_host(host):
+    """Addresses a host name resolves to; raises socket.gaierror when the lookup fails."""
+    infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+class BlockedHost(Exception):
+    """A link (or a redirect it leads to) points at a host a public source cannot have."""
+
+
+class NoSuchHost(Exception):
+    """DNS confirmed that a host name does not exist."""
+
+
+class LinkChecker:
+    """
+    Checks that source links resolve, replacing dead ones with search links.
+
+    All links of a response are probed concurrently (HEAD, then GET when HEAD
+    is refused) and the response waits at most `deadline` seconds for them;
+    links still being probed are kept as they are. Probes carry on in the
+    background up to `probe_timeout`, and every result goes into an LRU+TTL
+    cache keyed by canonical URL, so links that are cited again are never
+    re-probed while their entry lives.
+
+    Links come from model output, which users can steer, so a probe only
+    connects to hosts that resolve exclusively to public addresses, and
+    follows redirects itself (at most `max_redirects`), checking each target
+    the same way. A host whose name does not exist, or that refused
+    `host_failures` connections in a row, is cached as unreachable, marking
+    all its links dead; a single connection failure leaves just that link
+    unknown.
+    """
+
+    def __init__(self, enabled=LINK_CHECK_ENABLED, deadline=LINK_CHECK_DEADLINE,
+                 probe_timeout=LINK_CHECK_PROBE_TIMEOUT, cache_size=LINK_CHECK_CACHE_SIZE,
+                 alive_ttl=LINK_CHECK_ALIVE_TTL, dead_ttl=LINK_CHECK_DEAD_TTL,
+                 max_connections=LINK_CHECK_MAX_CONNECTIONS, max_redirects=LINK_CHECK_MAX_REDIRECTS,
+                 host_failures=LINK_CHECK_HOST_FAILURES, transport=None, resolver=resolve_host):
+        self.enabled = enabled
+        self.deadline = deadline
+        self.probe_timeout = probe_timeout
+        self.alive_ttl = alive_ttl
+        self.dead_ttl = dead_ttl
+        self.max_connections = max_connections
+        self.max_redirects = max_redirects
+        self.host_failures = host_failures
+        self.transport = transport  # e.g. httpx.MockTransport in benchmarks
+        self.resolver = resolver  # async host -> addresses; replaced in benchmarks and tests
+        self.cache = LRUCache(max_size=cache_size)
+        self.hosts = LRUCache(max_size=cache_size // 4 or 1, ttl=dead_ttl)  # unreachable hosts
+        self.failures = LRUCache(max_size=cache_size // 4 or 1, ttl=dead_ttl)  # host -> connection failures in a row
+        self.flight = SingleFlight("link_check")
+        self._client = None
+        self._client_loop = None
+        self._background = set()
+        self.counts = {"checked": 0, "cached": 0, "probes": 0, ALIVE: 0, DEAD: 0, UNKNOWN: 0,
+                       "late": 0, "replaced": 0, "blocked": 0}
+
+    def get_http_client(self):
+        """Shared keep-alive client, re-created if called from a different event loop."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                headers={"User-Agent": USER_AGENT},
+                timeout=httpx.Timeout(self.probe_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections, keepalive_expiry=60),
+                # Redirects are followed in _request so every hop is checked
+                follow_redirects=False,
+                transport=self.transport,
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def close(self):
+        """Cancel background probes and close the client; call on application shutdown."""
+        for task in list(self._background):
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
+
+    async def _check_host(self, host):
+        """Raise BlockedHost unless the host resolves only to public addresses (NoSuchHost if it doesn't exist)."""
+        if not is_public_host(host):
+            raise BlockedHost(host)
+        try:
+            ipaddress.ip_address(host.strip("[]"))
+            return
+        except ValueError:
+            pass
+        try:
+            addresses = await self.resolver(host)
+        except socket.gaierror as e:
+            if e.errno in NO_SUCH_HOST_ERRORS:
+                raise NoSuchHost(host) from e
+            raise
+        if not addresses or not all(ipaddress.ip_address(address.split("%")[0]).is_global for address in addresses):
+            raise BlockedHost(host)
+
+    async def _request(self, client, method, url):
+        """Status of a request, following redirects by hand and checking every host on the way."""
+        for _ in range(self.max_redirects + 1):
+            await self._check_host(host_of(url))
+            async with client.stream(method, url) as response:
+                status, location = response.status_code, response.headers.get("location")
+            if status not in REDIRECT_STATUSES or not location:
+                return status
+            url = urljoin(url, location)
+            if not url.startswith(("http://", "https://")):
+                raise BlockedHost(url)
+        raise httpx.TooManyRedirects(f"More than {self.max_redirects} redirects", request=None)
+
+    def _host_failed(self, host):
+        """Count a connection failure; the host counts as unreachable after host_failures in a row."""
+        failures = (self.failures.get(host) or 0) + 1
+        self.failures.set(host, failures)
+        if failures >= self.host_failures:
+            self.hosts.set(host, True)
+            return True
+        return False
+
+    async def _probe(self, url, host):
+        """Return ALIVE, DEAD or UNKNOWN for one URL and cache the answer."""
+        self.counts["probes"] += 1
+        client = self.get_http_client()
+        try:
+            status = await self._request(client, "HEAD", url)
+            if status >= 400:
+                # Many servers refuse or mishandle HEAD; only the body-less start of a GET is read
+                status = await self._request(client, "GET", url)
+            state = ALIVE if status < 400 else DEAD if status in DEAD_STATUSES else UNKNOWN
+            self.failures.set(host, 0)
+        except BlockedHost as e:
+            logger.info(f"Not probing {url}: {e} is not a public host")
+            self.counts["blocked"] += 1
+            state = DEAD
+        except NoSuchHost:
+            self.hosts.set(host, True)
+            state = DEAD
+        except httpx.ConnectError:
+            # One refused connection or DNS hiccup says nothing about the host's other pages
+            state = DEAD if self._host_failed(host) else UNKNOWN
+        except (httpx.UnsupportedProtocol, httpx.InvalidURL, httpx.TooManyRedirects):
+            state = DEAD
+        except Exception as e:
+            # Timeouts, resets, TLS trouble, failed lookups: no proof the page is gone
+            logger.debug(f"Link check of {url} inconclusive: {type(e).__name__}: {e}")
+            state = UNKNOWN
+        self.cache.set(canonicalize_url(url), state, ttl=self.alive_ttl if state == ALIVE else self.dead_ttl)
+        self.counts[state] += 1
+        metrics.LINK_CHECKS.inc(state)
+        return state
+
+    def _cached(self, url):
+        """Known state of a URL without probing, or None."""
+        host = host_of(url)
+        if not is_public_host(host) or self.hosts.get(host):
+            return DEAD
+        return self.cache.get(canonicalize_url(url))
+
+    def _start_probe(self, url):
+        """Probe a URL in a task that outlives the caller's deadline, coalescing concurrent probes of it."""
+        host = host_of(url)
+        task = asyncio.ensure_future(self.flight.do(canonicalize_url(url), self._probe, url, host))
+        # Late probes keep running so their answer is cached for the next response
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def check(self, urls):
+        """
+        Liveness of each URL, waiting at most `deadline` seconds in total.
+
+        Args:
+            urls (iterable): http(s) URLs.
+
+        Returns:
+            dict: URL to ALIVE, DEAD or UNKNOWN (UNKNOWN when its probe is still running).
+        """
+        states, pending = {}, {}
+        for url in dict.fromkeys(urls):
+            self.counts["checked"] += 1
+            state = self._cached(url)
+            if state is not None:
+                self.counts["cached"] += 1
+                states[url] = state
+                continue
+            pending[self._start_probe(url)] = url
+        if pending:
+            done, late = await asyncio.wait(pending, timeout=self.deadline)
+            self.counts["late"] += len(late)
+            for task in done:
+                states[pending[task]] = UNKNOWN if task.cancelled() or task.exception() else task.result()
+            for task in late:
+                states[pending[task]] = UNKNOWN
+        return states
+
+    async def validate(self, sources, user_text=""):
+        """
+        Replace dead source links with search links.
+
+        Args:
+            sources (dict): Title to link, as in NewsAnalysisResult.sources.
+            user_text (str): Original user input, used for search links.
+
+        Returns:
+            dict: The sources with dead links replaced, in the same order.
+        """
+        if not self.enabled or not sources:
+            return sources
+        with metrics.STAGE_SECONDS.time("link_check"):
+            states = await self.check(link for link in sources.values() if self._checkable(link))
+        checked = {}
+        for title, link in sources.items():
+            if states.get(link) == DEAD:
+                self.counts["replaced"] += 1
+                link = search_link(title, user_text)
+            checked[title] = link
+        return checked
+
+    async def validate_result(self, result, user_text=""):
+        """
+        Validate the sources of an analysis dict and of its per-claim verdicts in place.
+
+        All links are checked together, so the whole result waits at most one deadline.
+        """
+        if not self.enabled or not result:
+            return result
+        entries = [(result, user_text)] + [(claim, claim.get("claim", "")) for claim in result.get("claims") or []]
+        validated = await asyncio.gather(*(self.validate(entry.get("sources") or {}, text) for entry, text in entries))
+        for (entry, _), sources in zip(entries, validated):
+            if entry.get("sources"):
+                entry["sources"] = sources
+        return result
+
+    def prefetch(self, link):
+        """Start checking a link early (e.g. as it streams in) so a later validate finds it cached."""
+        if self.enabled and self._checkable(link) and self._cached(link) is None:
+            self._start_probe(link)
+
+    @staticmethod
+    def _checkable(link):
+        return isinstance(link, str) and link.startswith(("http://", "https://")) and not link.startswith(SEARCH_PREFIX)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "deadline_seconds": self.deadline,
+            "cached_urls": len(self.cache),
+            "unreachable_hosts": len(self.hosts),
+            **self.counts,
+            "single_flight": self.flight.stats(),
+        }
+
+
+# Shared checker for the process
+link_checker = LinkChecker()
@@ -0,0 +1,176 @@
+import logging
+import os
+
+from starlette.exceptions import HTTPException
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+logger = logging.getLogger(__name__)
+
+# Upload limits
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 20 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Image types Gemini accepts inline
+SUPPORTED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp", "image/heic", "image/heif"}
+HEIF_BRANDS = {b"heic": "image/heic", b"heix": "image/heic", b"heim": "image/heic",
+               b"heis": "image/heic", b"mif1": "image/heif", b"msf1": "image/heif"}
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size cap."""
+
+    def __init__(self, max_bytes):
+        super().__init__(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+        self.max_bytes = max_bytes
+
+
+def sniff_mime(data):
+    """
+    Detect an image MIME type from its leading bytes.
+
+    Args:
+        data (bytes): Image data (only the first 16 bytes are inspected).
+
+    Returns:
+        str or None: MIME type such as "image/png", or None if unrecognized.
+    """
+    head = bytes(data[:16])
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[4:8] == b"ftyp":
+        return HEIF_BRANDS.get(head[8:12])
+    return None
+
+
+async def read_upload(upload, max_bytes=UPLOAD_MAX_BYTES):
+    """
+    Read an UploadFile into memory, stopping as soon as it exceeds max_bytes.
+
+    Args:
+        upload (UploadFile): The uploaded file.
+        max_bytes (int): Size cap in bytes.
+
+    Returns:
+        bytes: The file contents.
+
+    Raises:
+        UploadTooLarge: If the upload is larger than max_bytes.
+    """
+    # The multipart parser usually knows the size already; then read it in one allocation
+    if upload.size is not None:
+        if upload.size > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        data = await upload.read(max_bytes + 1)
+        if len(data) > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        return data
+    chunks, total = [], 0
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def parse_upload_form(request, max_bytes=UPLOAD_MAX_BYTES):
+    """
+    Parse a form body, keeping uploaded files up to max_bytes in memory.
+
+    Starlette spools files over 1 MB to a temp file. The threshold is raised on
+    this parser instance only, so other routes keep the default.
+
+    Args:
+        request (Request): The incoming request.
+        max_bytes (int): Largest file kept in memory.
+
+    Returns:
+        FormData: The parsed form; the caller closes it.
+
+    Raises:
+        HTTPException: 400 if the multipart body is malformed.
+    """
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        return await request.form()
+    parser = MultiPartParser(request.headers, request.stream())
+    parser.spool_max_size = max_bytes
+    try:
+        return await parser.parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware rejecting request bodies over max_bytes with 413.
+
+    Requests announcing a larger Content-Length are refused before any of the
+    body is read; chunked bodies are cut off once they pass the limit.
+    """
+
+    def __init__(self, app, max_bytes=UPLOAD_MAX_BYTES, paths=()):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (self.paths and scope["path"] not in self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        # Multipart framing adds a little on top of the file itself
+        limit = self.max_bytes + 64 * 1024
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    raise UploadTooLarge(self.max_bytes)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            # The app's own error response for the aborted body is replaced by a 413
+            if exceeded and not response_started:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except UploadTooLarge:
+            if response_started:
+                raise
+        if exceeded and not response_started:
+            await self._reject(send)
+
+    async def _reject(self, send):
+        body = f'{{"detail": "{UploadTooLarge(self.max_bytes)}"}}'.encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, model_validator
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pathlib import Path
 
 class NewsInput(BaseModel):
@@ -23,14 +23,29 @@ class NewsInput(BaseModel):
             }
         }
 
+class ClaimVerdict(BaseModel):
+    claim: str = Field(..., description="One factual assertion split out of a longer message")
+    verdict: str = Field(..., description="Verdict about this claim: Real, Fake, or Uncertain")
+    confidence: float = Field(..., ge=0.0, le=1.0, description="Confidence score between 0 and 1")
+    reason: str = Field(..., description="Explanation or reasoning for the verdict")
+    sources: Dict[str, str] = Field(default_factory=dict, description="Sources used for the verdict, as title to URL")
+
 class NewsAnalysisResult(BaseModel):
     verdict: str = Field(..., description="Verdict about the news: Real, Fake, or Uncertain")
     confidence: float = Field(..., ge=0.0, le=1.0, description="Confidence score between 0 and 1")
     reason: str = Field(..., description="Explanation or reasoning for the verdict")
+    sources: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Sources used for the verdict, as title to URL"
+    )
     references: Optional[List[str]] = Field(
         default=None,
         description="List of reference URLs or sources used to verify the news"
     )
+    claims: Optional[List[ClaimVerdict]] = Field(
+        default=None,
+        description="Per-claim verdicts when the message was split into separate claims"
+    )
 
     class Config:
         json_schema_extra = { # Corrected schema_extra to json_schema_extra
@@ -38,6 +53,9 @@ class NewsAnalysisResult(BaseModel):
                 "verdict": "Fake",
                 "confidence": 0.92,
                 "reason": "No credible news outlet has reported this claim. It originated from a satire website.",
+                "sources": {
+                    "Reuters Fact Check": "https://www.reuters.com/fact-check"
+                },
                 "references": [
                     "https://www.reuters.com/fact-check",
                     "https://snopes.com/fact-check/alien-landing-hoax"
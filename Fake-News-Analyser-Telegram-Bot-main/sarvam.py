@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import logging
+import os
+
+import httpx
+from dotenv import load_dotenv
+
+import metrics
+from single_flight import SingleFlight
+
+load_dotenv()
+SARVAM_API_KEY = os.getenv("SARVAM_API_KEY")
+SARVAM_BASE_URL = os.getenv("SARVAM_BASE_URL", "https://api.sarvam.ai")
+SARVAM_TIMEOUT = float(os.getenv("SARVAM_TIMEOUT", 10))  # seconds per call
+SARVAM_MAX_CONNECTIONS = int(os.getenv("SARVAM_MAX_CONNECTIONS", 20))
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when this is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_client = None
+_client_loop = None
+
+# Coalesces concurrent identical translation requests
+translation_flight = SingleFlight("translation")
+
+
+def get_http_client():
+    """
+    Shared keep-alive HTTP client for Sarvam calls.
+
+    Created on first use inside the running event loop (and re-created if
+    called from a different loop), so connections are pooled across messages
+    instead of paying a TCP+TLS handshake per call.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            base_url=SARVAM_BASE_URL,
+            headers={"api-subscription-key": SARVAM_API_KEY or ""},
+            timeout=httpx.Timeout(SARVAM_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=SARVAM_MAX_CONNECTIONS,
+                max_keepalive_connections=SARVAM_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+            http2=HTTP2_AVAILABLE,
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_http_client():
+    """Close the shared client; call on application shutdown."""
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+async def warm_up():
+    """Open a pooled connection to Sarvam so the first translation skips the TCP+TLS handshake."""
+    if not SARVAM_API_KEY:
+        return
+    # Any HTTP answer will do; only the connection matters
+    await get_http_client().get("/", timeout=SARVAM_TIMEOUT)
+
+
+async def detect_language(text, timeout=None):
+    """
+    Detect the language of text with Sarvam text-lid.
+
+    Returns:
+        str: Language code such as "hi-IN".
+
+    Raises:
+        httpx.HTTPError: If the request fails.
+        KeyError: If the response has no language code.
+    """
+    try:
+        response = await get_http_client().post(
+            "/text-lid",
+            json={"input": text},
+            timeout=timeout or SARVAM_TIMEOUT,
+        )
+        response.raise_for_status()
+        return response.json()["language_code"]
+    except (httpx.HTTPError, ValueError, KeyError):
+        metrics.UPSTREAM_ERRORS.inc("sarvam")
+        raise
+
+
+async def translate(text, target_lang, timeout=None):
+    """
+    Translate text with Sarvam translate.
+
+    Concurrent requests for the same text and target language share one call.
+
+    Returns:
+        str: The translated text.
+
+    Raises:
+        httpx.HTTPError: If the request fails.
+        ValueError: If the response is not JSON or has no translated text.
+    """
+    key = (hashlib.sha256(text.encode("utf-8")).hexdigest(), target_lang)
+    return await translation_flight.do(key, _translate, text, target_lang, timeout)
+
+
+async def _translate(text, target_lang, timeout):
+    payload = {
+        "source_language_code": "auto",
+        "target_language_code": target_lang,
+        "speaker_gender": "Male",
+        "mode": "classic-colloquial",
+        "model": "mayura:v1",
+        "enable_preprocessing": False,
+        "input": text
+    }
+    try:
+        response = await get_http_client().post("/translate", json=payload, timeout=timeout or SARVAM_TIMEOUT)
+        response.raise_for_status()
+        resp_json = response.json()
+        if not isinstance(resp_json, dict) or "translated_text" not in resp_json:
+            raise ValueError(f"Unexpected translation response: {resp_json}")
+        return resp_json["translated_text"]
+    except (httpx.HTTPError, ValueError):
+        metrics.UPSTREAM_ERRORS.inc("sarvam")
+        raise
@@ -1,19 +1,44 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form
+import time
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.datastructures import UploadFile
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import uvicorn
-import tempfile
+import asyncio
+import json
+import logging
 import os
-import requests
 from dotenv import load_dotenv
 
 # Import functions from analyse.py
-from analyse import analyze_news, create_news_input, extract_json_from_response
+from analyse import analyze_news_async, analyze_news_stream, create_news_input_async, extract_json_from_response, get_claim_index, image_index, analysis_flight, model_id
+from cache import verdict_cache, canonicalize_claim
+from json_extract import AnalysisStreamParser
+from gemini_scheduler import gemini_scheduler, SchedulerBusy
+from models import ClaimVerdict
+import decompose
+from media import UploadSizeLimitMiddleware, UploadTooLarge, parse_upload_form, read_upload, sniff_mime, SUPPORTED_IMAGE_TYPES, UPLOAD_MAX_BYTES
+import image_preprocess
+import metrics
+import sarvam
+import lang_id
+import translation_memory
+import telegram_webhook
+from verdict_store import verdict_store, SEARCH_MAX_PAGE_SIZE
+from triage import is_non_claim_reply, triage
+from link_check import link_checker
+from warmup import startup, warm_gemini, RequestTimingMiddleware
 
 # Load environment variables
 load_dotenv()
-SARVAM_API_KEY = os.getenv("SARVAM_API_KEY")
+BATCH_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_CONCURRENCY", 8))
+BATCH_MAX_ITEMS = int(os.getenv("ANALYZE_BATCH_MAX_ITEMS", 10000))
+
+logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -30,12 +55,21 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Refuse oversized uploads before their body is read
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=UPLOAD_MAX_BYTES, paths=["/api/analyze/upload"])
+# Report first-request latency and requests served before warm-up finished
+app.add_middleware(RequestTimingMiddleware, startup=startup)
 
 # Define Pydantic models
 class NewsAnalysisRequest(BaseModel):
     text: Optional[str] = None
     image_url: Optional[str] = None
     target_language: Optional[str] = None  # Added target language field
+    decompose: Optional[bool] = None  # Verify each claim separately; defaults to DECOMPOSE_MODE
+
+class BatchAnalysisRequest(BaseModel):
+    items: List[NewsAnalysisRequest]
+    concurrency: Optional[int] = None  # Capped at ANALYZE_BATCH_CONCURRENCY
 
 class NewsAnalysisResponse(BaseModel):
     verdict: str
@@ -43,6 +77,7 @@ class NewsAnalysisResponse(BaseModel):
     reason: str
     sources: Dict[str, str]
     detected_language: Optional[str] = None  # Added detected language field
+    claims: Optional[List[ClaimVerdict]] = None  # Per-claim verdicts when the text was decomposed
 
 # Language detection and translation functions
 async def detect_language(text):
@@ -51,15 +86,7 @@ async def detect_language(text):
         return "en"  # Default to English for short/empty texts
     
     try:
-        url = "https://api.sarvam.ai/text-lid"
-        payload = {"input": text}
-        headers = {
-            "Content-Type": "application/json",
-            "api-subscription-key": SARVAM_API_KEY
-        }
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        return response.json().get('language_code', 'en')
+        return await lang_id.detect_language(text)
     except Exception as e:
         print(f"Language detection error: {e}")
         return "en"
@@ -70,32 +97,31 @@ async def translate_text(text, target_lang):
         return text
     
     try:
-        url = "https://api.sarvam.ai/translate"
-        payload = {
-            "source_language_code": "auto",
-            "target_language_code": target_lang,
-            "speaker_gender": "Male",
-            "mode": "classic-colloquial",
-            "model": "mayura:v1",
-            "enable_preprocessing": False,
-            "input": text
-        }
-        headers = {
-            "Content-Type": "application/json",
-            "api-subscription-key": SARVAM_API_KEY
-        }
-        
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        result = response.json()
-        
-        if 'translated_text' in result:
-            return result['translated_text']
-        return text
+        return await translation_memory.translate(text, target_lang)
     except Exception as e:
         print(f"Translation error: {e}")
         return text
 
+@app.on_event("startup")
+async def startup_event():
+    """Warm clients, connection pools and indexes in the background (see /ready), and start the Telegram webhook if configured"""
+    startup.start("gemini", lambda: warm_gemini(model_id))
+    startup.start("sarvam", sarvam.warm_up)
+    startup.start("claim_index", lambda: asyncio.to_thread(get_claim_index))
+    startup.start("triage", lambda: asyncio.to_thread(triage.load))
+    startup.start("translations", translation_memory.prewarm, timeout=None)
+    await telegram_webhook.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop warm-up and the Telegram bot, release pooled HTTP connections, link probes and image worker processes, and flush stored verdicts"""
+    await startup.stop()
+    await telegram_webhook.stop()
+    await sarvam.close_http_client()
+    await link_checker.close()
+    image_preprocess.shutdown_pool()
+    await asyncio.to_thread(verdict_store.close)
+
 # Routes
 @app.get("/")
 async def root():
@@ -107,9 +133,58 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
-@app.post("/api/analyze", response_model=NewsAnalysisResponse)
-async def analyze_content(analysis_request: NewsAnalysisRequest):
-    """Analyze news content for fake news detection"""
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 200 once required clients are warm, 503 (with per-component state) until then"""
+    stats = startup.stats()
+    return JSONResponse(stats, status_code=200 if stats["ready"] else 503)
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Verdict cache, near-duplicate index and request coalescing counters"""
+    return {
+        "verdict_cache": verdict_cache.stats(),
+        "claim_index": get_claim_index().stats(),
+        "image_index": image_index.stats(),
+        "single_flight": {
+            "analysis": analysis_flight.stats(),
+            "translation": sarvam.translation_flight.stats(),
+        },
+        "language_id": lang_id.stats(),
+        "image_preprocess": image_preprocess.stats(),
+        "gemini_scheduler": gemini_scheduler.stats(),
+        "telegram_webhook": telegram_webhook.stats(),
+        "verdict_store": verdict_store.stats(),
+        "triage": triage.stats(),
+        "link_check": link_checker.stats(),
+        "startup": startup.stats(),
+    }
+
+@app.get("/api/search")
+async def search_verdicts(
+    q: str = Query(..., min_length=1, description="Words that must appear in the claim or reason"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=SEARCH_MAX_PAGE_SIZE),
+    verdict: Optional[str] = None,
+    language: Optional[str] = None,
+):
+    """Search previously analyzed claims, best matches first, so repeats need no new analysis"""
+    found = await asyncio.to_thread(verdict_store.search, q, page, page_size, verdict, language)
+    return {"query": q, "page": page, "page_size": page_size, **found}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Stage latency histograms and cache, parse and upstream error counters in Prometheus text format"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+def client_id(request: Request):
+    """Requester identity for fair queuing of Gemini calls"""
+    return request.client.host if request.client else None
+
+async def run_analysis(analysis_request: NewsAnalysisRequest, user=None):
+    """Detect language, analyze and translate one request; raises HTTPException on failure"""
     if not analysis_request.text and not analysis_request.image_url:
         raise HTTPException(status_code=400, detail="Either text or image URL must be provided")
     
@@ -121,81 +196,286 @@ async def analyze_content(analysis_request: NewsAnalysisRequest):
     # Use specified target language or detected language
     target_language = analysis_request.target_language or detected_language
     
-    # Prepare input for Gemini
-    news_input = create_news_input(
-        news_text=analysis_request.text or "", 
-        image_source=analysis_request.image_url
-    )
-    
-    # Get analysis from Gemini
-    response_text = analyze_news(news_input)
-    
-    # Parse response
-    analysis_result = extract_json_from_response(response_text, analysis_request.text or "")
+    # Long text-only messages are split into claims that are verified separately
+    analysis_result = None
+    if not analysis_request.image_url and decompose.should_decompose(analysis_request.text, analysis_request.decompose):
+        try:
+            analysis_result = await decompose.analyze_claims(analysis_request.text, user=user)
+        except SchedulerBusy as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    if analysis_result is None:
+        # Prepare input for Gemini
+        news_input = await create_news_input_async(
+            news_text=analysis_request.text or "", 
+            image_source=analysis_request.image_url
+        )
+
+        # Get analysis from Gemini
+        try:
+            response_text = await analyze_news_async(news_input, user=user)
+        except SchedulerBusy as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+        # Parse response
+        analysis_result = extract_json_from_response(response_text, analysis_request.text or "")
 
     if not analysis_result:
         raise HTTPException(status_code=500, detail="Failed to parse analysis results")
-    
-    # Translate verdict and reason if needed
+
+    # Dead source links are replaced while the verdict and reason are translated
+    steps = [link_checker.validate_result(analysis_result, analysis_request.text or "")]
     if target_language != "en":
-        to_translate = (
-            f"Verdict: {analysis_result.get('verdict', 'Unknown')}\n\n"
-            f"Confidence: {int(analysis_result.get('confidence', 0) * 100)}%\n\n"
-            f"Reason: {analysis_result.get('reason', '')}"
-        )
-        
-        translated_text = await translate_text(to_translate, target_language)
-        
-        # Extract the translated parts
-        parts = translated_text.split("\n\n")
-        if len(parts) >= 3:
-            analysis_result['verdict'] = parts[0].replace("Verdict: ", "").strip()
-            analysis_result['reason'] = parts[2].replace("Reason: ", "").strip()
+        # The verdict label comes from the translation memory; only the reason hits the API
+        steps += [
+            translation_memory.ui_text(analysis_result.get('verdict', 'Unknown'), target_language),
+            translate_text(analysis_result.get('reason', ''), target_language),
+        ]
+    _, *translated = await asyncio.gather(*steps)
+
+    # Keep the English result searchable; canned non-claim replies are not analyses
+    if not is_non_claim_reply(analysis_result):
+        verdict_store.record(analysis_request.text, analysis_result, language=detected_language,
+                             image=analysis_request.image_url)
+    
+    # Apply the translated verdict and reason if needed
+    if translated:
+        analysis_result['verdict'], analysis_result['reason'] = translated
     
     # Add detected language to the result
     analysis_result['detected_language'] = detected_language
     
     return analysis_result
 
-@app.post("/api/analyze/upload", response_model=NewsAnalysisResponse)
-async def analyze_uploaded_content(
-    text: str = Form(None),
-    image: UploadFile = File(None)
-):
+@app.post("/api/analyze", response_model=NewsAnalysisResponse)
+async def analyze_content(analysis_request: NewsAnalysisRequest, request: Request):
+    """Analyze news content for fake news detection"""
+    return await run_analysis(analysis_request, client_id(request))
+
+def sse(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/api/analyze/stream")
+async def analyze_content_stream(analysis_request: NewsAnalysisRequest, request: Request):
+    """
+    Analyze news content, streaming progress and fields as server-sent events.
+
+    Events, in order: `status` (language_detected, analysis_started), then
+    `verdict`, `confidence`, `reason` deltas and `source` entries as Gemini
+    generates them, then `result` with the full English analysis, `translation`
+    when a non-English target language applies, and finally `done`. Failures
+    are sent as an `error` event. Dead source links are replaced by searches
+    in `result` only, so its sources may differ from the `source` events.
+    """
+    if not analysis_request.text and not analysis_request.image_url:
+        raise HTTPException(status_code=400, detail="Either text or image URL must be provided")
+    user_text = analysis_request.text or ""
+
+    async def events():
+        try:
+            detected_language = "en"
+            if analysis_request.text:
+                detected_language = await detect_language(analysis_request.text)
+            target_language = analysis_request.target_language or detected_language
+            yield sse("status", {"stage": "language_detected", "language": detected_language})
+
+            news_input = await create_news_input_async(
+                news_text=user_text,
+                image_source=analysis_request.image_url
+            )
+            yield sse("status", {"stage": "analysis_started"})
+
+            parser = AnalysisStreamParser(user_text)
+            async for chunk in analyze_news_stream(news_input, user=client_id(request)):
+                for event, data in parser.feed(chunk):
+                    if event == "source":
+                        # Checked while the rest streams; `result` carries the checked links
+                        link_checker.prefetch(data["link"])
+                    yield sse(event, data)
+
+            result = parser.close()
+            if result is None:
+                metrics.PARSE_FAILURES.inc()
+                yield sse("error", {"status_code": 500, "detail": "Failed to parse analysis results"})
+                return
+            analysis_result = await link_checker.validate_result(result.model_dump(exclude_none=True), user_text)
+            if not is_non_claim_reply(analysis_result):
+                verdict_store.record(user_text, analysis_result, language=detected_language,
+                                     image=analysis_request.image_url)
+            analysis_result['detected_language'] = detected_language
+            yield sse("result", analysis_result)
+
+            if not translation_memory.is_english(target_language):
+                verdict, reason = await asyncio.gather(
+                    translation_memory.ui_text(analysis_result.get('verdict', 'Unknown'), target_language),
+                    translate_text(analysis_result.get('reason', ''), target_language),
+                )
+                yield sse("translation", {"language": target_language, "verdict": verdict, "reason": reason})
+            yield sse("done", {})
+        except SchedulerBusy as e:
+            yield sse("error", {"status_code": 503, "detail": str(e)})
+        except Exception as e:
+            logger.exception("Streaming analysis failed")
+            yield sse("error", {"status_code": 500, "detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def batch_key(item: NewsAnalysisRequest):
+    """Items with the same canonical text, image and target language are analyzed once"""
+    return (canonicalize_claim(item.text or ""), item.image_url or "", item.target_language or "", item.decompose)
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(batch: BatchAnalysisRequest, request: Request):
+    """
+    Analyze many items, streaming one NDJSON line per unique item as it completes.
+
+    Each line carries the `indices` of every request item it answers, plus either
+    `result` or `error`/`status_code`. A final line with `done: true` summarizes
+    the batch. A failing item never fails the batch. All items queue for
+    Gemini as one requester, so a large batch does not crowd out other clients.
+    """
+    if len(batch.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {BATCH_MAX_ITEMS} items")
+
+    groups = {}
+    for index, item in enumerate(batch.items):
+        groups.setdefault(batch_key(item), (item, []))[1].append(index)
+    concurrency = max(1, min(batch.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY))
+    user = client_id(request)
+
+    async def stream():
+        pending = asyncio.Queue()
+        for group in groups.values():
+            pending.put_nowait(group)
+        results = asyncio.Queue()
+
+        async def worker():
+            while not pending.empty():
+                item, indices = pending.get_nowait()
+                try:
+                    line = {"indices": indices, "result": await run_analysis(item, user)}
+                except HTTPException as e:
+                    line = {"indices": indices, "error": e.detail, "status_code": e.status_code}
+                except Exception as e:
+                    logger.exception(f"Batch item {indices[0]} failed")
+                    line = {"indices": indices, "error": str(e), "status_code": 500}
+                await results.put(line)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(groups)))]
+        errors = 0
+        try:
+            for _ in range(len(groups)):
+                line = await results.get()
+                errors += "error" in line
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+            yield json.dumps({
+                "done": True,
+                "items": len(batch.items),
+                "unique": len(groups),
+                "errors": errors,
+            }) + "\n"
+        finally:
+            # Client went away or the batch finished; stop any remaining work
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.post(telegram_webhook.WEBHOOK_PATH)
+async def telegram_update(request: Request):
+    """
+    Receive a Telegram update (webhook mode) and queue it for the bot.
+
+    Requests must carry the secret token the webhook was registered with.
+    Telegram only needs a 200; the analysis and reply happen in the background.
+    """
+    if not telegram_webhook.is_running():
+        raise HTTPException(status_code=404, detail="Telegram webhook is not enabled")
+    if not telegram_webhook.is_valid_secret(request.headers.get(telegram_webhook.SECRET_HEADER)):
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+    try:
+        data = await request.json()
+        await telegram_webhook.feed(data)
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed update: {e}")
+    return {"ok": True}
+
+# The form is parsed in the endpoint, so describe it for the OpenAPI docs by hand
+UPLOAD_FORM_SCHEMA = {
+    "requestBody": {
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "text": {"type": "string"},
+                        "image": {"type": "string", "format": "binary"},
+                    },
+                },
+            },
+        },
+    },
+}
+
+@app.post("/api/analyze/upload", response_model=NewsAnalysisResponse, openapi_extra=UPLOAD_FORM_SCHEMA)
+async def analyze_uploaded_content(request: Request):
     """Analyze news content with uploaded image for fake news detection"""
-    if not text and not image:
-        raise HTTPException(status_code=400, detail="Either text or image must be provided")
-    
-    image_path = None
+    # Parsed here rather than through File()/Form() so the image stays in memory
+    form = await parse_upload_form(request, UPLOAD_MAX_BYTES)
     try:
+        text = form.get("text")
+        image = form.get("image")
+        if not isinstance(text, str):
+            text = None
+        if not isinstance(image, UploadFile):
+            image = None
+        if not text and not image:
+            raise HTTPException(status_code=400, detail="Either text or image must be provided")
+
+        image_bytes, mime_type = None, None
         if image:
-            # Save uploaded image to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as temp_file:
-                image_path = temp_file.name
-                contents = await image.read()
-                temp_file.write(contents)
-        
-        # Prepare input for Gemini
-        news_input = create_news_input(
-            news_text=text or "", 
-            image_source=image_path
-        )
-        
-        # Get analysis from Gemini
-        response_text = analyze_news(news_input)
-        
-        # Parse response
-        analysis_result = extract_json_from_response(response_text, text or "")
-        
-        if not analysis_result:
-            raise HTTPException(status_code=500, detail="Failed to parse analysis results")
-        
-        return analysis_result
-    
+            # Read the upload straight into memory; the bytes go to Gemini as-is
+            try:
+                image_bytes = await read_upload(image, UPLOAD_MAX_BYTES)
+            except UploadTooLarge as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            mime_type = sniff_mime(image_bytes)
+            if mime_type not in SUPPORTED_IMAGE_TYPES:
+                raise HTTPException(status_code=415, detail="Unsupported image type; use JPEG, PNG, WebP or HEIC")
     finally:
-        # Clean up the temporary file
-        if image_path and os.path.exists(image_path):
-            os.unlink(image_path)
+        await form.close()
+    
+    # Prepare input for Gemini
+    news_input = await create_news_input_async(
+        news_text=text or "", 
+        image_bytes=image_bytes,
+        mime_type=mime_type
+    )
+    
+    # Get analysis from Gemini
+    try:
+        response_text = await analyze_news_async(news_input, user=client_id(request))
+    except SchedulerBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    # Parse response
+    analysis_result = extract_json_from_response(response_text, text or "")
+    
+    if not analysis_result:
+        raise HTTPException(status_code=500, detail="Failed to parse analysis results")
+
+    await link_checker.validate_result(analysis_result, text or "")
+    if not is_non_claim_reply(analysis_result):
+        verdict_store.record(text, analysis_result, image=image_bytes)
+    return analysis_result
+
+startup.record_import(time.perf_counter() - IMPORT_STARTED)
 
 # Run the server
 if __name__ == "__main__":
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one in-flight call.
+
+    The first caller for a key starts the call; callers arriving while it is
+    still running await the same task and receive its result or exception.
+    A caller being cancelled only cancels the shared call once no other
+    caller is waiting on it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._inflight = {}  # key -> [task, waiter count]
+        self.calls = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    async def do(self, key, func, *args, **kwargs):
+        """Run `await func(*args, **kwargs)` unless an identical call is already in flight."""
+        entry = self._inflight.get(key)
+        if entry is None or entry[0].done():
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            entry = [task, 0]
+            self._inflight[key] = entry
+            self.calls += 1
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            # Shielded so one waiter's cancellation doesn't cancel everyone's call
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if entry[1] == 1 and not task.done():
+                task.cancel()
+                if self._inflight.get(key) is entry:
+                    del self._inflight[key]
+            raise
+        finally:
+            entry[1] -= 1
+
+    def _finish(self, key, task):
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,95 @@
+import hmac
+import logging
+import os
+import secrets
+
+logger = logging.getLogger(__name__)
+
+# Public base URL Telegram should post updates to; webhook mode is off without it
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL")
+# Telegram echoes this in every webhook request; a random one is used if unset
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+TELEGRAM_WEBHOOK_MAX_CONNECTIONS = int(os.getenv("TELEGRAM_WEBHOOK_MAX_CONNECTIONS", 40))
+WEBHOOK_PATH = "/telegram/webhook"
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+_application = None
+_received = 0
+_rejected = 0
+
+
+def is_enabled():
+    return bool(TELEGRAM_WEBHOOK_URL)
+
+
+def is_running():
+    return _application is not None
+
+
+async def start():
+    """
+    Start the Telegram bot inside this process and point its webhook here.
+
+    Updates posted to WEBHOOK_PATH feed the bot's update queue, so the bot
+    shares this process's caches, Gemini scheduler and HTTP clients.
+    """
+    global _application
+    if not is_enabled() or _application is not None:
+        return
+    # Imported here so API-only deployments don't need the bot's dependencies
+    import bot
+
+    application = bot.build_application()
+    await application.initialize()
+    await application.start()
+    await application.bot.set_webhook(
+        url=TELEGRAM_WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=TELEGRAM_WEBHOOK_SECRET,
+        max_connections=TELEGRAM_WEBHOOK_MAX_CONNECTIONS,
+    )
+    _application = application
+    logger.info(f"Telegram webhook set to {TELEGRAM_WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}")
+
+
+async def stop():
+    """Stop the bot. The webhook stays registered so Telegram holds updates across restarts."""
+    global _application
+    if _application is None:
+        return
+    application, _application = _application, None
+    await application.stop()
+    await application.shutdown()
+
+
+def is_valid_secret(token):
+    """Constant-time check of the secret token header."""
+    global _rejected
+    if token is not None and hmac.compare_digest(token.encode("utf-8"), TELEGRAM_WEBHOOK_SECRET.encode("utf-8")):
+        return True
+    _rejected += 1
+    return False
+
+
+async def feed(data):
+    """Queue one update received on the webhook for the bot's handlers."""
+    global _received
+    from telegram import Update
+
+    _received += 1
+    await _application.update_queue.put(Update.de_json(data, _application.bot))
+
+
+def stats():
+    if _application is None:
+        return {"enabled": is_enabled(), "running": False}
+    import bot
+
+    return {
+        "enabled": True,
+        "running": True,
+        "received": _received,
+        "rejected": _rejected,
+        "queued": _application.update_queue.qsize(),
+        "processor": _application.update_processor.stats(),
+        "photos": bot.photo_stats(),
+    }
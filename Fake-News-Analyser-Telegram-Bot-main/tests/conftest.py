@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The modules live flat in the project directory, next to bot.py and server.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing analyse sets up the Gemini client and the verdict cache; keep both offline and out of the tree
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("VERDICT_CACHE_ENABLED", "0")
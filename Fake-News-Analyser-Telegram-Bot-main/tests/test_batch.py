@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import server
+
+# Seconds each stubbed analysis takes, so items finish in a known order
+DELAYS = {"slow claim": 0.2, "medium claim": 0.15, "broken claim": 0.1, "busy claim": 0.05, "fast claim": 0.0}
+
+
+@pytest.fixture
+def analyses(monkeypatch):
+    log = {"calls": [], "running": 0, "peak": 0}
+
+    async def run_analysis(item, user=None):
+        log["calls"].append(item.text)
+        log["running"] += 1
+        log["peak"] = max(log["peak"], log["running"])
+        try:
+            await asyncio.sleep(DELAYS.get(item.text, 0.05))
+            if item.text == "busy claim":
+                raise HTTPException(status_code=503, detail="Gemini queue is full")
+            if item.text == "broken claim":
+                raise ValueError("parser exploded")
+            return {"verdict": "Fake", "confidence": 0.9, "reason": item.text, "sources": {}}
+        finally:
+            log["running"] -= 1
+
+    monkeypatch.setattr(server, "run_analysis", run_analysis)
+    return log
+
+
+def post_batch(items, concurrency=None):
+    body = {"items": [{"text": text} for text in items]}
+    if concurrency:
+        body["concurrency"] = concurrency
+    response = TestClient(server.app).post("/api/analyze/batch", json=body)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_duplicates_are_analyzed_once(analyses):
+    lines = post_batch(["fast claim", "  FAST claim!", "medium claim", "fast claim"])
+    assert sorted(analyses["calls"]) == ["fast claim", "medium claim"]
+    by_reason = {line["result"]["reason"]: line["indices"] for line in lines[:-1]}
+    assert by_reason == {"fast claim": [0, 1, 3], "medium claim": [2]}
+    assert lines[-1] == {"done": True, "items": 4, "unique": 2, "errors": 0}
+
+
+def test_lines_stream_in_completion_order_with_errors(analyses):
+    lines = post_batch(["slow claim", "busy claim", "medium claim", "broken claim", "fast claim"])
+    assert [line["indices"] for line in lines[:-1]] == [[4], [1], [3], [2], [0]]
+    assert lines[1] == {"indices": [1], "error": "Gemini queue is full", "status_code": 503}
+    assert lines[2] == {"indices": [3], "error": "parser exploded", "status_code": 500}
+    assert lines[-1] == {"done": True, "items": 5, "unique": 5, "errors": 2}
+
+
+@pytest.mark.parametrize("requested, peak", [(2, 2), (1, 1), (None, 6), (100, 6)])
+def test_concurrency_is_bounded(analyses, monkeypatch, requested, peak):
+    monkeypatch.setattr(server, "BATCH_CONCURRENCY", 6)
+    post_batch([f"claim {i}" for i in range(12)], concurrency=requested)
+    assert analyses["peak"] == peak
+    assert len(analyses["calls"]) == 12
+
+
+def test_oversized_batch_is_refused(analyses, monkeypatch):
+    monkeypatch.setattr(server, "BATCH_MAX_ITEMS", 2)
+    response = TestClient(server.app).post("/api/analyze/batch", json={"items": [{"text": "a"}] * 3})
+    assert response.status_code == 413
+    assert analyses["calls"] == []
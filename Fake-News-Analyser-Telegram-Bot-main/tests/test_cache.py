@@ -0,0 +1,66 @@
+import pytest
+
+from cache import LRUCache, SQLiteCache, canonicalize_claim, canonicalize_url, make_key
+
+CLAIM = "Schools in Delhi closed tomorrow"
+
+
+@pytest.mark.parametrize("text", [
+    CLAIM,
+    "  SCHOOLS in   Delhi closed tomorrow!!! ",
+    "*Schools* in Delhi closed tomorrow 😱😱",
+    "Schools​ in Delhi closed️ tomorrow",
+    "Ｓｃｈｏｏｌｓ in Delhi closed tomorrow",
+    "Schools in Delhi\nclosed tomorrow...",
+])
+def test_cosmetic_variants_share_a_canonical_form(text):
+    assert canonicalize_claim(text) == "schools in delhi closed tomorrow"
+
+
+@pytest.mark.parametrize("text", [
+    "Schools in Delhi not closed tomorrow",
+    "Schools in Mumbai closed tomorrow",
+    "Schools in Delhi closed 2 tomorrow",
+])
+def test_different_words_stay_different(text):
+    assert canonicalize_claim(text) != canonicalize_claim(CLAIM)
+
+
+def test_urls_are_canonicalized_and_sorted():
+    a = canonicalize_claim("Read this https://www.News.com/story/?utm_source=wa&id=2 and http://b.org/x/")
+    b = canonicalize_claim("read this: http://b.org/x  and www.news.com/story?id=2#top")
+    assert a == b == "read this and https://b.org/x https://news.com/story?id=2"
+
+
+def test_canonicalize_url():
+    assert canonicalize_url("HTTP://WWW.Example.com:80//a//b/?b=2&a=1&fbclid=x#frag") == "https://example.com/a/b?a=1&b=2"
+    assert canonicalize_url("example.com:8080/x") == "https://example.com:8080/x"
+
+
+def test_empty_claim():
+    assert canonicalize_claim("") == canonicalize_claim(None) == ""
+
+
+def test_make_key():
+    assert make_key(CLAIM) == make_key(CLAIM.upper() + "!")
+    assert make_key(CLAIM) != make_key(CLAIM, namespace="stream")
+    assert make_key(CLAIM, [b"image"]) != make_key(CLAIM, [b"other image"])
+
+
+def test_lru_cache_evicts_and_expires():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    cache.set("d", 4, ttl=-1)
+    assert cache.get("d", "gone") == "gone"
+
+
+def test_sqlite_cache_round_trip(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), ttl=60)
+    cache.set("key", "value", CLAIM)
+    assert cache.get("key") == "value"
+    assert [entry[:3] for entry in cache.entries()] == [("key", "value", CLAIM)]
+    cache.close()
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from claim_index import ClaimIndex, meaning_differs, meaning_terms, claim_words
+
+RBI = "The Reserve Bank of India has announced that 2000 rupee notes will remain legal tender until March next year"
+
+
+@pytest.fixture
+def index():
+    index = ClaimIndex()
+    index.add(RBI, "rbi")
+    return index
+
+
+@pytest.mark.parametrize("text", [
+    RBI,
+    f"Forwarded as received\n\n{RBI} 🙏🙏",
+    RBI.upper(),
+    f"Breaking news: {RBI}",
+])
+def test_matches_cosmetic_variants(index, text):
+    match = index.query(text)
+    assert match is not None and match[0] == "rbi"
+
+
+@pytest.mark.parametrize("text", [
+    RBI.replace("has announced", "has not announced"),
+    RBI.replace("will remain legal tender until March", "will not remain legal tender after March"),
+    RBI.replace("has announced", "has never announced"),
+    RBI.replace("2000", "500"),
+    RBI.replace("March", "April"),
+    RBI.replace("has announced", "hasn't announced"),
+])
+def test_rejects_changed_meaning(index, text):
+    assert index.query(text) is None
+
+
+def test_counts_rejected_near_duplicates(index):
+    # Similar enough to match on wording alone
+    assert index.query(RBI.replace("has announced", "has not announced")) is None
+    assert index.stats()["rejected_meaning_change"] == 1
+
+
+def test_meaning_terms():
+    assert meaning_terms(claim_words("Schools closed on 5 March, not 6")) == ("5", "6", "march", "not")
+    assert meaning_terms(claim_words("Schools are closed")) == ()
+    assert meaning_differs(RBI, RBI.replace("2000", "२०००"))
+    assert not meaning_differs(RBI, f"*MUST READ* {RBI}")
+
+
+def test_short_claims_are_not_indexed():
+    index = ClaimIndex()
+    assert not index.add("Exams cancelled", "k")
+    assert index.query("Exams cancelled") is None
+
+
+def test_expired_entries_do_not_match():
+    index = ClaimIndex(ttl=60)
+    index.add(RBI, "old", added_at=time.time() - 120)
+    assert index.query(RBI) is None
+    index.add(RBI, "new")
+    assert index.query(RBI)[0] == "new"
+
+
+def test_discard_and_readd():
+    index = ClaimIndex()
+    index.add(RBI, "rbi")
+    index.add(RBI, "rbi")
+    assert len(index) == 1
+    index.discard("rbi")
+    assert index.query(RBI) is None
+    assert len(index) == 0
+
+
+def test_compaction_keeps_live_entries():
+    index = ClaimIndex(ttl=1000)
+    now = time.time()
+    for i in range(3000):
+        index.add(f"claim number {i} about the water supply in the city", i,
+                  added_at=now - 5000 if i < 2000 else None)
+    assert len(index) == 1000
+    assert len(index._values) < 3000
+    assert index.query("claim number 2500 about the water supply in the city")[0] == 2500
+    assert index.query("claim number 10 about the water supply in the city") is None
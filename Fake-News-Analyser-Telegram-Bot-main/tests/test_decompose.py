@@ -0,0 +1,63 @@
+import pytest
+
+from decompose import MAX_SOURCES, aggregate, split_claims
+from models import ClaimVerdict
+
+
+def claim(verdict, confidence, text="Schools in Delhi will stay closed all of next week", sources=None):
+    return ClaimVerdict(claim=text, verdict=verdict, confidence=confidence, reason=f"{verdict} reason.",
+                        sources=sources or {})
+
+
+def test_all_claims_agree():
+    result = aggregate([claim("Fake", 0.9), claim("Fake", 0.7)])
+    assert result.verdict == "Fake"
+    assert result.confidence == pytest.approx(0.8)
+    assert len(result.claims) == 2
+
+
+def test_uncertain_claims_scale_confidence_down():
+    result = aggregate([claim("Real", 0.9), claim("Real", 0.9), claim("Uncertain", 0.4)])
+    assert result.verdict == "Real"
+    assert result.confidence == pytest.approx(0.6)
+
+
+def test_mixed_real_and_fake_is_uncertain():
+    result = aggregate([claim("Real", 0.95), claim("Fake", 0.9), claim("Uncertain", 0.2)])
+    assert (result.verdict, result.confidence) == ("Uncertain", 0.5)
+    assert result.reason.startswith("The message makes 3 separate claims: 1 fake, 1 real, 1 uncertain.")
+
+
+def test_all_uncertain():
+    result = aggregate([claim("Uncertain", 0.3), claim("Uncertain", 0.5)])
+    assert (result.verdict, result.confidence) == ("Uncertain", 0.4)
+
+
+def test_reason_lists_each_claim_without_markdown():
+    long_claim = "*Breaking*: " + "the government has announced free laptops " * 4
+    reason = aggregate([claim("Fake", 0.9, text=long_claim)]).reason
+    line = reason.splitlines()[1]
+    assert line.startswith('1. "Breaking: the government') and "*" not in line
+    assert '…" - Fake (90%): Fake reason.' in line
+
+
+def test_sources_keep_first_link_per_title_and_are_capped():
+    verdicts = [claim("Fake", 0.9, sources={"PIB": "https://pib.gov.in/a", "Reuters": "https://reuters.com/a"}),
+                claim("Fake", 0.9, sources={"PIB": "https://pib.gov.in/b"}),
+                claim("Fake", 0.9, sources={f"Site {i}": f"https://site{i}.example.com" for i in range(20)})]
+    sources = aggregate(verdicts).sources
+    assert sources["PIB"] == "https://pib.gov.in/a"
+    assert len(sources) == MAX_SOURCES
+
+
+def test_split_claims():
+    text = ("Forwarded as received\n"
+            "1. Schools in Delhi will stay closed all of next week.\n"
+            "2. Petrol will be free for two days from Monday onwards. Share now!\n"
+            "3. Banks are shut.")
+    assert split_claims(text) == [
+        "Schools in Delhi will stay closed all of next week.",
+        "Petrol will be free for two days from Monday onwards. Share now! Banks are shut.",
+    ]
+    assert len(split_claims(". ".join(f"Claim number {i} is about the water supply" for i in range(20)),
+                            max_claims=4)) == 4
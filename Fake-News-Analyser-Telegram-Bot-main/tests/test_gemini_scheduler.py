@@ -0,0 +1,188 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import gemini_scheduler
+from gemini_scheduler import GeminiScheduler, Slot
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimited(Exception):
+    code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("429 RESOURCE_EXHAUSTED")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(gemini_scheduler, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def make_scheduler(**kwargs):
+    kwargs.setdefault("weights", {})
+    scheduler = GeminiScheduler(**kwargs)
+    # Timers are replaced by explicit _wake() calls after moving the fake clock
+    scheduler.wakeups = []
+    scheduler._wake_in = scheduler.wakeups.append
+    return scheduler
+
+
+def enqueue(scheduler, user="u", channel="api", cost=100, log=None):
+    return scheduler._enqueue(channel, user, cost, lambda: log.append(user) if log is not None else None)
+
+
+def release(scheduler, waiter, error=None, tokens=None):
+    slot = Slot(waiter)
+    slot.tokens = tokens
+    scheduler._release(slot, error)
+
+
+def run_one_at_a_time(scheduler, calls, order):
+    """Release the running call until every queued call has been granted."""
+    blocker = enqueue(scheduler, "blocker", channel="other")
+    waiters = [enqueue(scheduler, user, channel, log=order) for channel, user in calls]
+    assert order == []
+    for _ in waiters:
+        release(scheduler, blocker)
+    return waiters
+
+
+def test_users_in_a_channel_take_turns(clock):
+    scheduler = make_scheduler(max_concurrency=1)
+    order = []
+    run_one_at_a_time(scheduler, [("api", "heavy")] * 3 + [("api", "light")], order)
+    assert order == ["heavy", "light", "heavy", "heavy"]
+
+
+def test_channels_share_by_weight(clock):
+    scheduler = make_scheduler(max_concurrency=1, weights={"api": 2, "telegram": 1})
+    order = []
+    calls = [("telegram", f"t{i}") for i in range(4)] + [("api", f"a{i}") for i in range(4)]
+    run_one_at_a_time(scheduler, calls, order)
+    assert order == ["a0", "t0", "a1", "a2", "t1", "a3", "t2", "t3"]
+
+
+def test_429_halves_the_limit_and_successes_grow_it_back(clock):
+    scheduler = make_scheduler(max_concurrency=8, min_concurrency=1)
+    waiter = enqueue(scheduler)
+    release(scheduler, waiter, RateLimited())
+    assert scheduler.limit == 4
+    assert scheduler.stats()["decreases"] == 1
+    assert scheduler.stats()["paused_for"] == gemini_scheduler.RATE_LIMIT_BACKOFF
+
+    clock.now += 10
+    limits = []
+    for _ in range(30):
+        release(scheduler, enqueue(scheduler))
+        limits.append(int(scheduler.limit))
+    assert limits[0] == 4
+    assert limits == sorted(limits)
+    assert limits[-1] == 8
+
+
+def test_slow_calls_count_as_congestion(clock):
+    scheduler = make_scheduler(max_concurrency=8, latency_target=5)
+    slot = Slot(enqueue(scheduler))
+    clock.now += 6
+    scheduler._release(slot)
+    assert scheduler.limit == 4
+    assert scheduler.stats()["slow"] == 1
+
+
+def test_retry_after_pause_is_shared_by_calls_in_flight(clock):
+    scheduler = make_scheduler(max_concurrency=8)
+    in_flight = [enqueue(scheduler, f"u{i}") for i in range(3)]
+    assert all(w.granted for w in in_flight)
+
+    release(scheduler, in_flight[0], RateLimited(retry_after="5"))
+    queued = enqueue(scheduler, "late")
+    assert not queued.granted
+    assert scheduler.wakeups[-1] == pytest.approx(5)
+
+    # The other in-flight calls hit the same episode: no further halving or backoff
+    clock.now += 1
+    release(scheduler, in_flight[1], RateLimited())
+    release(scheduler, in_flight[2], RateLimited())
+    stats = scheduler.stats()
+    assert stats["rate_limited"] == 3
+    assert stats["decreases"] == 1
+    assert scheduler.limit == 4
+    assert scheduler._backoff == gemini_scheduler.RATE_LIMIT_BACKOFF * 2
+    assert stats["paused_for"] == 4
+
+    clock.now += 3.9
+    scheduler._wake()
+    assert not queued.granted
+    clock.now += 0.1
+    scheduler._wake()
+    assert queued.granted
+
+
+@pytest.mark.parametrize("actual, remaining", [(250, 350), (40, 560), (None, 500)])
+def test_release_settles_the_token_estimate(clock, actual, remaining):
+    scheduler = make_scheduler(tpm=600)
+    waiter = enqueue(scheduler, cost=100)
+    assert scheduler.tpm.available(clock.now) == 500
+    release(scheduler, waiter, tokens=actual)
+    assert scheduler.tpm.available(clock.now) == remaining
+
+
+def test_token_budget_holds_calls_until_it_refills(clock):
+    scheduler = make_scheduler(tpm=600)
+    release(scheduler, enqueue(scheduler, cost=100), tokens=600)
+    queued = enqueue(scheduler, cost=100)
+    assert not queued.granted
+    assert scheduler.wakeups[-1] == pytest.approx(10)
+    clock.now += 10
+    scheduler._wake()
+    assert queued.granted
+
+
+def test_cancelled_waiter_gives_up_its_turn(clock):
+    scheduler = make_scheduler(max_concurrency=1)
+    order = []
+    blocker = enqueue(scheduler, "blocker")
+    first = enqueue(scheduler, "first", log=order)
+    second = enqueue(scheduler, "second", log=order)
+
+    assert scheduler._cancel(first) is False
+    assert scheduler.stats()["queued"] == 1
+    release(scheduler, blocker)
+    assert order == ["second"]
+    assert not first.granted and second.granted
+    assert scheduler.stats()["queued"] == 0
+
+
+def test_cancelled_task_leaves_the_queue(clock):
+    scheduler = make_scheduler(max_concurrency=1)
+    blocker = enqueue(scheduler, "blocker")
+
+    async def main():
+        async def use_slot(user):
+            async with scheduler.slot(user):
+                return user
+
+        cancelled = asyncio.create_task(use_slot("cancelled"))
+        waiting = asyncio.create_task(use_slot("waiting"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        release(scheduler, blocker)
+        return await waiting, cancelled.cancelled()
+
+    assert asyncio.run(main()) == ("waiting", True)
+    stats = scheduler.stats()
+    assert stats["queued"] == 0
+    assert stats["in_flight"] == 0
@@ -0,0 +1,52 @@
+import sqlite3
+import time
+
+import image_index
+from image_index import ImageIndex
+
+HASH = 0x8F3A_55C1_0E7B_9924
+
+
+def test_matches_close_hash_with_same_text():
+    index = ImageIndex(enabled=True)
+    index.add(HASH, "verdict", "Flood in Chennai")
+    assert index.query(HASH ^ 0b101, "flood in chennai!") == ("verdict", 2)
+    assert index.query(HASH, "Flood in Mumbai") is None
+    assert index.query(HASH ^ 0xFFFF, "Flood in Chennai") is None
+
+
+def test_expired_entries_do_not_match(monkeypatch):
+    index = ImageIndex(enabled=True, ttl=60)
+    index.add(HASH, "old")
+    now = time.time()
+    monkeypatch.setattr(image_index.time, "time", lambda: now + 120)
+    assert index.query(HASH) is None
+    index.add(HASH, "new")
+    assert index.query(HASH) == ("new", 0)
+
+
+def test_discarded_value_no_longer_matches(tmp_path):
+    path = str(tmp_path / "cache.db")
+    index = ImageIndex(path=path, enabled=True)
+    index.add(HASH, "gone")
+    index.discard("gone")
+    assert index.query(HASH) is None
+    assert ImageIndex(path=path, enabled=True).query(HASH) is None
+
+
+def test_prunes_expired_rows_and_rebuilds(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_index, "REBUILD_MIN_STALE", 10)
+    path = str(tmp_path / "cache.db")
+    index = ImageIndex(path=path, enabled=True, ttl=60)
+    now = time.time()
+    monkeypatch.setattr(image_index.time, "time", lambda: now - 3600)
+    for i in range(image_index.PRUNE_EVERY - 1):
+        index.add(HASH ^ i, f"old{i}")
+    monkeypatch.setattr(image_index.time, "time", lambda: now)
+    index.add(~HASH & (2 ** 64 - 1), "fresh")
+    (rows,) = sqlite3.connect(path).execute("SELECT COUNT(*) FROM image_hashes").fetchone()
+    assert rows == 1
+    assert index.stats()["rebuilds"] == 1
+    assert index.stats()["indexed"] == 1
+    assert index.query(~HASH & (2 ** 64 - 1)) == ("fresh", 0)
+    assert ImageIndex(path=path, enabled=True, ttl=60).query(HASH ^ 3) is None
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from json_extract import AnalysisStreamParser, extract_analysis, extract_json, normalize_confidence
+
+RESULT = {
+    "verdict": "Fake",
+    "confidence": 0.85,
+    "reason": "No \"official\" notice exists.\nPIB denied it ✅ 😀",
+    "sources": {"PIB Fact Check": "https://pib.gov.in/factcheck", "Reuters": "https://www.reuters.com/x"},
+}
+RAW = json.dumps(RESULT, indent=2)
+
+
+@pytest.mark.parametrize("text", [
+    RAW,
+    f"```json\n{RAW}\n```",
+    f"Here is my analysis {{this is prose}} of the claim:\n{RAW}\nHope this helps.",
+    RAW.replace('"https://www.reuters.com/x"\n', '"https://www.reuters.com/x",\n'),
+    json.dumps(RESULT, ensure_ascii=True),
+])
+def test_extracts_verdict_object(text):
+    assert extract_json(text) == RESULT
+
+
+def test_accepts_python_literals_and_loose_fields():
+    result = extract_analysis(
+        "{'x': 1} {\"verdict\": \"fake\", \"confidence\": \"85%\", \"reason\": None, "
+        "\"sources\": [{\"title\": \"PIB\", \"url\": \"https://pib.gov.in\"}, \"Some blog\"], \"extra\": True}",
+        "Schools shut tomorrow",
+    )
+    assert result.verdict == "Fake"
+    assert result.confidence == 0.85
+    assert result.reason == ""
+    assert result.sources["PIB"] == "https://pib.gov.in"
+    assert result.sources["Some blog"].startswith("https://www.google.com/search?q=Some+blog+Schools")
+
+
+def test_without_verdict():
+    assert extract_analysis("I cannot help with that.") is None
+    assert extract_analysis('{"reason": "no verdict"}') is None
+    assert extract_json('{"reason": "no verdict"}') == {"reason": "no verdict"}
+
+
+@pytest.mark.parametrize("value, expected", [(0.85, 0.85), (85, 0.85), ("85%", 0.85), ("0.3", 0.3),
+                                             (True, 0.0), (None, 0.0), (-1, 0.0)])
+def test_normalize_confidence(value, expected):
+    assert normalize_confidence(value) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64])
+def test_streaming_matches_whole_parse(chunk_size):
+    text = f"```json\n{json.dumps(RESULT, ensure_ascii=True)}\n```"
+    parser = AnalysisStreamParser()
+    events = []
+    for i in range(0, len(text), chunk_size):
+        events += parser.feed(text[i:i + chunk_size])
+    assert parser.close() == extract_analysis(text)
+    assert events[0] == ("verdict", {"verdict": "Fake"})
+    assert ("confidence", {"confidence": 0.85}) in events
+    assert "".join(data["delta"] for event, data in events if event == "reason") == RESULT["reason"]
+    assert [data["title"] for event, data in events if event == "source"] == list(RESULT["sources"])
@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+
+import pytest
+
+import lang_id
+import sarvam
+from cache import LRUCache
+from lang_id import identify_local
+
+
+@pytest.mark.parametrize("text, language", [
+    ("এই খবরটি সম্পূর্ণ মিথ্যা", "bn-IN"),
+    ("ਇਹ ਖ਼ਬਰ ਪੂਰੀ ਤਰ੍ਹਾਂ ਝੂਠੀ ਹੈ", "pa-IN"),
+    ("આ સમાચાર સંપૂર્ણપણે ખોટા છે", "gu-IN"),
+    ("ଏହି ଖବର ସମ୍ପୂର୍ଣ୍ଣ ମିଛ", "od-IN"),
+    ("இந்த செய்தி முற்றிலும் பொய்யானது", "ta-IN"),
+    ("ఈ వార్త పూర్తిగా అబద్ధం", "te-IN"),
+    ("ಈ ಸುದ್ದಿ ಸಂಪೂರ್ಣವಾಗಿ ಸುಳ್ಳು", "kn-IN"),
+    ("ഈ വാർത്ത പൂർണ്ണമായും വ്യാജമാണ്", "ml-IN"),
+    ("क्या यह सच है कि सरकार ने सभी बैंक बंद करने की घोषणा की है?", "hi-IN"),
+    ("ही बातमी खरी आहे का? सरकारने सर्व बँका बंद करण्याची घोषणा केली आहे.", "mr-IN"),
+    ("Is it true that the government has announced that all banks will be closed?", "en-IN"),
+    ("kya yeh sach hai ki sarkar ne sabhi bank band karne ki ghoshna ki hai?", "hi-IN"),
+])
+def test_identifies_each_supported_script_locally(text, language):
+    assert identify_local(text) == (language, True)
+
+
+@pytest.mark.parametrize("text", [
+    "Breaking news: सरकार ने घोषणा की है",  # mixed scripts
+    "ok",  # too short to tell English from romanized Hindi
+    "हाँ",  # too short to tell Hindi from Marathi
+    "👍👍",
+    "12345",
+])
+def test_unclear_input_is_not_confident(text):
+    assert identify_local(text)[1] is False
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    calls = []
+
+    async def detect_language(text):
+        calls.append(text)
+        return "hi-IN"
+
+    monkeypatch.setattr(sarvam, "detect_language", detect_language)
+    monkeypatch.setattr(lang_id, "_cache", LRUCache(2))
+    monkeypatch.setattr(lang_id, "local_hits", 0)
+    monkeypatch.setattr(lang_id, "remote_calls", 0)
+    return calls
+
+
+def detect(*texts):
+    async def main():
+        return [await lang_id.detect_language(text) for text in texts]
+
+    return asyncio.run(main())
+
+
+def test_unclear_input_falls_back_to_sarvam(remote):
+    assert detect("Breaking news: सरकार ने घोषणा की है", "ok", "ஆம்") == ["hi-IN", "hi-IN", "ta-IN"]
+    assert remote == ["Breaking news: सरकार ने घोषणा की है", "ok"]
+    assert lang_id.stats()["local"] == 1 and lang_id.stats()["remote"] == 2
+
+
+def test_results_are_cached_by_message_hash(remote):
+    text = "Breaking news: सरकार ने घोषणा की है"
+    assert detect(text, text, text) == ["hi-IN"] * 3
+    assert remote == [text]
+    assert lang_id._cache.get(hashlib.sha256(text.encode("utf-8")).hexdigest()) == "hi-IN"
+
+
+def test_cache_evicts_the_least_recently_used_message(remote):
+    one, two, three = (f"Forward {n}: सरकार ने घोषणा की है" for n in ("one", "two", "three"))
+    detect(one, two, one, three, one, two)
+    # `two` was evicted by `three`; `one` stayed because it was used again
+    assert remote == [one, two, three, two]
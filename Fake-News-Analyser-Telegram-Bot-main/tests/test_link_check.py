@@ -0,0 +1,188 @@
+import asyncio
+import socket
+
+import httpx
+import pytest
+
+from link_check import ALIVE, DEAD, UNKNOWN, LinkChecker, is_public_host
+
+ADDRESSES = {
+    "news.example.com": ["93.184.216.34"],
+    "other.example.com": ["93.184.216.35"],
+    "127.0.0.1.nip.io": ["127.0.0.1"],
+    "localtest.me": ["127.0.0.1", "::1"],
+    "split.example.com": ["93.184.216.36", "10.0.0.5"],
+}
+
+
+async def resolve(host):
+    if host not in ADDRESSES:
+        raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+    return ADDRESSES[host]
+
+
+def make_checker(handler, **kwargs):
+    requests = []
+
+    async def record(request):
+        requests.append((request.method, str(request.url)))
+        return await handler(request)
+
+    kwargs.setdefault("deadline", 1.0)
+    checker = LinkChecker(enabled=True, transport=httpx.MockTransport(record), resolver=resolve, **kwargs)
+    return checker, requests
+
+
+def check(checker, *urls):
+    async def main():
+        try:
+            return await checker.check(urls)
+        finally:
+            await checker.close()
+
+    return asyncio.run(main())
+
+
+async def ok(request):
+    return httpx.Response(200)
+
+
+@pytest.mark.parametrize("host, public", [
+    ("news.example.com", True), ("localhost", False), ("api.localhost", False), ("printer.local", False),
+    ("10.1.2.3", False), ("169.254.169.254", False), ("[::1]", False), ("8.8.8.8", True), ("intranet", False),
+])
+def test_is_public_host(host, public):
+    assert is_public_host(host) is public
+
+
+def test_live_link():
+    checker, requests = make_checker(ok)
+    assert check(checker, "https://news.example.com/story") == {"https://news.example.com/story": ALIVE}
+    assert requests == [("HEAD", "https://news.example.com/story")]
+
+
+def test_head_refused_falls_back_to_get():
+    async def handler(request):
+        return httpx.Response(405 if request.method == "HEAD" else 200)
+
+    checker, requests = make_checker(handler)
+    assert check(checker, "https://news.example.com/a")["https://news.example.com/a"] == ALIVE
+    assert [method for method, _ in requests] == ["HEAD", "GET"]
+
+
+def test_missing_page_is_dead():
+    async def handler(request):
+        return httpx.Response(404)
+
+    checker, _ = make_checker(handler)
+    assert check(checker, "https://news.example.com/made-up")["https://news.example.com/made-up"] == DEAD
+
+
+@pytest.mark.parametrize("host", ["127.0.0.1.nip.io", "localtest.me", "split.example.com"])
+def test_names_resolving_to_private_addresses_are_not_fetched(host):
+    checker, requests = make_checker(ok)
+    url = f"https://{host}/admin"
+    assert check(checker, url)[url] == DEAD
+    assert requests == []
+    assert checker.counts["blocked"] == 1
+
+
+@pytest.mark.parametrize("target", [
+    "http://169.254.169.254/latest/meta-data/",
+    "http://localhost:8000/api/cache/stats",
+    "https://127.0.0.1.nip.io/",
+    "file:///etc/passwd",
+])
+def test_redirects_to_private_targets_are_not_followed(target):
+    async def handler(request):
+        return httpx.Response(302, headers={"Location": target})
+
+    checker, requests = make_checker(handler)
+    assert check(checker, "https://news.example.com/r")["https://news.example.com/r"] == DEAD
+    assert all(url.startswith("https://news.example.com/") for _, url in requests)
+
+
+def test_public_redirects_are_followed_up_to_the_limit():
+    async def handler(request):
+        if request.url.host == "news.example.com":
+            return httpx.Response(301, headers={"Location": "https://other.example.com/moved"})
+        return httpx.Response(200)
+
+    checker, requests = make_checker(handler)
+    assert check(checker, "https://news.example.com/old")["https://news.example.com/old"] == ALIVE
+    assert requests == [("HEAD", "https://news.example.com/old"), ("HEAD", "https://other.example.com/moved")]
+
+    async def loop(request):
+        return httpx.Response(302, headers={"Location": f"/hop{len(requests)}"})
+
+    checker, requests = make_checker(loop, max_redirects=3)
+    assert check(checker, "https://news.example.com/loop")["https://news.example.com/loop"] == DEAD
+    assert len(requests) == 4
+
+
+def test_unknown_host_name_marks_the_host_dead():
+    checker, requests = make_checker(ok)
+    url = "https://made-up-news.example.net/story"
+    assert check(checker, url)[url] == DEAD
+    assert checker.hosts.get("made-up-news.example.net")
+    assert requests == []
+
+
+def test_single_connect_error_is_unknown_until_it_repeats():
+    async def handler(request):
+        raise httpx.ConnectError("Connection refused", request=request)
+
+    checker, _ = make_checker(handler, host_failures=3)
+    urls = [f"https://news.example.com/{i}" for i in range(3)]
+
+    async def main():
+        states = [(await checker.check([url]))[url] for url in urls]
+        await checker.close()
+        return states
+
+    states = asyncio.run(main())
+    assert states == [UNKNOWN, UNKNOWN, DEAD]
+    assert checker.hosts.get("news.example.com")
+
+
+def test_connection_success_resets_failures():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        if len(calls) == 2:
+            return httpx.Response(200)
+        raise httpx.ConnectError("Connection refused", request=request)
+
+    checker, _ = make_checker(handler, host_failures=2)
+
+    async def main():
+        states = [(await checker.check([f"https://news.example.com/{i}"]))[f"https://news.example.com/{i}"]
+                  for i in range(3)]
+        await checker.close()
+        return states
+
+    assert asyncio.run(main()) == [UNKNOWN, ALIVE, UNKNOWN]
+    assert not checker.hosts.get("news.example.com")
+
+
+def test_deadline_keeps_slow_links_and_caches_the_late_answer():
+    async def handler(request):
+        await asyncio.sleep(0.1)
+        return httpx.Response(404)
+
+    checker, _ = make_checker(handler, deadline=0.05)
+    url = "https://news.example.com/slow"
+
+    async def main():
+        first = await checker.validate({"Slow": url}, "claim")
+        await asyncio.sleep(0.5)  # HEAD and GET both answer 404
+        second = await checker.validate({"Slow": url}, "claim")
+        await checker.close()
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == {"Slow": url}
+    assert second["Slow"].startswith("https://www.google.com/search?q=Slow+claim")
+    assert checker.counts["late"] == 1
+    assert checker.counts["probes"] == 1
@@ -0,0 +1,92 @@
+import asyncio
+import io
+
+import pytest
+from starlette.applications import Starlette
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartParser
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from media import UploadSizeLimitMiddleware, UploadTooLarge, parse_upload_form, read_upload, sniff_mime
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+@pytest.mark.parametrize("data, mime", [
+    (b"\xff\xd8\xff\xe0" + b"\x00" * 16, "image/jpeg"),
+    (PNG, "image/png"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"),
+    (b"GIF89a" + b"\x00" * 10, "image/gif"),
+    (b"\x00\x00\x00\x18ftypheic\x00\x00", "image/heic"),
+    (b"\x00\x00\x00\x18ftypmif1\x00\x00", "image/heif"),
+    (b"\x00\x00\x00\x18ftypisom\x00\x00", None),
+    (b"%PDF-1.7\n", None),
+    (b"", None),
+])
+def test_sniff_mime(data, mime):
+    assert sniff_mime(data) == mime
+
+
+@pytest.mark.parametrize("size", [None, 10])
+def test_read_upload_with_and_without_known_size(size):
+    upload = UploadFile(io.BytesIO(b"x" * 10), size=size)
+    assert asyncio.run(read_upload(upload, max_bytes=10)) == b"x" * 10
+
+
+@pytest.mark.parametrize("size", [None, 11])
+def test_read_upload_stops_past_the_cap(size):
+    upload = UploadFile(io.BytesIO(b"x" * 11), size=size)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(read_upload(upload, max_bytes=10))
+
+
+async def echo_upload(request):
+    form = await parse_upload_form(request, max_bytes=4 * 1024 * 1024)
+    try:
+        image = form["image"]
+        data = await read_upload(image, max_bytes=4 * 1024 * 1024)
+        return JSONResponse({"size": len(data), "in_memory": not image.file._rolled})
+    finally:
+        await form.close()
+
+
+def make_client(max_bytes):
+    app = Starlette(routes=[Route("/upload", echo_upload, methods=["POST"])])
+    return TestClient(UploadSizeLimitMiddleware(app, max_bytes=max_bytes, paths=["/upload"]))
+
+
+def test_upload_form_stays_in_memory_without_patching_starlette():
+    client = make_client(8 * 1024 * 1024)
+    response = client.post("/upload", files={"image": ("a.png", PNG + b"\x00" * 2 * 1024 * 1024, "image/png")})
+    assert response.json() == {"size": len(PNG) + 2 * 1024 * 1024, "in_memory": True}
+    assert MultiPartParser.spool_max_size == 1024 * 1024
+
+
+def test_content_length_over_the_limit_is_refused():
+    client = make_client(1024)
+    response = client.post("/upload", files={"image": ("a.png", PNG + b"\x00" * 200 * 1024, "image/png")})
+    assert response.status_code == 413
+
+
+def test_chunked_body_is_cut_off_mid_stream():
+    def body():
+        for _ in range(100):
+            yield b"\x00" * 16 * 1024
+
+    client = make_client(1024)
+    response = client.post("/upload", content=body(),
+                           headers={"content-type": "multipart/form-data; boundary=x"})
+    assert response.status_code == 413
+    assert "content-length" not in response.request.headers
+
+
+def test_unknown_bytes_get_415():
+    from server import app
+
+    client = TestClient(app)
+    response = client.post("/api/analyze/upload", files={"image": ("a.png", b"%PDF-1.7\n" * 10, "image/png")})
+    assert response.status_code == 415
+    response = client.post("/api/analyze/upload", data={})
+    assert response.status_code == 400
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_call():
+    flight, started = SingleFlight("test"), []
+
+    async def work(value):
+        started.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def main():
+        return await asyncio.gather(flight.do("a", work, 1), flight.do("a", work, 1), flight.do("b", work, 2))
+
+    assert asyncio.run(main()) == [2, 2, 4]
+    assert started == [1, 2]
+    assert flight.stats() == {"calls": 2, "coalesced": 1, "errors": 0, "in_flight": 0}
+
+
+def test_sequential_calls_run_again():
+    flight = SingleFlight("test")
+
+    async def work():
+        return "done"
+
+    async def main():
+        return [await flight.do("a", work), await flight.do("a", work)]
+
+    assert asyncio.run(main()) == ["done", "done"]
+    assert flight.calls == 2 and flight.coalesced == 0
+
+
+def test_waiters_share_the_exception():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def main():
+        return await asyncio.gather(flight.do("a", fail), flight.do("a", fail), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()["errors"] == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelling_one_waiter_keeps_the_call_for_others():
+    flight, finished = SingleFlight("test"), []
+
+    async def work():
+        await asyncio.sleep(0.05)
+        finished.append(True)
+        return "result"
+
+    async def main():
+        first = asyncio.create_task(flight.do("a", work))
+        second = asyncio.create_task(flight.do("a", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "result"
+    assert finished == [True]
+
+
+def test_cancelling_the_last_waiter_cancels_the_call():
+    flight, finished = SingleFlight("test"), []
+
+    async def work():
+        await asyncio.sleep(0.05)
+        finished.append(True)
+
+    async def main():
+        waiter = asyncio.create_task(flight.do("a", work))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0.08)
+
+    asyncio.run(main())
+    assert finished == []
+    assert flight.stats()["in_flight"] == 0
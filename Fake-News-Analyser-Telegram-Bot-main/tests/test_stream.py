@@ -0,0 +1,124 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+import translation_memory
+from gemini_scheduler import SchedulerBusy
+
+RESULT = {
+    "verdict": "Fake",
+    "confidence": 0.85,
+    "reason": "PIB denied the notice.",
+    "sources": {"PIB Fact Check": "https://pib.gov.in/factcheck", "Reuters": "https://www.reuters.com/x"},
+}
+RAW = "Here is my analysis:\n```json\n" + json.dumps(RESULT, indent=2) + "\n```"
+
+
+class StubLinkChecker:
+    def __init__(self):
+        self.prefetched = []
+
+    def prefetch(self, url):
+        self.prefetched.append(url)
+
+    async def validate_result(self, result, claim):
+        return result
+
+
+class StubStore:
+    def __init__(self):
+        self.recorded = []
+
+    def record(self, text, result, **kwargs):
+        self.recorded.append((text, result["verdict"]))
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    stubs = {"chunks": [RAW[i:i + 7] for i in range(0, len(RAW), 7)],
+             "links": StubLinkChecker(), "store": StubStore()}
+
+    async def analyze_news_stream(news_input, user=None):
+        for chunk in stubs["chunks"]:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    async def detect_language(text):
+        return "hi" if text.startswith("क्या") else "en"
+
+    async def create_news_input_async(news_text="", image_source=None):
+        return news_text
+
+    async def ui_text(text, language):
+        return f"[{language}] {text}"
+
+    async def translate_text(text, language):
+        return f"<{language}> {text}"
+
+    monkeypatch.setattr(server, "analyze_news_stream", analyze_news_stream)
+    monkeypatch.setattr(server, "detect_language", detect_language)
+    monkeypatch.setattr(server, "create_news_input_async", create_news_input_async)
+    monkeypatch.setattr(server, "translate_text", translate_text)
+    monkeypatch.setattr(translation_memory, "ui_text", ui_text)
+    monkeypatch.setattr(server, "link_checker", stubs["links"])
+    monkeypatch.setattr(server, "verdict_store", stubs["store"])
+    return stubs
+
+
+def stream(text="Is the notice real?"):
+    response = TestClient(server.app).post("/api/analyze/stream", json={"text": text})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    # Every event is "event: <name>\ndata: <json>" followed by a blank line
+    assert response.text.endswith("\n\n")
+    events = []
+    for block in response.text.split("\n\n")[:-1]:
+        event, data = block.split("\n")
+        assert event.startswith("event: ") and data.startswith("data: ")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_fields_stream_before_the_result(stubs):
+    events = stream()
+    names = [name for name, _ in events]
+    assert events[:2] == [("status", {"stage": "language_detected", "language": "en"}),
+                          ("status", {"stage": "analysis_started"})]
+    assert events[2] == ("verdict", {"verdict": "Fake"})
+    assert ("confidence", {"confidence": 0.85}) in events
+    assert len([name for name in names if name == "reason"]) > 1  # the reason arrives in pieces
+    assert "".join(data["delta"] for name, data in events if name == "reason") == RESULT["reason"]
+    assert [data["title"] for name, data in events if name == "source"] == list(RESULT["sources"])
+    assert names[-2:] == ["result", "done"]
+    assert "translation" not in names
+
+    result = events[-2][1]
+    assert result == dict(RESULT, detected_language="en")
+    assert stubs["links"].prefetched == list(RESULT["sources"].values())
+    assert stubs["store"].recorded == [("Is the notice real?", "Fake")]
+
+
+def test_non_english_adds_a_translation_event(stubs):
+    events = stream("क्या यह सच है?")
+    names = [name for name, _ in events]
+    assert names[-3:] == ["result", "translation", "done"]
+    assert events[-3][1]["reason"] == RESULT["reason"]  # `result` stays in English
+    assert events[-2][1] == {"language": "hi", "verdict": "[hi] Fake", "reason": f"<hi> {RESULT['reason']}"}
+
+
+def test_unparseable_output_ends_with_an_error(stubs):
+    stubs["chunks"] = ["I cannot help with that."]
+    events = stream()
+    assert events[-1] == ("error", {"status_code": 500, "detail": "Failed to parse analysis results"})
+    assert "result" not in [name for name, _ in events]
+    assert stubs["store"].recorded == []
+
+
+def test_busy_scheduler_mid_stream_is_a_503_event(stubs):
+    stubs["chunks"] = stubs["chunks"][:3] + [SchedulerBusy("Waited 60.0s for a Gemini slot")]
+    events = stream()
+    assert events[-1] == ("error", {"status_code": 503, "detail": "Waited 60.0s for a Gemini slot"})
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import telegram_webhook
+from server import app
+
+UPDATE = {
+    "update_id": 7,
+    "message": {"message_id": 1, "date": 1700000000, "chat": {"id": 42, "type": "private"}, "text": "Is this true?"},
+}
+
+
+class StubApplication:
+    """Stands in for the bot's Application: just an update queue and lifecycle calls."""
+
+    def __init__(self):
+        self.update_queue = asyncio.Queue()
+        self.bot = None
+        self.calls = []
+
+    async def stop(self):
+        self.calls.append("stop")
+
+    async def shutdown(self):
+        self.calls.append("shutdown")
+
+
+@pytest.fixture
+def application(monkeypatch):
+    application = StubApplication()
+    monkeypatch.setattr(telegram_webhook, "_application", application)
+    monkeypatch.setattr(telegram_webhook, "TELEGRAM_WEBHOOK_SECRET", "s3cret")
+    return application
+
+
+def post(data, secret):
+    headers = {telegram_webhook.SECRET_HEADER: secret} if secret is not None else {}
+    return TestClient(app).post(telegram_webhook.WEBHOOK_PATH, json=data, headers=headers)
+
+
+@pytest.mark.parametrize("secret", ["wrong", "s3cre", None])
+def test_bad_secret_is_refused(application, secret):
+    assert post(UPDATE, secret).status_code == 403
+    assert application.update_queue.empty()
+
+
+def test_valid_update_is_queued(application):
+    response = post(UPDATE, "s3cret")
+    assert response.status_code == 200
+    update = application.update_queue.get_nowait()
+    assert update.update_id == 7
+    assert update.message.text == "Is this true?"
+    assert update.effective_chat.id == 42
+
+
+def test_webhook_is_404_when_the_bot_is_not_running(monkeypatch):
+    monkeypatch.setattr(telegram_webhook, "_application", None)
+    assert post(UPDATE, telegram_webhook.TELEGRAM_WEBHOOK_SECRET).status_code == 404
+
+
+def test_stop_without_start_is_a_no_op(monkeypatch):
+    monkeypatch.setattr(telegram_webhook, "_application", None)
+    monkeypatch.setattr(telegram_webhook, "TELEGRAM_WEBHOOK_URL", None)
+    asyncio.run(telegram_webhook.start())
+    asyncio.run(telegram_webhook.stop())
+    assert not telegram_webhook.is_running()
+    assert telegram_webhook.stats() == {"enabled": False, "running": False}
+
+
+def test_stop_shuts_the_application_down_once(application):
+    asyncio.run(telegram_webhook.stop())
+    asyncio.run(telegram_webhook.stop())
+    assert application.calls == ["stop", "shutdown"]
+    assert not telegram_webhook.is_running()
@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import pytest
+
+import sarvam
+import server
+import translation_memory
+from cache import TieredCache
+from server import NewsAnalysisRequest
+
+RESULT = {"verdict": "Fake", "confidence": 0.9, "reason": "PIB denied the notice.", "sources": {}}
+
+
+@pytest.fixture
+def api_calls(monkeypatch):
+    """Stub Sarvam translate and give the translation memory a fresh, memory-only store."""
+    calls = []
+
+    async def translate(text, target_lang, timeout=None):
+        calls.append((text, target_lang))
+        return f"<{target_lang}> {text}"
+
+    monkeypatch.setattr(sarvam, "translate", translate)
+    monkeypatch.setattr(sarvam, "SARVAM_API_KEY", "test-key")
+    monkeypatch.setattr(translation_memory, "memory", TieredCache(memory_size=1024, path=None, table="translations", enabled=True))
+    return calls
+
+
+def test_prewarm_translates_every_ui_string_once(api_calls):
+    warmed = asyncio.run(translation_memory.prewarm(languages=["hi-IN", "ta-IN"]))
+    assert warmed == len(api_calls) == 2 * len(translation_memory.UI_STRINGS)
+    assert ("Sources:", "ta-IN") in api_calls
+
+
+def test_ui_strings_are_served_from_memory(api_calls):
+    async def main():
+        await translation_memory.prewarm(languages=["hi-IN"])
+        api_calls.clear()
+        return [await translation_memory.ui_text(text, "hi-IN") for text in translation_memory.UI_STRINGS]
+
+    labels = asyncio.run(main())
+    assert labels == [f"<hi-IN> {text}" for text in translation_memory.UI_STRINGS]
+    assert api_calls == []
+    assert translation_memory.memory.memory_hits == len(translation_memory.UI_STRINGS)
+
+
+def test_ui_text_falls_back_to_english(api_calls, monkeypatch):
+    async def broken(text, target_lang, timeout=None):
+        raise RuntimeError("Sarvam is down")
+
+    monkeypatch.setattr(sarvam, "translate", broken)
+    assert asyncio.run(translation_memory.ui_text("Verdict:", "hi-IN")) == "Verdict:"
+    assert asyncio.run(translation_memory.ui_text("Verdict:", "en-IN")) == "Verdict:"
+
+
+def test_only_the_reason_reaches_the_api(api_calls, monkeypatch):
+    async def detect_language(text):
+        return "hi-IN"
+
+    async def create_news_input_async(news_text="", image_source=None):
+        return news_text
+
+    async def analyze_news_async(news_input, user=None):
+        return json.dumps(RESULT)
+
+    async def validate_result(result, claim):
+        return result
+
+    monkeypatch.setattr(server, "detect_language", detect_language)
+    monkeypatch.setattr(server, "create_news_input_async", create_news_input_async)
+    monkeypatch.setattr(server, "analyze_news_async", analyze_news_async)
+    monkeypatch.setattr(server.link_checker, "validate_result", validate_result)
+    monkeypatch.setattr(server.verdict_store, "record", lambda *args, **kwargs: None)
+
+    async def main():
+        await translation_memory.prewarm(languages=["hi-IN"])
+        api_calls.clear()
+        return await server.run_analysis(NewsAnalysisRequest(text="क्या यह नोटिस सच है?"))
+
+    result = asyncio.run(main())
+    assert api_calls == [(RESULT["reason"], "hi-IN")]
+    assert result["verdict"] == "<hi-IN> Fake"
+    assert result["reason"] == f"<hi-IN> {RESULT['reason']}"
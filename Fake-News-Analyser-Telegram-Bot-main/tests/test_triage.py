@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from triage import NON_CLAIM_REASON, KNOWN_PREFIX, Triage, is_non_claim_reply, train, word_similarity
+
+RBI = "The Reserve Bank of India has announced that 2000 rupee notes will remain legal tender until March next year"
+
+
+class FakeStore:
+    """Stands in for VerdictStore.search with a fixed list of stored analyses."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def search(self, query, page_size=20, verdict=None, match_any=False, **kwargs):
+        return {"results": [row for row in self.rows if verdict is None or row["verdict"] == verdict][:page_size]}
+
+
+def stored(text, verdict="Fake", reason="The RBI made no such announcement."):
+    return {"input_text": text, "verdict": verdict, "confidence": 0.9, "reason": reason, "sources": {}}
+
+
+@pytest.fixture(scope="module")
+def model():
+    claims = [RBI, "Government announces free laptops for every student who fills this form",
+              "Drinking hot water every hour kills the virus in the throat"]
+    return train([(text, "Fake") for text in claims] * 5 + [("Good morning friends", "non_claim")] * 5)
+
+
+def make_triage(model, rows):
+    triage = Triage(path=None, store=FakeStore(rows), known_threshold=0.0)
+    triage.model, triage._loaded = model, True
+    return triage
+
+
+def test_known_route_reuses_near_duplicate(model):
+    triage = make_triage(model, [stored(RBI)])
+    route, match = triage.classify(f"Forwarded as received: {RBI}")
+    assert route == "known" and match["input_text"] == RBI
+    reply = json.loads(triage.respond(RBI))
+    assert reply["verdict"] == "Fake" and reply["reason"].startswith(KNOWN_PREFIX)
+
+
+@pytest.mark.parametrize("text", [
+    RBI.replace("has announced", "has not announced"),
+    RBI.replace("has announced", "hasn't announced"),
+    RBI.replace("2000", "500"),
+    RBI.replace("March", "April"),
+])
+def test_known_route_rejects_changed_meaning(model, text):
+    # Word overlap alone would call these the same message
+    assert word_similarity(text, RBI) >= 0.8
+    triage = make_triage(model, [stored(RBI)])
+    assert triage.classify(text) == ("escalate", None)
+
+
+def test_known_route_skips_reused_analyses(model):
+    triage = make_triage(model, [stored(RBI, reason=KNOWN_PREFIX + "Earlier reply.")])
+    assert triage.classify(RBI) == ("escalate", None)
+
+
+def test_non_claim_reply_is_not_an_analysis(model):
+    triage = make_triage(model, [])
+    assert triage.classify("Good morning friends") == ("non_claim", None)
+    reply = json.loads(triage.respond("Good morning friends"))
+    assert reply["reason"] == NON_CLAIM_REASON
+    assert is_non_claim_reply(reply)
+    assert not is_non_claim_reply(stored(RBI))
+    assert not is_non_claim_reply(None)
+
+
+def test_short_claim_is_not_chit_chat(model):
+    triage = make_triage(model, [])
+    assert triage.classify("Good morning, exams cancelled")[0] != "non_claim"
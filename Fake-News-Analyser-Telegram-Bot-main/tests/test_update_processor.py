@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+
+from update_processor import ChatOrderedUpdateProcessor
+
+
+def update(chat_id):
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id) if chat_id is not None else None)
+
+
+def test_orders_within_chat_and_overlaps_chats():
+    processor = ChatOrderedUpdateProcessor(4)
+    log, running, peak = [], [0], [0]
+
+    async def handle(chat, seq):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01 * (3 - seq))  # later messages finish faster
+        running[0] -= 1
+        log.append((chat, seq))
+
+    async def main():
+        await asyncio.gather(*(processor.process_update(update(chat), handle(chat, seq))
+                               for seq in range(3) for chat in (1, 2, 3)))
+
+    asyncio.run(main())
+    for chat in (1, 2, 3):
+        assert [seq for c, seq in log if c == chat] == [0, 1, 2]
+    assert peak[0] == 3
+    assert processor.stats()["processed"] == 9
+    assert processor.stats()["active_chats"] == 0
+
+
+def test_backlogged_chat_holds_one_slot():
+    processor = ChatOrderedUpdateProcessor(2)
+    done = []
+
+    async def handle(name, seconds):
+        await asyncio.sleep(seconds)
+        done.append(name)
+
+    async def main():
+        busy = [processor.process_update(update(1), handle(f"busy{i}", 0.05)) for i in range(4)]
+        other = processor.process_update(update(2), handle("other", 0.01))
+        await asyncio.gather(*busy, other)
+
+    asyncio.run(main())
+    # The other chat runs beside the backlog instead of waiting behind it
+    assert done[0] == "other"
+    assert processor.stats()["max_chat_backlog"] == 4
+
+
+def test_single_slot_admits_one_update():
+    processor = ChatOrderedUpdateProcessor(1)
+    assert processor.max_concurrent_updates == 1
+    assert ChatOrderedUpdateProcessor(8).max_concurrent_updates > 8
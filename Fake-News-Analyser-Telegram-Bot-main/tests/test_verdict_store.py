@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+
+import pytest
+
+from verdict_store import VerdictStore
+
+RESULT = {"verdict": "Fake", "confidence": 0.9, "reason": "No such notification was issued.", "sources": {}}
+
+
+def make_store(tmp_path):
+    return VerdictStore(path=str(tmp_path / "verdict_store.db"), flush_interval=0.01, enabled=True)
+
+
+def test_records_and_searches(tmp_path):
+    store = make_store(tmp_path)
+    store.record("Schools closed in Delhi tomorrow", RESULT)
+    store.close()
+    reader = make_store(tmp_path)
+    results = reader.search("schools delhi")["results"]
+    assert [row["input_text"] for row in results] == ["Schools closed in Delhi tomorrow"]
+    assert results[0]["verdict"] == "Fake"
+    reader.close()
+
+
+def test_record_after_close_is_dropped(tmp_path):
+    store = make_store(tmp_path)
+    store.record("Schools closed in Delhi tomorrow", RESULT)
+    store.close()
+    store.record("Petrol free for a week", RESULT)
+    assert store.stats()["written"] == 1
+    assert store.stats()["dropped_after_close"] == 1
+    assert store.stats()["queued"] == 0
+    assert store.search("petrol")["results"] == []
+
+
+def test_close_closes_read_connections(tmp_path):
+    store = make_store(tmp_path)
+    store.record("Schools closed in Delhi tomorrow", RESULT)
+    store.search("schools")
+    thread = threading.Thread(target=store.search, args=("delhi",))
+    thread.start()
+    thread.join()
+    readers = list(store._readers)
+    assert len(readers) == 2
+    store.close()
+    assert store._readers == []
+    for conn in readers:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
@@ -0,0 +1,126 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+from warmup import Startup
+
+
+def flaky(failures):
+    """Warm-up callable that raises `failures` times, then succeeds."""
+    calls = []
+
+    async def warm():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise ConnectionError("connection refused")
+
+    return warm, calls
+
+
+async def settle(startup):
+    await asyncio.gather(*startup._tasks)
+
+
+def test_required_component_is_retried_until_warm():
+    startup = Startup(required=["gemini"], retry_seconds=0.01, enabled=True)
+    attempt, calls = flaky(2)
+    seen = []
+
+    async def warm():
+        seen.append((startup.components["gemini"]["state"], startup.is_ready()))
+        await attempt()
+
+    async def main():
+        startup.start("gemini", warm)
+        await settle(startup)
+
+    asyncio.run(main())
+    assert len(calls) == 3
+    assert seen == [("pending", False), ("failed", False), ("failed", False)]
+    component = startup.components["gemini"]
+    assert component["state"] == "warm" and component["attempts"] == 3 and component["error"] is None
+    assert startup.is_ready() and startup.ready_after is not None
+
+
+def test_optional_component_fails_once_without_blocking_ready():
+    startup = Startup(required=["gemini"], retry_seconds=0.01, enabled=True)
+    warm, _ = flaky(0)
+    broken, broken_calls = flaky(5)
+
+    async def main():
+        startup.start("gemini", warm)
+        startup.start("sarvam", broken)
+        await settle(startup)
+
+    asyncio.run(main())
+    assert len(broken_calls) == 1
+    assert startup.components["sarvam"]["state"] == "failed"
+    assert startup.components["sarvam"]["error"] == "ConnectionError: connection refused"
+    assert startup.is_ready()
+
+
+def test_slow_attempt_times_out():
+    startup = Startup(required=[], enabled=True)
+
+    async def main():
+        startup.start("claim_index", lambda: asyncio.sleep(1), timeout=0.01)
+        await settle(startup)
+
+    asyncio.run(main())
+    assert startup.components["claim_index"]["state"] == "failed"
+    assert startup.components["claim_index"]["error"] == "TimeoutError"
+
+
+def test_disabled_warmup_is_ready_at_once():
+    startup = Startup(required=["gemini"], enabled=False)
+
+    async def main():
+        startup.start("gemini", flaky(0)[0])
+
+    asyncio.run(main())
+    assert startup.components["gemini"]["state"] == "skipped"
+    assert startup.is_ready()
+
+
+@pytest.fixture
+def fresh_startup(monkeypatch):
+    """Reset the server's shared Startup; the middleware holds a reference to that same object."""
+    for name, value in [("required", {"gemini"}), ("enabled", True), ("components", {}), ("_tasks", []),
+                        ("started_at", None), ("ready_after", None), ("first_request", None), ("cold_requests", 0)]:
+        monkeypatch.setattr(server.startup, name, value)
+    return server.startup
+
+
+def test_ready_flips_after_warmup_and_cold_requests_are_counted(fresh_startup):
+    async def main():
+        gate = asyncio.Event()
+
+        async def warm():
+            await gate.wait()
+
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            before = await client.get("/ready")
+            fresh_startup.start("gemini", warm)
+            pending = await client.get("/ready")
+            cold = await client.post("/api/analyze", json={})
+            gate.set()
+            await settle(fresh_startup)
+            ready = await client.get("/ready")
+            warm_request = await client.post("/api/analyze", json={})
+        return before, pending, cold, ready, warm_request
+
+    before, pending, cold, ready, warm_request = asyncio.run(main())
+    assert before.status_code == 503
+    assert pending.status_code == 503
+    assert pending.json()["components"]["gemini"]["state"] == "pending"
+    assert cold.status_code == warm_request.status_code == 400
+    assert ready.status_code == 200
+    assert ready.json()["components"]["gemini"]["state"] == "warm"
+
+    # Only the /api/ request served before warm-up counts; /ready itself is not tracked
+    stats = fresh_startup.stats()
+    assert stats["cold_requests"] == 1
+    assert stats["first_request"]["path"] == "/api/analyze"
@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import logging
+import os
+
+import metrics
+import sarvam
+from cache import TieredCache, CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Translation memory configuration
+TRANSLATION_MEMORY_ENABLED = os.getenv("TRANSLATION_MEMORY_ENABLED", "1") != "0"
+TRANSLATION_MEMORY_PATH = os.getenv("TRANSLATION_MEMORY_PATH", CACHE_PATH)
+TRANSLATION_MEMORY_TTL = int(os.getenv("TRANSLATION_MEMORY_TTL", 90 * 24 * 3600))  # seconds
+TRANSLATION_MEMORY_SIZE = int(os.getenv("TRANSLATION_MEMORY_SIZE", 4096))
+PREWARM_CONCURRENCY = int(os.getenv("TRANSLATION_PREWARM_CONCURRENCY", 4))
+
+# Indic languages supported by Sarvam translate
+SUPPORTED_LANGUAGES = [
+    "hi-IN", "bn-IN", "gu-IN", "kn-IN", "ml-IN",
+    "mr-IN", "od-IN", "pa-IN", "ta-IN", "te-IN",
+]
+
+# Fixed strings used when formatting replies; pre-translated at startup
+UI_STRINGS = [
+    "Analysis Result:",
+    "Verdict:",
+    "Confidence:",
+    "Reason:",
+    "Sources:",
+    "Real",
+    "Fake",
+    "Uncertain",
+    "Unknown",
+]
+
+memory = TieredCache(
+    memory_size=TRANSLATION_MEMORY_SIZE,
+    path=TRANSLATION_MEMORY_PATH,
+    table="translations",
+    ttl=TRANSLATION_MEMORY_TTL,
+    enabled=TRANSLATION_MEMORY_ENABLED,
+)
+
+
+def is_english(target_lang):
+    return not target_lang or target_lang.split("-")[0] == "en"
+
+
+def memory_key(text, target_lang):
+    return f"{hashlib.sha256(text.encode('utf-8')).hexdigest()}:{target_lang}"
+
+
+async def translate(text, target_lang):
+    """
+    Translate text, answering from the translation memory when possible.
+
+    Raises the same errors as sarvam.translate on a memory miss.
+    """
+    if not text or is_english(target_lang):
+        return text
+    key = memory_key(text, target_lang)
+    translated = await asyncio.to_thread(memory.get, key)
+    if translated is not None:
+        return translated
+    # Only API translations are timed, so memory hits don't drag the stage latency down
+    with metrics.STAGE_SECONDS.time("translation"):
+        translated = await sarvam.translate(text, target_lang)
+    await asyncio.to_thread(memory.set, key, translated, text)
+    return translated
+
+
+async def ui_text(text, target_lang):
+    """
+    Translation of a fixed UI string, falling back to English.
+
+    Served from memory once prewarm() has run; otherwise translated on demand.
+    """
+    try:
+        return await translate(text, target_lang)
+    except Exception as e:
+        logger.error(f"Could not translate UI string {text!r} to {target_lang}: {e}")
+        return text
+
+
+async def prewarm(languages=SUPPORTED_LANGUAGES, strings=UI_STRINGS):
+    """Pre-translate the UI strings into every supported language."""
+    if not sarvam.SARVAM_API_KEY:
+        logger.warning("SARVAM_API_KEY not set; skipping translation prewarm")
+        return 0
+    semaphore = asyncio.Semaphore(PREWARM_CONCURRENCY)
+    failures = 0
+
+    async def warm(text, target_lang):
+        nonlocal failures
+        async with semaphore:
+            try:
+                await translate(text, target_lang)
+            except Exception as e:
+                failures += 1
+                logger.warning(f"Prewarm failed for {text!r} ({target_lang}): {e}")
+
+    await asyncio.gather(*(warm(text, lang) for lang in languages for text in strings))
+    total = len(languages) * len(strings)
+    logger.info(f"Translation memory prewarmed: {total - failures}/{total} UI strings")
+    return total - failures
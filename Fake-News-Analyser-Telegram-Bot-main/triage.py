@@ -0,0 +1,418 @@
+"""
+Local triage in front of Gemini.
+
+A hashed n-gram softmax classifier, trained from the verdict store, sorts
+incoming text into non-claims (greetings, thanks, chit-chat), claims it has
+seen many times with a settled verdict, and everything else. Non-claims get a
+canned reply, confident known claims get the stored analysis of their closest
+match, and the rest go to Gemini as before.
+
+Retrain from the verdict store and check a message:
+
+    python triage.py train --store verdict_store.db --out triage_model.bin
+    python triage.py check "Good morning everyone"
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from array import array
+
+import metrics
+from cache import canonicalize_claim
+from claim_index import FORWARD_BOILERPLATE, meaning_differs
+from verdict_store import verdict_store, VERDICT_STORE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Triage configuration
+TRIAGE_ENABLED = os.getenv("TRIAGE_ENABLED", "1") != "0"
+TRIAGE_MODEL_PATH = os.getenv("TRIAGE_MODEL_PATH", "triage_model.bin")
+TRIAGE_NON_CLAIM_THRESHOLD = float(os.getenv("TRIAGE_NON_CLAIM_THRESHOLD", 0.9))
+TRIAGE_KNOWN_THRESHOLD = float(os.getenv("TRIAGE_KNOWN_THRESHOLD", 0.95))
+TRIAGE_KNOWN_MIN_SIMILARITY = float(os.getenv("TRIAGE_KNOWN_MIN_SIMILARITY", 0.8))
+TRIAGE_MAX_CHARS = 1000  # longer messages are classified on their start
+KNOWN_CANDIDATES = 5
+
+CLASSES = ("non_claim", "Fake", "Real", "Uncertain")
+KNOWN_CLASSES = ("Fake", "Real")
+DEFAULT_BITS = 18
+MODEL_FORMAT = "fakenews-triage/1"
+
+NON_CLAIM_REASON = (
+    "This message does not look like a claim to fact-check. "
+    "Send a news article, a forwarded message or a screenshot to verify it."
+)
+# Marks reused analyses, so retraining does not learn from its own answers
+KNOWN_PREFIX = "This matches a message checked earlier. "
+
+# Seed non-claims; `triage.py train --non-claims` adds more
+NON_CLAIM_SEEDS = [
+    "hi", "hello", "hey", "hii", "hello bot", "hi there", "good morning", "good morning everyone",
+    "good night", "good evening", "good afternoon", "have a nice day", "thanks", "thank you",
+    "thank you so much", "thanks a lot", "ok", "okay", "ok thanks", "nice", "great", "cool",
+    "yes", "no", "bye", "see you", "how are you", "who are you", "what can you do", "help",
+    "test", "testing", "are you there", "lol", "happy birthday", "happy diwali",
+    "happy new year", "eid mubarak", "merry christmas", "jai shri ram", "jai hind",
+    "namaste", "namaskar", "ram ram", "radhe radhe", "sat sri akal", "vanakkam",
+    "suprabhat", "shubh prabhat", "shubh ratri", "dhanyavad", "shukriya", "kaise ho",
+    "kya haal hai", "theek hai", "accha", "haan", "nahi", "नमस्ते", "सुप्रभात", "शुभ रात्रि",
+    "धन्यवाद", "शुक्रिया", "कैसे हो", "ठीक है", "राम राम", "வணக்கம்", "நன்றி", "নমস্কার",
+    "ধন্যবাদ", "శుభోదయం", "ధన్యవాదాలు", "gm", "gn", "ty", "thank u", "thanks dear", "thank you ji",
+    "thanks bro", "ok ji", "hello everyone", "hi all", "hello friends", "good morning all",
+    "good morning to all of you", "good night friends", "good night all", "sweet dreams",
+    "have a great day", "have a good weekend", "happy weekend", "happy holi", "happy sunday",
+    "how are you doing", "hello dear", "hi friends", "wow", "nice one", "very nice", "super",
+    "welcome", "hmm", "okk", "bhai", "yes please", "no thanks",
+]
+
+WORD = re.compile(r"\w+")
+# Any letter or digit; messages without one (emoji, stickers as text) are not claims
+HAS_TEXT = re.compile(r"[^\W_]")
+
+
+def message_words(text):
+    """Words of the canonical text with forward boilerplate removed."""
+    return WORD.findall(FORWARD_BOILERPLATE.sub(" ", canonicalize_claim(text)))
+
+
+def features(text, bits=DEFAULT_BITS):
+    """
+    Hashed, L2-normalized features of a message.
+
+    Words, word pairs and character 4-grams of the canonical text (forward
+    boilerplate removed) plus a length bucket, hashed into 2**bits slots with
+    a sign bit so collisions tend to cancel out.
+
+    Returns:
+        list: (slot, value) pairs.
+    """
+    words = message_words(text[:TRIAGE_MAX_CHARS])
+    joined = f" {' '.join(words)} "
+    grams = [f"w {word}" for word in words]
+    grams += [f"b {a} {b}" for a, b in zip(words, words[1:])]
+    grams += [f"c {joined[i:i + 4]}" for i in range(len(joined) - 3)]
+    grams.append(f"n {min(len(words), 12)}")
+
+    mask = (1 << bits) - 1
+    counts = {}
+    for gram in grams:
+        h = zlib.crc32(gram.encode("utf-8"))
+        slot = h & mask
+        counts[slot] = counts.get(slot, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+    norm = math.sqrt(sum(value * value for value in counts.values())) or 1.0
+    return [(slot, value / norm) for slot, value in counts.items() if value]
+
+
+def softmax(scores):
+    top = max(scores)
+    exps = [math.exp(score - top) for score in scores]
+    total = sum(exps)
+    return [value / total for value in exps]
+
+
+def is_non_claim_reply(result):
+    """True for the canned non-claim reply, which is not an analysis and must not be stored."""
+    return bool(result) and result.get("reason") == NON_CLAIM_REASON
+
+
+def word_similarity(a, b):
+    """Jaccard similarity of the canonical word sets of two messages."""
+    words_a, words_b = set(message_words(a)), set(message_words(b))
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+class TriageModel:
+    """
+    Linear softmax classifier over hashed features.
+
+    Weights are one flat float32 array laid out slot by slot, one weight per
+    class, followed by a bias per class. Saved as a JSON header line and the
+    raw array, so loading is a single read. The header also lists every
+    word seen in non-claim examples.
+    """
+
+    def __init__(self, weights=None, bits=DEFAULT_BITS, classes=CLASSES, info=None):
+        self.bits = bits
+        self.classes = tuple(classes)
+        size = ((1 << bits) + 1) * len(self.classes)
+        self.weights = weights if weights is not None else array("f", bytes(4 * size))
+        self.info = info or {}
+        self.non_claim_words = frozenset(self.info.get("non_claim_words", ()))
+
+    def scores(self, feats):
+        k = len(self.classes)
+        weights = self.weights
+        bias = (1 << self.bits) * k
+        scores = [weights[bias + c] for c in range(k)]
+        for slot, value in feats:
+            base = slot * k
+            for c in range(k):
+                scores[c] += weights[base + c] * value
+        return scores
+
+    def predict(self, text):
+        """Class probabilities for a message, as a dict."""
+        return dict(zip(self.classes, softmax(self.scores(features(text, self.bits)))))
+
+    def update(self, feats, label, learning_rate, weight=1.0):
+        """One SGD step of the cross-entropy loss on a single example."""
+        k = len(self.classes)
+        probs = softmax(self.scores(feats))
+        target = self.classes.index(label)
+        gradient = [(p - (c == target)) * learning_rate * weight for c, p in enumerate(probs)]
+        weights = self.weights
+        for slot, value in feats:
+            base = slot * k
+            for c in range(k):
+                weights[base + c] -= gradient[c] * value
+        bias = (1 << self.bits) * k
+        for c in range(k):
+            weights[bias + c] -= gradient[c]
+
+    def save(self, path):
+        header = {"format": MODEL_FORMAT, "bits": self.bits, "classes": self.classes, **self.info}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            self.weights.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            if header.pop("format", None) != MODEL_FORMAT:
+                raise ValueError(f"{path} is not a triage model")
+            bits, classes = header.pop("bits"), header.pop("classes")
+            weights = array("f")
+            weights.frombytes(f.read())
+        model = cls(weights, bits, classes, header)
+        if len(weights) != ((1 << bits) + 1) * len(model.classes):
+            raise ValueError(f"{path} is truncated")
+        return model
+
+
+def training_examples(store_path=VERDICT_STORE_PATH, max_rows=200_000, non_claims=()):
+    """
+    Labelled text-only examples from the verdict store, plus non-claim seeds.
+
+    Analyses reused by triage itself are skipped, as are canned non-claim
+    replies from stores written before those stopped being recorded.
+
+    Returns:
+        list: (text, label) pairs.
+    """
+    examples = [(text, "non_claim") for text in NON_CLAIM_SEEDS + list(non_claims)]
+    conn = sqlite3.connect(store_path)
+    try:
+        rows = conn.execute(
+            "SELECT input_text, verdict, reason FROM analyses WHERE image IS NULL AND input_text != '' "
+            "ORDER BY updated_at DESC LIMIT ?",
+            (max_rows,),
+        ).fetchall()
+    finally:
+        conn.close()
+    for text, verdict, reason in rows:
+        if reason != NON_CLAIM_REASON and not reason.startswith(KNOWN_PREFIX) and verdict in CLASSES:
+            examples.append((text, verdict))
+    return examples
+
+
+def train(examples, bits=DEFAULT_BITS, epochs=5, learning_rate=0.5, seed=0):
+    """
+    Fit a TriageModel with SGD, weighting classes by inverse frequency.
+
+    Args:
+        examples (list): (text, label) pairs.
+
+    Returns:
+        TriageModel: The trained model.
+    """
+    model = TriageModel(bits=bits)
+    labelled = [(features(text, bits), label) for text, label in examples if label in model.classes]
+    counts = {label: 0 for label in model.classes}
+    for _, label in labelled:
+        counts[label] += 1
+    present = [label for label, count in counts.items() if count]
+    # Balanced weights, capped so a handful of seeds cannot dominate
+    class_weight = {label: min(20.0, len(labelled) / (len(present) * count))
+                    for label, count in counts.items() if count}
+    rng = random.Random(seed)
+    for epoch in range(epochs):
+        rng.shuffle(labelled)
+        rate = learning_rate / (1 + epoch)
+        for feats, label in labelled:
+            model.update(feats, label, rate, class_weight[label])
+    non_claim_words = {word for text, label in examples if label == "non_claim" for word in message_words(text)}
+    model.info = {"examples": counts, "trained_at": int(time.time()), "epochs": epochs,
+                  "non_claim_words": sorted(non_claim_words)}
+    model.non_claim_words = frozenset(non_claim_words)
+    return model
+
+
+class Triage:
+    """
+    Routes a text message to "non_claim", "known" or "escalate".
+
+    The model is loaded from `path` on first use; without one every message
+    escalates. A non-claim route also needs every word of the message to
+    appear in the non-claim training examples, so short claims ("Exams
+    cancelled") are not mistaken for chit-chat. A known route also needs a
+    stored analysis with the predicted verdict whose words overlap the
+    message by at least `min_similarity` and that has the same negations,
+    numbers and dates: the classifier and the word overlap both score "has
+    not announced" almost like "has announced".
+    """
+
+    def __init__(self, path=TRIAGE_MODEL_PATH, store=verdict_store, enabled=TRIAGE_ENABLED,
+                 non_claim_threshold=TRIAGE_NON_CLAIM_THRESHOLD, known_threshold=TRIAGE_KNOWN_THRESHOLD,
+                 min_similarity=TRIAGE_KNOWN_MIN_SIMILARITY):
+        self.path = path
+        self.store = store
+        self.enabled = enabled
+        self.non_claim_threshold = non_claim_threshold
+        self.known_threshold = known_threshold
+        self.min_similarity = min_similarity
+        self.model = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.routes = {"non_claim": 0, "known": 0, "escalate": 0}
+        self.seconds = 0.0
+
+    def load(self):
+        """Load the model file once; returns the model or None."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    if self.enabled and self.path and os.path.exists(self.path):
+                        try:
+                            self.model = TriageModel.load(self.path)
+                            logger.info(f"Loaded triage model {self.path} ({self.model.info.get('examples')})")
+                        except (OSError, ValueError, KeyError) as e:
+                            logger.error(f"Triage model unavailable, escalating every message: {e}")
+                    self._loaded = True
+        return self.model
+
+    def classify(self, text):
+        """
+        Route a message without side effects.
+
+        Returns:
+            tuple: (route, stored analysis dict for "known" routes or None)
+        """
+        if not HAS_TEXT.search(text):
+            return "non_claim", None
+        model = self.load()
+        if model is None:
+            return "escalate", None
+        probs = model.predict(text)
+        label = max(probs, key=probs.get)
+        if label == "non_claim" and probs[label] >= self.non_claim_threshold:
+            if set(message_words(text)) <= model.non_claim_words:
+                return "non_claim", None
+            return "escalate", None
+        if label in KNOWN_CLASSES and probs[label] >= self.known_threshold:
+            candidates = self.store.search(text, page_size=KNOWN_CANDIDATES, verdict=label, match_any=True)
+            best, best_similarity = None, self.min_similarity
+            for row in candidates["results"]:
+                if row["reason"].startswith(KNOWN_PREFIX) or meaning_differs(text, row["input_text"]):
+                    continue
+                similarity = word_similarity(text, row["input_text"])
+                if similarity >= best_similarity:
+                    best, best_similarity = row, similarity
+            if best is not None:
+                return "known", best
+        return "escalate", None
+
+    def respond(self, text):
+        """
+        Answer a text message locally when triage is confident.
+
+        Returns:
+            str or None: A response in Gemini's JSON format, or None to ask Gemini.
+        """
+        if not self.enabled or not text:
+            return None
+        start = time.perf_counter()
+        with metrics.STAGE_SECONDS.time("triage"):
+            route, match = self.classify(text)
+        self.seconds += time.perf_counter() - start
+        self.routes[route] += 1
+        metrics.TRIAGE_ROUTES.inc(route)
+        if route == "non_claim":
+            return json.dumps({"verdict": "Uncertain", "confidence": 0.0, "reason": NON_CLAIM_REASON, "sources": {}})
+        if route == "known":
+            return json.dumps({
+                "verdict": match["verdict"],
+                "confidence": match["confidence"],
+                "reason": KNOWN_PREFIX + match["reason"],
+                "sources": match["sources"],
+            }, ensure_ascii=False)
+        return None
+
+    def stats(self):
+        decisions = sum(self.routes.values())
+        return {
+            "enabled": self.enabled,
+            "model_loaded": self.model is not None,
+            "model": ({key: value for key, value in self.model.info.items() if key != "non_claim_words"}
+                      if self.model is not None else None),
+            **self.routes,
+            "answered_locally": round((decisions - self.routes["escalate"]) / decisions, 4) if decisions else 0.0,
+            "avg_ms": round(self.seconds * 1000 / decisions, 3) if decisions else 0.0,
+        }
+
+
+# Shared triage for analyse.py
+triage = Triage()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or try the local triage classifier")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_parser = commands.add_parser("train", help="retrain from the verdict store")
+    train_parser.add_argument("--store", default=VERDICT_STORE_PATH)
+    train_parser.add_argument("--out", default=TRIAGE_MODEL_PATH)
+    train_parser.add_argument("--non-claims", help="file with extra non-claim messages, one per line")
+    train_parser.add_argument("--max-rows", type=int, default=200_000, help="newest stored analyses to use")
+    train_parser.add_argument("--bits", type=int, default=DEFAULT_BITS, help="log2 of the hashed feature slots")
+    train_parser.add_argument("--epochs", type=int, default=5)
+    check_parser = commands.add_parser("check", help="print class probabilities and the route for a message")
+    check_parser.add_argument("text")
+    check_parser.add_argument("--model", default=TRIAGE_MODEL_PATH)
+    args = parser.parse_args()
+
+    if args.command == "train":
+        non_claims = []
+        if args.non_claims:
+            with open(args.non_claims, encoding="utf-8") as f:
+                non_claims = [line.strip() for line in f if line.strip()]
+        examples = training_examples(args.store, args.max_rows, non_claims)
+        start = time.perf_counter()
+        model = train(examples, bits=args.bits, epochs=args.epochs)
+        model.save(args.out)
+        print(f"Trained on {model.info['examples']} in {time.perf_counter() - start:.1f}s, "
+              f"saved {os.path.getsize(args.out) / 1e6:.1f} MB to {args.out}")
+    else:
+        checker = Triage(path=args.model, enabled=True)
+        if checker.load() is None:
+            sys.exit(f"No triage model at {args.model}")
+        probs = checker.model.predict(args.text)
+        print(json.dumps({label: round(p, 4) for label, p in probs.items()}))
+        route, match = checker.classify(args.text)
+        print(f"route: {route}" + (f" (stored analysis {match['id']}: {match['input_text']!r})" if match else ""))
+
+
+if __name__ == "__main__":
+    main()
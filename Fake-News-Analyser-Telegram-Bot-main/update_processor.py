@@ -0,0 +1,87 @@
+import asyncio
+import logging
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+def chat_key(update):
+    """Chat an update belongs to, or None for updates without one (e.g. inline queries)."""
+    chat = getattr(update, "effective_chat", None)
+    return chat.id if chat is not None else None
+
+
+# Updates admitted per running slot; the rest wait on PTB's semaphore
+PENDING_PER_SLOT = 8
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Process updates concurrently across chats but in order within a chat.
+
+    Each chat has a FIFO lock, taken before one of the max_concurrent_updates
+    running slots, so a chat with a backlog holds at most one slot and cannot
+    starve other chats. Updates without a chat run without ordering.
+
+    PTB's own semaphore, taken before do_process_update, only bounds the
+    updates admitted (running or waiting for their chat) at `max_pending`.
+    With a single slot nothing is admitted ahead, so PTB handles updates one
+    at a time as it does by default.
+    """
+
+    __slots__ = ("_chats", "_slots", "running", "processed", "max_chat_backlog")
+
+    def __init__(self, max_concurrent_updates, max_pending=None):
+        if max_pending is None:
+            max_pending = max_concurrent_updates * PENDING_PER_SLOT if max_concurrent_updates > 1 else 1
+        super().__init__(max_pending)
+        self._chats = {}  # chat id -> [lock, updates waiting or running]
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self.running = 0
+        self.processed = 0
+        self.max_chat_backlog = 0
+
+    async def _run(self, coroutine):
+        async with self._slots:
+            self.running += 1
+            try:
+                await coroutine
+            finally:
+                self.running -= 1
+        self.processed += 1
+
+    async def do_process_update(self, update, coroutine):
+        key = chat_key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+
+        entry = self._chats.get(key)
+        if entry is None:
+            entry = self._chats[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        self.max_chat_backlog = max(self.max_chat_backlog, entry[1])
+        try:
+            # asyncio.Lock wakes waiters first come, first served
+            async with entry[0]:
+                await self._run(coroutine)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chats[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def stats(self):
+        return {
+            "processed": self.processed,
+            "running": self.running,
+            "admitted": self.current_concurrent_updates,
+            "active_chats": len(self._chats),
+            "max_chat_backlog": self.max_chat_backlog,
+        }
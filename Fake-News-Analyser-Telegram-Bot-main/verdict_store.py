@@ -0,0 +1,360 @@
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+from cache import LRUCache, make_key, canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+# Verdict store configuration
+VERDICT_STORE_ENABLED = os.getenv("VERDICT_STORE_ENABLED", "1") != "0"
+VERDICT_STORE_PATH = os.getenv("VERDICT_STORE_PATH", "verdict_store.db")
+VERDICT_STORE_BATCH_SIZE = int(os.getenv("VERDICT_STORE_BATCH_SIZE", 256))
+VERDICT_STORE_FLUSH_INTERVAL = float(os.getenv("VERDICT_STORE_FLUSH_INTERVAL", 1.0))  # seconds
+VERDICT_STORE_QUEUE_SIZE = int(os.getenv("VERDICT_STORE_QUEUE_SIZE", 10000))
+# BM25 costs time per matching row, so words in more rows than this rank like stop words
+VERDICT_STORE_RANK_MAX_MATCHES = int(os.getenv("VERDICT_STORE_RANK_MAX_MATCHES", 10000))
+SEARCH_MAX_PAGE_SIZE = 50
+SEARCH_MAX_TERMS = 16
+
+# Words in a search query; everything else (FTS5 operators, quotes) is dropped
+SEARCH_TERM = re.compile(r"\w+", re.UNICODE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    input_hash TEXT NOT NULL UNIQUE,
+    input_text TEXT NOT NULL,
+    image TEXT,
+    verdict TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    reason TEXT NOT NULL,
+    sources TEXT NOT NULL,
+    language TEXT,
+    channel TEXT,
+    checks INTEGER NOT NULL DEFAULT 1,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_updated_at ON analyses (updated_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts USING fts5(
+    input_text, reason, content='analyses', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS analyses_ai AFTER INSERT ON analyses BEGIN
+    INSERT INTO analyses_fts (rowid, input_text, reason) VALUES (new.id, new.input_text, new.reason);
+END;
+CREATE TRIGGER IF NOT EXISTS analyses_ad AFTER DELETE ON analyses BEGIN
+    INSERT INTO analyses_fts (analyses_fts, rowid, input_text, reason) VALUES ('delete', old.id, old.input_text, old.reason);
+END;
+CREATE TRIGGER IF NOT EXISTS analyses_au AFTER UPDATE OF input_text, reason ON analyses
+WHEN old.input_text IS NOT new.input_text OR old.reason IS NOT new.reason BEGIN
+    INSERT INTO analyses_fts (analyses_fts, rowid, input_text, reason) VALUES ('delete', old.id, old.input_text, old.reason);
+    INSERT INTO analyses_fts (rowid, input_text, reason) VALUES (new.id, new.input_text, new.reason);
+END;
+"""
+
+# A re-check of the same input keeps the first-seen time and counts the check
+UPSERT = """
+INSERT INTO analyses (input_hash, input_text, image, verdict, confidence, reason, sources, language, channel,
+                      created_at, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (input_hash) DO UPDATE SET
+    verdict = excluded.verdict,
+    confidence = excluded.confidence,
+    reason = excluded.reason,
+    sources = excluded.sources,
+    language = COALESCE(excluded.language, language),
+    checks = checks + 1,
+    updated_at = excluded.updated_at
+"""
+
+COLUMNS = ("id", "input_hash", "input_text", "image", "verdict", "confidence", "reason", "sources",
+           "language", "channel", "checks", "created_at", "updated_at")
+
+
+def input_hash(text="", image=None):
+    """
+    Canonical hash of an analysed input, stable across forwards of the same claim.
+
+    Args:
+        text (str): The claim text.
+        image (str or bytes): Image URL, Telegram file id or raw image bytes, if any.
+
+    Returns:
+        str: Hex digest.
+    """
+    if isinstance(image, (bytes, bytearray)):
+        return make_key(text, images=(bytes(image),), namespace="store")
+    if image and image.startswith(("http://", "https://")):
+        image = canonicalize_url(image)
+    return make_key(text, namespace=f"store:{image or ''}")
+
+
+def search_terms(query):
+    """Distinct lowercase words of a search query, in order."""
+    return list(dict.fromkeys(term.lower() for term in SEARCH_TERM.findall(query or "")))[:SEARCH_MAX_TERMS]
+
+
+def match_query(terms, match_any=False):
+    """FTS5 query matching rows that contain every one (or with match_any, any one) of the terms."""
+    return (" OR " if match_any else " ").join(f'"{term}"' for term in terms)
+
+
+def row_to_dict(row):
+    item = dict(zip(COLUMNS, row))
+    item["sources"] = json.loads(item["sources"])
+    return item
+
+
+class VerdictStore:
+    """
+    Persistent, full-text searchable record of every analysis result.
+
+    record() only enqueues; a writer thread inserts queued results in
+    batches of up to `batch_size`, at least every `flush_interval` seconds,
+    so requests never wait on SQLite. When the queue is full, results are
+    dropped and counted rather than blocking the caller. Searches use
+    per-thread read connections, which WAL mode lets run alongside writes.
+    """
+
+    def __init__(self, path=VERDICT_STORE_PATH, batch_size=VERDICT_STORE_BATCH_SIZE,
+                 flush_interval=VERDICT_STORE_FLUSH_INTERVAL, queue_size=VERDICT_STORE_QUEUE_SIZE,
+                 rank_max_matches=VERDICT_STORE_RANK_MAX_MATCHES, enabled=VERDICT_STORE_ENABLED):
+        self.path = path
+        self.enabled = enabled and bool(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rank_max_matches = rank_max_matches
+        # term -> whether it matches more than rank_max_matches rows
+        self._common_terms = LRUCache(4096, ttl=600)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._local = threading.local()
+        self._readers = []  # every thread's read connection, closed by close()
+        self._start_lock = threading.Lock()
+        self._writer = None
+        self._closed = False
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.dropped_after_close = 0
+        self.write_errors = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _ensure_started(self):
+        """Create the schema and start the writer thread on first use; False once closed."""
+        if self._writer is not None:
+            return not self._closed
+        with self._start_lock:
+            if self._writer is None:
+                if self._closed:
+                    return False
+                try:
+                    conn = self._connect()
+                    conn.executescript(SCHEMA)
+                except sqlite3.Error as e:
+                    logger.error(f"Verdict store unavailable: {e}")
+                    self.enabled = False
+                    return False
+                self._writer = threading.Thread(target=self._write_loop, args=(conn,),
+                                                name="verdict-store-writer", daemon=True)
+                self._writer.start()
+        return True
+
+    def record(self, text, result, language=None, channel="api", image=None):
+        """
+        Queue an analysis result for storage.
+
+        Args:
+            text (str): The analysed claim text.
+            result (dict): Parsed English analysis (verdict, confidence, reason, sources).
+            language (str): Detected language of the input.
+            channel (str): Where the request came from, e.g. "api" or "telegram".
+            image (str or bytes): Image URL, Telegram file id or raw image bytes, if any.
+        """
+        if not self.enabled or not result:
+            return
+        if not self._ensure_started():
+            if self._closed:
+                self._drop_closed()
+            return
+        # Hashing and serialization happen on the writer thread. The lock keeps
+        # rows from landing behind the stop marker close() queues.
+        with self._start_lock:
+            if self._closed:
+                self._drop_closed()
+                return
+            try:
+                self._queue.put_nowait((text or "", dict(result), language, channel, image, time.time()))
+            except queue.Full:
+                self.dropped += 1
+
+    def _drop_closed(self):
+        if not self.dropped_after_close:
+            logger.warning("Verdict store is closed; dropping results recorded after shutdown")
+        self.dropped_after_close += 1
+
+    def _write_loop(self, conn):
+        while True:
+            row = self._queue.get()
+            if row is None:
+                break
+            batch = [row]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if row is None:
+                    stop = True
+                    break
+                batch.append(row)
+            self._write(conn, batch)
+            if stop:
+                break
+        conn.close()
+
+    def _write(self, conn, batch):
+        rows = []
+        for text, result, language, channel, image, now in batch:
+            image_ref = "upload" if isinstance(image, (bytes, bytearray)) else image or None
+            rows.append((
+                input_hash(text, image),
+                text,
+                image_ref,
+                result.get("verdict", "Unknown"),
+                float(result.get("confidence") or 0.0),
+                result.get("reason", ""),
+                json.dumps(result.get("sources") or {}, ensure_ascii=False),
+                language,
+                channel,
+                now,
+                now,
+            ))
+        try:
+            with conn:
+                conn.executemany(UPSERT, rows)
+            self.written += len(batch)
+            self.batches += 1
+        except sqlite3.Error as e:
+            self.write_errors += len(batch)
+            logger.error(f"Verdict store write of {len(batch)} results failed: {e}")
+
+    def close(self, timeout=10):
+        """Write everything still queued, stop the writer thread and close read connections."""
+        with self._start_lock:
+            self._closed = True
+            writer = self._writer
+            readers, self._readers = self._readers, []
+            if writer is not None and writer.is_alive():
+                self._queue.put(None)
+        if writer is not None:
+            writer.join(timeout)
+        for conn in readers:
+            conn.close()
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._start_lock:
+                self._readers.append(conn)
+        return conn
+
+    def is_common(self, term):
+        """Whether a term matches more than rank_max_matches rows (counting stops there)."""
+        common = self._common_terms.get(term)
+        if common is None:
+            (count,) = self._reader().execute(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM analyses_fts WHERE analyses_fts MATCH ? LIMIT ?)",
+                (match_query([term]), self.rank_max_matches + 1),
+            ).fetchone()
+            common = count > self.rank_max_matches
+            self._common_terms.set(term, common)
+        return common
+
+    def search(self, query, page=1, page_size=20, verdict=None, language=None, match_any=False):
+        """
+        Full-text search over stored claims and reasons, best matches first.
+
+        Every word of the query must appear, and matches in the claim text rank
+        above matches in the reason (BM25). BM25 scores every row containing a
+        query word, so words in more than rank_max_matches rows are treated
+        as stop words: they are dropped when the query has rarer words, and a
+        query made only of them returns the newest matches first. With
+        match_any, rows need only one of the rarer words, and a query made
+        only of common words finds nothing.
+
+        Args:
+            query (str): Free text; punctuation and FTS5 syntax are ignored.
+            page (int): 1-based page number.
+            page_size (int): Results per page, at most SEARCH_MAX_PAGE_SIZE.
+            verdict (str): Only results with this verdict.
+            language (str): Only inputs detected in this language.
+            match_any (bool): Match rows containing any of the words instead of all.
+
+        Returns:
+            dict: results (list of stored analyses) and has_more.
+        """
+        page, page_size = max(1, page), max(1, min(page_size, SEARCH_MAX_PAGE_SIZE))
+        terms = search_terms(query)
+        if not self.enabled or not terms or not self._ensure_started():
+            return {"results": [], "has_more": False}
+
+        rare = [term for term in terms if not self.is_common(term)]
+        if rare:
+            fts_query, score, order = match_query(rare, match_any), "bm25(analyses_fts, 2.0, 1.0)", "score"
+        elif match_any:
+            return {"results": [], "has_more": False}
+        else:
+            # Scoring would read every match, so skip it and stream matches newest first
+            fts_query, score, order = match_query(terms), "NULL", "analyses_fts.rowid DESC"
+        filters, params = "", [fts_query]
+        if verdict:
+            filters += " AND a.verdict = ?"
+            params.append(verdict)
+        if language:
+            filters += " AND a.language = ?"
+            params.append(language)
+        # One extra row tells whether another page exists without counting every match
+        params += [page_size + 1, (page - 1) * page_size]
+        columns = ", ".join(f"a.{column}" for column in COLUMNS)
+        rows = self._reader().execute(
+            f"""SELECT {columns}, {score} AS score
+                FROM analyses_fts JOIN analyses a ON a.id = analyses_fts.rowid
+                WHERE analyses_fts MATCH ?{filters}
+                ORDER BY {order} LIMIT ? OFFSET ?""",
+            params,
+        ).fetchall()
+        results = []
+        for row in rows[:page_size]:
+            item = row_to_dict(row[:-1])
+            item["score"] = round(-row[-1], 4) if rare else None
+            results.append(item)
+        return {"results": results, "has_more": len(rows) > page_size}
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "dropped_after_close": self.dropped_after_close,
+            "write_errors": self.write_errors,
+        }
+
+
+# Shared store for server.py and bot.py
+verdict_store = VerdictStore()
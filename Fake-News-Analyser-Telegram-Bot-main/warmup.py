@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Warm-up configuration
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") != "0"
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", 10))  # seconds per attempt
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", 15))  # between attempts of a required component
+# Components that must be warm before /ready passes; the rest only need to have finished
+READY_REQUIRED = [name.strip() for name in os.getenv("READY_REQUIRED", "gemini").split(",") if name.strip()]
+# Requests timed as "first request" and counted when served before ready
+TRACKED_PATH_PREFIXES = ("/api/", "/telegram/", "/webhook")
+
+_gemini_client = None
+_gemini_lock = threading.Lock()
+
+
+def gemini_client():
+    """
+    Shared Gemini client, created on first use.
+
+    Reads GOOGLE_API_KEY and GEMINI_BASE_URL (optional override, e.g. a local
+    fake Gemini for load tests) from the environment and .env at that point,
+    so importing the analyser does no client setup.
+    """
+    global _gemini_client
+    if _gemini_client is None:
+        with _gemini_lock:
+            if _gemini_client is None:
+                from google import genai
+                from google.genai.types import HttpOptions
+
+                load_dotenv()
+                base_url = os.getenv("GEMINI_BASE_URL")
+                _gemini_client = genai.Client(
+                    api_key=os.getenv("GOOGLE_API_KEY"),
+                    http_options=HttpOptions(base_url=base_url) if base_url else None,
+                )
+    return _gemini_client
+
+
+async def warm_gemini(model_id, sync=False):
+    """
+    Open a pooled connection to Gemini with a model metadata lookup (no tokens used).
+
+    Any HTTP answer means DNS, TLS and the connection pool are ready; only
+    rejected credentials count as a failure. With sync, the blocking client
+    used from worker threads is warmed as well.
+    """
+    from google.genai import errors
+
+    client = gemini_client()
+    calls = [client.aio.models.get(model=model_id)]
+    if sync:
+        calls.append(asyncio.to_thread(client.models.get, model=model_id))
+    for result in await asyncio.gather(*calls, return_exceptions=True):
+        if isinstance(result, errors.APIError):
+            if result.code in (401, 403):
+                raise result
+        elif isinstance(result, Exception):
+            raise result
+
+
+class Startup:
+    """
+    Tracks warm-up of clients, connection pools and indexes for readiness checks.
+
+    Components are async callables run concurrently in the background, each
+    attempt bounded by its timeout. A component is "pending" until its first
+    attempt ends, then "warm" or "failed"; failed required components are
+    retried every `retry_seconds`. The service is ready once every required
+    component is warm and every other one has finished.
+    """
+
+    def __init__(self, required=READY_REQUIRED, retry_seconds=WARMUP_RETRY_SECONDS, enabled=WARMUP_ENABLED):
+        self.required = set(required)
+        self.retry_seconds = retry_seconds
+        self.enabled = enabled
+        self.components = {}
+        self._tasks = []
+        self.started_at = None
+        self.ready_after = None
+        self.import_seconds = None
+        self.first_request = None
+        self.cold_requests = 0
+
+    def record_import(self, seconds):
+        """Time taken to import the application module."""
+        self.import_seconds = round(seconds, 3)
+        logger.info(f"Application imported in {seconds:.2f}s")
+
+    def start(self, name, warm, timeout=WARMUP_TIMEOUT):
+        """
+        Warm a component in the background; a name already started is skipped.
+
+        Args:
+            name (str): Component name reported by stats() and matched against READY_REQUIRED.
+            warm (callable): Async callable doing the warm-up; raising marks the attempt failed.
+            timeout (float): Seconds allowed per attempt, or None for no limit.
+        """
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        if name in self.components:
+            return
+        self.components[name] = {"state": "pending", "required": name in self.required,
+                                 "attempts": 0, "seconds": None, "error": None}
+        if not self.enabled:
+            self.components[name]["state"] = "skipped"
+            return
+        self._tasks.append(asyncio.create_task(self._warm(name, warm, timeout)))
+
+    async def _warm(self, name, warm, timeout):
+        component = self.components[name]
+        while True:
+            component["attempts"] += 1
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(warm(), timeout)
+                component.update(state="warm", error=None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                component.update(state="failed", error=(f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)[:200])
+                logger.warning(f"Warm-up of {name} failed (attempt {component['attempts']}): {component['error']}")
+            component["seconds"] = round(time.perf_counter() - start, 3)
+            if component["state"] == "warm":
+                logger.info(f"Warmed {name} in {component['seconds']:.2f}s")
+            if self.is_ready() and self.ready_after is None:
+                self.ready_after = round(time.monotonic() - self.started_at, 3)
+                logger.info(f"Ready {self.ready_after:.2f}s after startup")
+            if component["state"] == "warm" or not component["required"]:
+                return
+            await asyncio.sleep(self.retry_seconds)
+
+    def is_ready(self):
+        if self.started_at is None:
+            return False
+        for name, component in self.components.items():
+            if component["state"] == "pending":
+                return False
+            if component["required"] and component["state"] == "failed":
+                return False
+        return all(name in self.components for name in self.required) or not self.enabled
+
+    def observe_request(self, path, seconds):
+        """Record a served request: the first one's latency, and how many arrived before ready."""
+        if self.first_request is None:
+            self.first_request = {"path": path, "seconds": round(seconds, 3)}
+            logger.info(f"First request {path} took {seconds:.2f}s")
+        if not self.is_ready():
+            self.cold_requests += 1
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self):
+        return {
+            "ready": self.is_ready(),
+            "import_seconds": self.import_seconds,
+            "ready_after_seconds": self.ready_after,
+            "components": self.components,
+            "first_request": self.first_request,
+            "cold_requests": self.cold_requests,
+        }
+
+
+class RequestTimingMiddleware:
+    """ASGI middleware reporting how long tracked requests take (until the last body chunk) to a Startup."""
+
+    def __init__(self, app, startup, paths=TRACKED_PATH_PREFIXES):
+        self.app = app
+        self.startup = startup
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+
+        async def timed_send(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                self.startup.observe_request(scope["path"], time.perf_counter() - start)
+
+        await self.app(scope, receive, timed_send)
+
+
+# Shared startup state for the process
+startup = Startup()
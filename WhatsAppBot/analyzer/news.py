@@ -1,17 +1,16 @@
-import os
 import json
 import requests
 from urllib.parse import urlparse
-from google import genai
 from google.genai.types import Tool, GenerateContentConfig, GoogleSearch, Part
 
 from utils.logger import logger
-
-# API Keys
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-
-# Initialize Google Gemini client
-client = genai.Client(api_key=GOOGLE_API_KEY)
+import utils.shared  # noqa: F401  (makes the shared analyser modules importable)
+from claim_index import ClaimIndex, CLAIM_INDEX_ENABLED
+from json_extract import extract_analysis
+from image_preprocess import preprocess_image_sync
+from gemini_scheduler import gemini_scheduler, estimate_tokens
+from media import sniff_mime
+from warmup import gemini_client
 
 # Gemini model ID
 model_id = "gemini-2.0-flash"
@@ -19,14 +18,8 @@ model_id = "gemini-2.0-flash"
 # Google Search tool
 google_search_tool = Tool(google_search=GoogleSearch())
 
-def analyze_news(news_input, model_id=model_id, google_search_tool=google_search_tool):
-    """Analyze news or claim using Gemini."""
-    try:
-        response = client.models.generate_content(
-            model=model_id,
-            contents=news_input,
-            config=GenerateContentConfig(
-                system_instruction="""
+# System prompt for news analysis
+SYSTEM_INSTRUCTION = """
                 <system_prompt>
 YOU ARE THE WORLD'S LEADING FAKE NEWS DETECTION AGENT, TRAINED IN OPEN-SOURCE INTELLIGENCE (OSINT), FACT-CHECKING, AND MEDIA FORENSICS. YOUR ROLE IS TO ANALYZE A GIVEN NEWS ARTICLE OR CLAIM AND DETERMINE ITS VERACITY WITH EXPERT PRECISION. YOU MUST RETURN A STRUCTURED JSON OBJECT CONTAINING YOUR VERDICT, CONFIDENCE LEVEL, SUPPORTING REASONING, AND SOURCES USED.
 
@@ -125,10 +118,39 @@ NOTE: TF POSSIBLE USE INDIAN OFFILIAL SOURCES, SUCH AS NEWS ARTICLES, GOVERNMENT
 
 </system_prompt>
 
-                """,
+                """
+
+# Near-duplicate index of text claims already analyzed by this process
+claim_index = ClaimIndex()
+
+def analyze_news(news_input, model_id=model_id, google_search_tool=google_search_tool, user=None):
+    """
+    Analyze news or claim using Gemini, reusing verdicts for near-duplicate text claims.
+
+    The Gemini call is queued per user in the shared gemini_scheduler.
+    """
+    is_text = isinstance(news_input, str)
+    if is_text and CLAIM_INDEX_ENABLED:
+        match = claim_index.query(news_input)
+        if match is not None:
+            logger.info(f"Reusing verdict for near-duplicate claim (similarity {match[1]:.2f})")
+            return match[0]
+
+    try:
+        response = gemini_scheduler.call_sync(
+            gemini_client().models.generate_content,
+            model=model_id,
+            contents=news_input,
+            config=GenerateContentConfig(
+                system_instruction=SYSTEM_INSTRUCTION,
                 tools=[google_search_tool]
-            )
+            ),
+            user=user,
+            channel="whatsapp",
+            cost=estimate_tokens(news_input, SYSTEM_INSTRUCTION),
         )
+        if is_text and CLAIM_INDEX_ENABLED and extract_json_from_response(response.text):
+            claim_index.add(news_input, response.text)
         return response.text
     except Exception as e:
         logger.error(f"Error analyzing news: {e}")
@@ -140,18 +162,9 @@ NOTE: TF POSSIBLE USE INDIAN OFFILIAL SOURCES, SUCH AS NEWS ARTICLES, GOVERNMENT
         })
 
 def extract_json_from_response(response_text):
-    """Extracts JSON object from response."""
-    try:
-        return json.loads(response_text)
-    except json.JSONDecodeError:
-        start = response_text.find('{')
-        end = response_text.rfind('}')
-        if start != -1 and end != -1 and start < end:
-            try:
-                return json.loads(response_text[start:end + 1])
-            except:
-                return None
-        return None
+    """Extracts the verdict JSON from a Gemini response as a dict, or None."""
+    result = extract_analysis(response_text)
+    return result.model_dump(exclude_none=True) if result else None
 
 def create_news_input(news_text="", image_url=None):
     """
@@ -169,9 +182,10 @@ def create_news_input(news_text="", image_url=None):
             # Image from URL
             response = requests.get(image_url)
             response.raise_for_status()
-            image_bytes = response.content
+            # Downscale and strip metadata before the upload to Gemini
+            image_bytes, mime_type = preprocess_image_sync(response.content)
             
-            image_part = Part.from_bytes(data=image_bytes, mime_type="image/jpeg")
+            image_part = Part.from_bytes(data=image_bytes, mime_type=mime_type or sniff_mime(image_bytes) or "image/jpeg")
             text_part = news_text.strip() if news_text.strip() else "Analyze this news image"
             return [image_part, text_part]
 
@@ -210,7 +224,7 @@ def format_response(analysis_result):
         logger.error(f"Error formatting response: {e}")
         return "❌ Error formatting analysis results."
 
-def json_to_information_message(json_data):
+def json_to_information_message(json_data, user=None):
     """
     Send the JSON analysis result to Gemini LLM to get a well-formatted information text.
     The response should include links to sources in plain text format (not markdown or clickable), and should NOT include any introductory lines.
@@ -240,9 +254,13 @@ json data: {json_str}
 """
             
         )
-        response = client.models.generate_content(
+        response = gemini_scheduler.call_sync(
+            gemini_client().models.generate_content,
             model=model_id,
-            contents=prompt
+            contents=prompt,
+            user=user,
+            channel="whatsapp",
+            cost=estimate_tokens(prompt),
         )
         return response.text.strip()
     except Exception as e:
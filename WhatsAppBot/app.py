@@ -1,13 +1,45 @@
 import os
+import time
+IMPORT_STARTED = time.perf_counter()
+
+import asyncio
 import tempfile
-import requests
+import httpx
 from fastapi import FastAPI, Form, Request, BackgroundTasks
-from fastapi.responses import PlainTextResponse, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 import uvicorn
 
 from utils.logger import logger
-from analyzer.news import analyze_news, create_news_input, extract_json_from_response, format_response
+from analyzer.news import analyze_news, create_news_input, extract_json_from_response, format_response, claim_index, model_id
 from bot.whatsapp import whatsapp_bot
+from image_index import ImageIndex
+from media import sniff_mime
+import image_preprocess
+from gemini_scheduler import gemini_scheduler, estimate_tokens
+from warmup import startup, gemini_client, warm_gemini, RequestTimingMiddleware
+
+# Perceptual-hash index of analyzed images so re-shared copies reuse the result
+image_index = ImageIndex(path=os.getenv("IMAGE_INDEX_PATH"))
+
+# Shared keep-alive client for media downloads from Twilio
+MEDIA_TIMEOUT = float(os.getenv("MEDIA_TIMEOUT", "30"))
+_http_client = None
+
+
+def get_http_client():
+    """Shared HTTP client for media downloads, created on first use inside the running loop."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(timeout=httpx.Timeout(MEDIA_TIMEOUT), follow_redirects=True)
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared media client; call on application shutdown."""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -15,6 +47,8 @@ app = FastAPI(
     description="A WhatsApp bot that analyzes news for authenticity using Google Gemini API",
     version="1.0.0"
 )
+# Report first-request latency and requests served before warm-up finished
+app.add_middleware(RequestTimingMiddleware, startup=startup)
 
 @app.post("/webhook", response_class=PlainTextResponse)
 async def webhook(
@@ -67,8 +101,8 @@ async def process_and_send_analysis(incoming_msg: str, media_url: str = None, us
         # Process text-only news input
         news_input = create_news_input(news_text=incoming_msg)
         
-        # Run the analysis
-        analysis_text = analyze_news(news_input)
+        # Run the analysis in a thread; it may wait for a Gemini slot
+        analysis_text = await asyncio.to_thread(analyze_news, news_input, user=user_number)
         parsed_result = extract_json_from_response(analysis_text)
         
         # Format the result
@@ -97,28 +131,43 @@ async def analyze_image_and_send_result(image_url: str, caption: str = "", user_
         user_number: Phone number to send the result to
     """
     try:
-        from google import genai
-        import os
-        
         # Get Google API key from environment
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
+        if not os.getenv("GOOGLE_API_KEY"):
             raise ValueError("Google API Key not found in environment variables")
         
-        # Initialize Gemini client
-        client = genai.Client(api_key=api_key)
+        # Shared Gemini client, so uploads and analyses reuse pooled connections
+        client = gemini_client()
         
-        # Download the image to a temporary file
-        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as temp_file:
-            response = requests.get(image_url)
-            response.raise_for_status()
-            temp_file.write(response.content)
+        # Download the image
+        response = await get_http_client().get(image_url)
+        response.raise_for_status()
+        image_bytes = response.content
+
+        # Re-shared images (re-compressed or resized) reuse the earlier analysis;
+        # decoding and hashing is CPU work, so keep it off the event loop
+        image_hash = await asyncio.to_thread(image_index.hash, image_bytes)
+        match = image_index.query(image_hash, caption or "")
+        if match is not None:
+            cached_text, distance = match
+            logger.info(f"Reusing image analysis (hash distance {distance})")
+            if user_number:
+                whatsapp_bot.send_message(user_number, f"*Image Analysis*\n\n{cached_text}")
+            return
+
+        # Downscale and strip metadata in the worker pool; hashing above used the original
+        image_bytes, mime_type = await image_preprocess.preprocess_image_async(image_bytes)
+        mime_type = mime_type or sniff_mime(image_bytes) or "image/jpeg"
+
+        # Save the image to a temporary file for upload
+        suffix = "." + mime_type.split("/")[1].replace("jpeg", "jpg")
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
+            temp_file.write(image_bytes)
             temp_file_path = temp_file.name
             
         logger.info(f"Downloaded image to: {temp_file_path}")
         
         # Upload the image to Gemini
-        my_file = client.files.upload(file=temp_file_path)
+        my_file = await client.aio.files.upload(file=temp_file_path)
         
         # Set prompt for image analysis
         prompt = "Analyze this image and determine if it contains fake news, misinformation, or manipulated content. Provide a verdict (Real/Fake/Uncertain) with reasoning."
@@ -126,16 +175,23 @@ async def analyze_image_and_send_result(image_url: str, caption: str = "", user_
             # If user provided a caption, include it in the analysis
             prompt = f"Analyze this image with caption: '{caption}'. Determine if it contains fake news, misinformation, or manipulated content."
         
-        # Generate content
-        response = client.models.generate_content(
+        # Generate content, queued with the text analyses in the shared scheduler
+        response = await gemini_scheduler.call(
+            client.aio.models.generate_content,
             model="gemini-2.0-flash",
             contents=[my_file, prompt],
+            user=user_number,
+            channel="whatsapp",
+            cost=estimate_tokens([my_file, prompt]),
         )
         
         logger.info(f"Gemini image analysis response: {response.text}")
         
         # Clean up the temporary file
         os.unlink(temp_file_path)
+
+        if response.text and response.text.strip():
+            image_index.add(image_hash, response.text.strip(), caption or "")
         
         # Send response to user
         if user_number:
@@ -155,16 +211,39 @@ async def root():
     """Health check endpoint"""
     return {"status": "online", "message": "WhatsApp Fake News Analyzer Bot is running"}
 
+@app.get("/stats")
+async def stats():
+    """Claim and image index hit/miss counters, image preprocessing and Gemini queue stats"""
+    return {
+        "claim_index": claim_index.stats(),
+        "image_index": image_index.stats(),
+        "image_preprocess": image_preprocess.stats(),
+        "gemini_scheduler": gemini_scheduler.stats(),
+        "startup": startup.stats(),
+    }
+
+@app.get("/ready")
+async def ready():
+    """Readiness endpoint: 200 once the Gemini clients are warm, 503 until then"""
+    stats = startup.stats()
+    return JSONResponse(stats, status_code=200 if stats["ready"] else 503)
+
 # Maintenance task: clean old sessions periodically
 @app.on_event("startup")
 async def startup_event():
-    """Runs on server startup"""
+    """Runs on server startup; warms the Gemini connection pools in the background"""
     logger.info("Starting WhatsApp Fake News Analyzer Bot")
+    startup.start("gemini", lambda: warm_gemini(model_id, sync=True))
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Runs on server shutdown"""
     logger.info("Shutting down WhatsApp Fake News Analyzer Bot")
+    await startup.stop()
+    await close_http_client()
+    image_preprocess.shutdown_pool()
+
+startup.record_import(time.perf_counter() - IMPORT_STARTED)
 
 if __name__ == "__main__":
     # Get port from environment variable or use 8000 as default
@@ -62,7 +62,7 @@ Send me a news article, claim, or image to analyze if it's real or fake.
                 return "Image processing..."
                 
             # Handle text analysis
-            raw_result = analyze_news(incoming_msg)
+            raw_result = analyze_news(incoming_msg, user=user_number)
             parsed_json = extract_json_from_response(raw_result)
             
             if not parsed_json or not isinstance(parsed_json, dict) or "verdict" not in parsed_json:
@@ -0,0 +1,15 @@
+import os
+import sys
+
+# The caching, indexing and parsing helpers live next to the Telegram bot in
+# Fake-News-Analyser-Telegram-Bot-main; make them importable from here. The dustbin
+# app runs this file too, so both apps resolve the directory the same way.
+SHARED_DIR = os.getenv(
+    "FAKE_NEWS_ANALYSER_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                 "Fake-News-Analyser-Telegram-Bot-main"),
+)
+
+# Appended rather than prepended so this app's own packages (e.g. `bot`) win
+if SHARED_DIR not in sys.path:
+    sys.path.append(SHARED_DIR)
@@ -1,16 +1,19 @@
 import google.generativeai as genai
 from PIL import Image
 import os
+import runpy
 from dotenv import load_dotenv
 
+# Gemini calls share the rate-limiting scheduler that lives with the fake news analyser;
+# the WhatsApp bot's path helper puts that directory on sys.path (FAKE_NEWS_ANALYSER_DIR overrides it)
+runpy.run_path(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "WhatsAppBot", "utils", "shared.py"))
+from gemini_scheduler import gemini_scheduler, estimate_tokens  # noqa: E402
+
 load_dotenv()
 genai.configure(api_key=os.getenv("Gemini_API"))
 model = genai.GenerativeModel("gemini-1.5-flash")
 
-def analyze_with_gemini_vision(image_path):
-    image = Image.open(image_path)
-
-    prompt = """You are an expert in waste management and recycling in India.
+VISION_PROMPT = """You are an expert in waste management and recycling in India.
 
 Your task is to analyze the object shown in the provided image and respond to the following strictly in valid JSON format (no explanations or additional comments):
 
@@ -30,6 +33,25 @@ Guidelines:
 Do not include anything other than the JSON output.
 """
 
-    response = model.generate_content([prompt, image])
+def analyze_with_gemini_vision(image_path, user_id=None):
+    image = Image.open(image_path)
+    response = gemini_scheduler.call_sync(
+        model.generate_content,
+        [VISION_PROMPT, image],
+        user=user_id,
+        channel="dustbin",
+        cost=estimate_tokens([VISION_PROMPT, image]),
+    )
     return response.text
 
+async def analyze_with_gemini_vision_async(image_path, user_id=None):
+    """Non-blocking variant of analyze_with_gemini_vision for the FastAPI handlers."""
+    image = Image.open(image_path)
+    response = await gemini_scheduler.call(
+        model.generate_content_async,
+        [VISION_PROMPT, image],
+        user=user_id,
+        channel="dustbin",
+        cost=estimate_tokens([VISION_PROMPT, image]),
+    )
+    return response.text
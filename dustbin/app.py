@@ -106,7 +106,7 @@ async def scan_objects(scan_request: ScanRequest):
 
             # 2. Analyze image
             try:
-                response_text = analyzer.analyze_with_gemini_vision(image_path)
+                response_text = await analyzer.analyze_with_gemini_vision_async(image_path, user_id)
             except Exception as e:
                 print("Image analysis failed:", e)
                 return JSONResponse(content={"error": f"Image analysis failed: {e}"}, status_code=500)
@@ -283,7 +283,7 @@ async def scan_item(file: UploadFile = File(...), user_id: str = Form(...), num_
             logging.info(f"Saved image to {temp_path}")
         
         # Analyze the image using analyzer.py
-        result = analyzer.analyze_with_gemini_vision(temp_path)
+        result = await analyzer.analyze_with_gemini_vision_async(temp_path, user_id)
         
         # Extract JSON data from the response if needed
         if isinstance(result, str):